@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, Form, status, HTTPException
+from fastapi import APIRouter, WebSocket, UploadFile, File, Form, status, HTTPException
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from app.core.db import get_products_collection
@@ -6,7 +6,9 @@ from app.core.clip_utils import image_to_embedding
 from app.core.schemas import ErrorResponse
 from app.core.config import settings
 from app.worker import celery_app
-from app.tasks.product_tasks import add_product_task
+from app.api.job_stream import sse_response, stream_websocket
+from app.tasks.product_tasks import add_product_task, bulk_import_task
+from app.core.blob_store import spool_upload
 import hashlib
 import io
 from PIL import Image
@@ -113,13 +115,46 @@ async def add_product(
                 detail=f"Invalid key_features format: {str(e)}. Expected JSON array like '[\"124 Liters\", \"Environment Friendly Tech\"]'"
             )
     
-    images_data = [await image.read() for image in images]
-    job = add_product_task.delay(images_data, name, price, description, category, weight_kg, color, parsed_sizes, parsed_key_features)
+    # Images are streamed into the shared blob store; the job receives only their digests
+    image_digests = [await spool_upload(image) for image in images]
+    job = add_product_task.delay(image_digests, name, price, description, category, weight_kg, color, parsed_sizes, parsed_key_features)
     return JSONResponse(
         status_code=202,
         content={"job_id": job.id, "status": "processing"}
     )
 
+@router.post(
+    "/add_product/bulk",
+    tags=["Products"],
+    summary="Bulk import products from a manifest and an image archive",
+    response_description="Job id of the import",
+    responses={
+        202: {"description": "Import started.", "content": {"application/json": {"example": {"job_id": "...", "status": "processing"}}}},
+        400: {"description": "Invalid manifest.", "content": {"application/json": {"example": {"detail": "Manifest must be a JSON array of products"}}}},
+        413: {"description": "File too large.", "content": {"application/json": {"example": {"detail": "File is too large"}}}},
+        415: {"description": "Unsupported file type.", "content": {"application/json": {"example": {"detail": "File type not allowed"}}}},
+    },
+)
+async def bulk_import(
+    manifest: UploadFile = File(..., description="products.json-style manifest: a JSON array of products with an 'image' list of paths"),
+    images_archive: UploadFile = File(..., description="Zip archive holding the images referenced by the manifest")
+):
+    """Import many products in one job. Products already imported from the same manifest entries are skipped, so a failed import can simply be re-submitted. Poll progress and results with the add_product job endpoints."""
+    validate_file(images_archive, settings.MAX_FILE_SIZE, ["application/zip", "application/x-zip-compressed"])
+    manifest_bytes = await manifest.read()
+    try:
+        entries = json.loads(manifest_bytes)
+        if not isinstance(entries, list):
+            raise ValueError("Manifest must be a JSON array of products")
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid manifest: {str(e)}")
+    archive_digest = await spool_upload(images_archive)
+    job = bulk_import_task.delay(manifest_bytes, archive_digest)
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": "processing", "products": len(entries)}
+    )
+
 @router.get("/add_product/job/{job_id}", tags=["Products"], summary="Get add product job status/result")
 def get_add_product_job(job_id: str):
     res = celery_app.AsyncResult(job_id)
@@ -162,4 +197,15 @@ def get_add_product_progress(job_id: str):
         else:
             return {"job_id": job_id, "progress": 0, "message": f"Job status: {res.state}", "timestamp": time.time()}
     except Exception as e:
-        return {"job_id": job_id, "progress": -1, "message": f"Error getting progress: {str(e)}", "timestamp": time.time()} 
\ No newline at end of file
+        return {"job_id": job_id, "progress": -1, "message": f"Error getting progress: {str(e)}", "timestamp": time.time()}
+
+# Push-based alternatives to polling the progress endpoint
+@router.get("/add_product/stream/{job_id}", tags=["Products"], summary="Stream add product job progress and result (Server-Sent Events)")
+async def stream_add_product_job(job_id: str):
+    """Server-Sent Events: ``progress`` events as the job advances, then one ``result`` or ``failed`` event."""
+    return sse_response(job_id)
+
+@router.websocket("/add_product/ws/{job_id}")
+async def add_product_job_websocket(websocket: WebSocket, job_id: str):
+    """The same events as the SSE stream, as ``{"event": ..., "data": ...}`` JSON messages."""
+    await stream_websocket(websocket, job_id)
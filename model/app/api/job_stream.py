@@ -0,0 +1,26 @@
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.progress import job_events
+from app.worker import celery_app
+import json
+
+def sse_response(job_id: str) -> StreamingResponse:
+    """Server-Sent Events stream of a job's progress, ending with its result."""
+    async def stream():
+        async for event, data in job_events(job_id, celery_app.AsyncResult(job_id)):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_websocket(websocket: WebSocket, job_id: str):
+    """Send a job's progress and result over a WebSocket as ``{"event": ..., "data": ...}`` messages."""
+    await websocket.accept()
+    try:
+        async for event, data in job_events(job_id, celery_app.AsyncResult(job_id)):
+            await websocket.send_json({"event": event, "data": data})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, WebSocket, UploadFile, File, Form, HTTPException, status
 from fastapi.responses import JSONResponse
 from app.core.db import get_products_collection
 from app.core.schemas import ProductSearchResult, SearchResponse, ErrorResponse
 from app.core.config import settings
 from app.worker import celery_app
+from app.api.job_stream import sse_response, stream_websocket
 from app.tasks.search_tasks import video_search_task, image_search_task, text_search_task
-import io
-from PIL import Image
-import numpy as np
+from app.core.ranking import RANKING_MODES
+from app.core import result_cache
+from app.core.result_cache import get_cache_key
+from app.core.blob_store import spool_upload
 from typing import Optional, List
-import mimetypes
-import hashlib
 import redis
 import json
 import logging
 from bson import ObjectId
 import time
+import asyncio
+import uuid
 
 router = APIRouter()
 
@@ -28,17 +30,34 @@ except Exception as e:
     redis_client = None
     logging.warning(f"Redis unavailable, caching disabled: {e}")
 
-CACHE_TTL = 3600  # 1 hour
+CACHE_TTL = 3600  # 1 hour (job_id -> cache key mapping)
+SYNC_POLL_INTERVAL = 0.02  # Seconds between result checks while waiting inline
 
-def get_cache_key(video_bytes=None, image_bytes=None, query=None):
-    m = hashlib.sha256()
-    if video_bytes:
-        m.update(video_bytes)
-    if image_bytes:
-        m.update(image_bytes)
-    if query:
-        m.update(query.encode("utf-8"))
-    return m.hexdigest()
+async def wait_for_result(job, budget):
+    """The job's AsyncResult once it is ready, or None when ``budget`` seconds pass first.
+
+    Each result-backend check runs on a worker thread, so the event loop never waits on it.
+    """
+    deadline = time.monotonic() + budget
+    while not await asyncio.to_thread(job.ready):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(SYNC_POLL_INTERVAL, remaining))
+    return job
+
+def cached_matches(cache_key):
+    """Matches of a cached ranking (one Redis round trip, one MongoDB query), or None on a miss."""
+    try:
+        _, ranked = result_cache.lookup(cache_key)
+    except Exception as e:
+        logging.warning(f"Result cache lookup failed: {e}")
+        return None
+    if ranked is None:
+        return None
+    ids = [ObjectId(pid) for pid, _, _ in ranked]
+    products = {str(doc.pop("_id")): doc for doc in get_products_collection().find({"_id": {"$in": ids}, "deleted": {"$ne": True}}, {"embeddings": 0})}
+    return result_cache.build_matches(ranked, products)
 
 def validate_file(file: UploadFile, max_size: int = None, allowed_types: List[str] = None) -> bool:
     """Validate uploaded file size and type"""
@@ -71,9 +90,10 @@ def validate_file(file: UploadFile, max_size: int = None, allowed_types: List[st
     response_model=None,
     response_description="Top product matches with similarity scores",
     responses={
-        200: {"description": "Search results.", "content": {"application/json": {"example": {"matches": [
+        200: {"description": "Search results (cache hit, or the job finished within the wait budget).", "content": {"application/json": {"example": {"matches": [
             {"name": "Cool Cap", "price": 2500, "description": "A stylish cap for all seasons.", "category": "Accessories", "image_urls": ["...", "...", "...", "..."], "matched_images": [{"image_url": "...", "image_hash": "...", "similarity": 0.92}]}
         ]}}}},
+        202: {"description": "Search job queued (no wait budget, or it ran out); poll /search/job/{job_id}.", "content": {"application/json": {"example": {"job_id": "...", "status": "processing"}}}},
         400: {"description": "Bad request.", "content": {"application/json": {"example": {"status": "error", "message": "Provide either an image or a video, not both."}}}},
         413: {"description": "File too large.", "content": {"application/json": {"example": {"detail": "File is too large"}}}},
         415: {"description": "Unsupported file type.", "content": {"application/json": {"example": {"detail": "File type not allowed"}}}},
@@ -83,12 +103,28 @@ def validate_file(file: UploadFile, max_size: int = None, allowed_types: List[st
 async def search_products(
     image: Optional[UploadFile] = File(None, description="Query image file (jpg/png)"),
     video: Optional[UploadFile] = File(None, description="Query video file (mp4/avi/mov/mkv)"),
-    query: str = Form(None, description="Optional text query to filter products")
+    query: str = Form(None, description="Optional text query to filter or re-rank products"),
+    ranking: str = Form(None, description="How the text query combines with image/video similarity: filter, rrf or weighted"),
+    wait: float = Form(None, description="Seconds to wait for the result inline (capped by SEARCH_SYNC_MAX_WAIT_SECONDS); 0 returns a job_id right away"),
+    content_sha256: str = Form(None, description="Optional SHA-256 (hex) of the image/video; content the server already holds is then not read again")
 ):
-    """Search for similar products by uploading an image or a video (and optional text query). Returns top matches with similarity scores."""
+    """Search for similar products by uploading an image or a video (and optional text query). Returns top matches with similarity scores.
+
+    With a ``wait`` budget the results come back in this response (200) when the job finishes in time;
+    otherwise, as without it, the response is 202 with a ``job_id`` to poll.
+    """
     try:
-        if (image is not None and video is not None) or (image is None and video is None):
+        if image is not None and video is not None:
             raise HTTPException(status_code=400, detail={"status": "error", "message": "Provide either an image or a video, not both."})
+        if image is None and video is None and not query:
+            raise HTTPException(status_code=400, detail={"status": "error", "message": "Provide an image, a video or a text query."})
+        ranking = (ranking or settings.SEARCH_RANKING_MODE).lower()
+        if ranking not in RANKING_MODES:
+            raise HTTPException(status_code=400, detail={"status": "error", "message": f"Unknown ranking '{ranking}'. Choose one of: {', '.join(RANKING_MODES)}"})
+        wait = settings.SEARCH_SYNC_WAIT_SECONDS if wait is None else wait
+        if wait < 0:
+            raise HTTPException(status_code=400, detail={"status": "error", "message": "wait must be zero or positive."})
+        wait = min(wait, settings.SEARCH_SYNC_MAX_WAIT_SECONDS)
         
         # Validate uploaded files
         if image is not None:
@@ -96,69 +132,53 @@ async def search_products(
         if video is not None:
             validate_file(video, settings.MAX_FILE_SIZE, settings.ALLOWED_VIDEO_TYPES)
         
-        products_col = get_products_collection()
-        mongo_filter = {}
-        if query:
-            words = query.split()
-            regexes = (
-                [{"name": {"$regex": w, "$options": "i"}} for w in words] +
-                [{"description": {"$regex": w, "$options": "i"}} for w in words]
-            )
-            mongo_filter = {"$or": regexes}
-        products = list(products_col.find(mongo_filter))
-        if not products:
-            return {"matches": []}
-        def clean_product(p):
-            p = dict(p)
-            p.pop('_id', None)
-            return p
-        products_clean = [clean_product(p) for p in products]
-        cache_key = None
-        video_bytes = None
-        image_bytes = None
-        if video is not None:
-            filename = video.filename or ""
-            content_type = mimetypes.guess_type(filename)[0] or ""
-            video_bytes = await video.read()
-            cache_key = get_cache_key(video_bytes=video_bytes, query=query)
-        elif image is not None:
-            filename = image.filename or ""
-            content_type = mimetypes.guess_type(filename)[0] or ""
-            image_bytes = await image.read()
-            cache_key = get_cache_key(image_bytes=image_bytes, query=query)
+        # Uploads are streamed into the blob store; jobs receive only the digest
+        media = video if video is not None else image
+        media_digest = None
+        if media is not None:
+            media_digest = await spool_upload(media, expected_digest=content_sha256)
+            cache_key = get_cache_key(media_digest, query=query, ranking=ranking)
         else:
             cache_key = get_cache_key(query=query)
-        # Check Redis cache before enqueuing job
-        if redis_client and cache_key and redis_client.exists(cache_key):
-            cached_result = redis_client.get(cache_key)
-            return JSONResponse(status_code=200, content=json.loads(cached_result))
-        # Enqueue Celery job as usual
-        if video is not None:
-            job = video_search_task.delay(video_bytes, query, products_clean)
+        # Check the result cache before enqueuing job
+        matches = cached_matches(cache_key)
+        if matches is not None:
+            return JSONResponse(status_code=200, content={"matches": matches, "cached": True})
+        # Single flight: an identical search still running is joined instead of enqueued again
+        job_id = str(uuid.uuid4())
+        try:
+            owner_id = result_cache.claim_search(cache_key, job_id)
+        except Exception as e:
+            logging.warning(f"Single-flight claim failed: {e}")
+            owner_id = job_id
+        if owner_id == job_id:
+            # Enqueue Celery job under the id just claimed
+            try:
+                if video is not None:
+                    video_search_task.apply_async((media_digest, query), {"ranking": ranking}, task_id=job_id)
+                elif image is not None:
+                    image_search_task.apply_async((media_digest, query), {"ranking": ranking}, task_id=job_id)
+                else:
+                    # Text-only search
+                    text_search_task.apply_async((query,), task_id=job_id)
+            except Exception:
+                result_cache.release_search(cache_key, job_id)
+                raise
             # Save cache_key in Redis for job_id mapping (optional, for debugging)
             if redis_client:
-                redis_client.set(f"jobid:{job.id}", cache_key, ex=CACHE_TTL)
-            return JSONResponse(
-                status_code=202,
-                content={"job_id": job.id, "status": "processing"}
-            )
-        elif image is not None:
-            job = image_search_task.delay(image_bytes, query, products_clean)
-            if redis_client:
-                redis_client.set(f"jobid:{job.id}", cache_key, ex=CACHE_TTL)
-            return JSONResponse(
-                status_code=202,
-                content={"job_id": job.id, "status": "processing"}
-            )
-        else:
-            # Text-only search
-            job = text_search_task.delay(query, products_clean)
-            if redis_client:
-                redis_client.set(f"jobid:{job.id}", cache_key, ex=CACHE_TTL)
-            return JSONResponse(
-                status_code=202,
-                content={"job_id": job.id, "status": "processing"}
-            )
+                redis_client.set(f"jobid:{job_id}", cache_key, ex=CACHE_TTL)
+        job = celery_app.AsyncResult(owner_id)
+        # Synchronous mode: answer in this round trip when the job finishes within the budget
+        if wait > 0:
+            res = await wait_for_result(job, wait)
+            if res is not None:
+                if res.successful():
+                    return JSONResponse(status_code=200, content=res.result)
+                return JSONResponse(status_code=500, content={"status": "error", "message": str(res.info), "job_id": job.id})
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job.id, "status": "processing"}
+        )
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -208,4 +228,15 @@ def get_job_progress(job_id: str):
         else:
             return {"job_id": job_id, "progress": 0, "message": f"Job status: {res.state}", "timestamp": time.time()}
     except Exception as e:
-        return {"job_id": job_id, "progress": -1, "message": f"Error getting progress: {str(e)}", "timestamp": time.time()} 
\ No newline at end of file
+        return {"job_id": job_id, "progress": -1, "message": f"Error getting progress: {str(e)}", "timestamp": time.time()}
+
+# Push-based alternatives to polling the progress endpoint
+@router.get("/search/stream/{job_id}", tags=["Products"], summary="Stream search job progress and result (Server-Sent Events)")
+async def stream_search_job(job_id: str):
+    """Server-Sent Events: ``progress`` events as the job advances, then one ``result`` or ``failed`` event."""
+    return sse_response(job_id)
+
+@router.websocket("/search/ws/{job_id}")
+async def search_job_websocket(websocket: WebSocket, job_id: str):
+    """The same events as the SSE stream, as ``{"event": ..., "data": ...}`` JSON messages."""
+    await stream_websocket(websocket, job_id)
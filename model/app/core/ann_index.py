@@ -0,0 +1,82 @@
+import threading
+import hnswlib
+import numpy as np
+from app.core.config import settings
+
+class HNSWIndex:
+    """HNSW approximate nearest-neighbour index over L2-normalized CLIP embeddings.
+
+    Labels are catalog image row numbers (rows of CatalogMatrix.vectors). Vectors are
+    expected to be pre-normalized, so inner-product distance ``1 - sim`` is cosine.
+    """
+
+    def __init__(self, dim, M=None, ef_construction=None, ef_search=None, capacity=1024):
+        self.dim = dim
+        self.M = M or settings.HNSW_M
+        self.ef_construction = ef_construction or settings.HNSW_EF_CONSTRUCTION
+        self.ef_search = ef_search or settings.HNSW_EF_SEARCH
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=max(capacity, 1), ef_construction=self.ef_construction, M=self.M)
+        self._index.set_ef(self.ef_search)
+        self._deleted = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, vectors, labels=None, **params):
+        """Build an index over ``vectors`` (labels default to row numbers)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index = cls(vectors.shape[1], capacity=max(len(vectors), 1024), **params)
+        index.add(vectors, labels)
+        return index
+
+    def __len__(self):
+        return self._index.get_current_count() - len(self._deleted)
+
+    def add(self, vectors, labels=None):
+        """Insert vectors without rebuilding, growing the index when it is full."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(vectors):
+            return
+        with self._lock:
+            if labels is None:
+                start = self._index.get_current_count()
+                labels = np.arange(start, start + len(vectors))
+            labels = np.asarray(labels, dtype=np.int64)
+            needed = self._index.get_current_count() + len(vectors)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+            self._index.add_items(vectors, labels)
+            self._deleted.difference_update(labels.tolist())
+
+    def delete(self, labels):
+        """Tombstone labels so they are never returned again."""
+        with self._lock:
+            for label in labels:
+                label = int(label)
+                if label not in self._deleted:
+                    self._index.mark_deleted(label)
+                    self._deleted.add(label)
+
+    def query(self, vector, k, label_filter=None):
+        """Return ``(labels, similarities)`` of the approximate top-``k`` neighbours, best first.
+
+        ``label_filter`` is an optional ``label -> bool`` predicate evaluated during traversal.
+        Fewer than ``k`` results are returned when the index (or the filter) admits fewer.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(vector, dtype=np.float32).reshape(1, self.dim)
+        with self._lock:
+            self._index.set_ef(max(self.ef_search, k))
+            while True:
+                try:
+                    labels, distances = self._index.knn_query(query, k=k, filter=label_filter)
+                    break
+                except RuntimeError:
+                    # Not enough reachable elements (e.g. a selective filter): ask for fewer
+                    if k == 1:
+                        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+                    k = max(1, k // 2)
+        sims = np.clip(1.0 - distances[0], 0.0, 1.0).astype(np.float32)
+        return labels[0].astype(np.int64), sims
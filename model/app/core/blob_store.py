@@ -0,0 +1,168 @@
+"""Local content-addressed store for uploaded media.
+
+The API streams uploads into ``BLOB_STORE_DIR`` (hashing them chunk by chunk as they
+are written) and hands workers only the SHA-256 digest, so broker messages stay
+small and large videos never sit whole in API memory. The directory must be shared
+by the API and the workers (a volume in the compose files). Blobs untouched for
+``BLOB_STORE_TTL`` seconds are pruned.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from app.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024  # Bytes read from an upload at a time
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobWriter:
+    """Temporary file that is hashed as it is written and moved into the store on ``commit``."""
+
+    def __init__(self, store):
+        self.store = store
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=store.tmp_dir, prefix="upload-")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self.hasher.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        """Digest of the written content; identical content already stored is kept and this copy dropped."""
+        self.file.close()
+        digest = self.hasher.hexdigest()
+        path = self.store.path(digest)
+        if os.path.exists(path):
+            os.remove(self.tmp_path)
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp_path, path)
+        return digest
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class BlobStore:
+    """Blobs stored as ``<root>/<digest[:2]>/<digest>``."""
+
+    def __init__(self, root=None):
+        self.root = root or settings.BLOB_STORE_DIR
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def path(self, digest):
+        if not _DIGEST.match(digest or ""):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def writer(self):
+        return BlobWriter(self)
+
+    def put(self, data):
+        writer = self.writer()
+        try:
+            writer.write(data)
+            return writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def touch(self, digest):
+        """Mark an existing blob as used again (it is pruned by age)."""
+        os.utime(self.path(digest))
+
+    def open_path(self, digest):
+        """Filesystem path of a stored blob (raises FileNotFoundError when it is missing)."""
+        path = self.path(digest)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Blob {digest} not found in {self.root} (the API and workers must share BLOB_STORE_DIR)")
+        return path
+
+    def get(self, digest):
+        with open(self.open_path(digest), "rb") as f:
+            return f.read()
+
+    def prune(self, max_age=None):
+        """Delete blobs (and abandoned temporary files) older than ``max_age`` seconds; returns how many."""
+        max_age = settings.BLOB_STORE_TTL if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def maybe_prune(self):
+        """Prune in a background thread at most once per ``BLOB_STORE_PRUNE_INTERVAL``."""
+        with self._prune_lock:
+            if time.monotonic() - self._last_prune < settings.BLOB_STORE_PRUNE_INTERVAL:
+                return
+            self._last_prune = time.monotonic()
+
+        def run():
+            try:
+                removed = self.prune()
+                if removed:
+                    logging.info(f"Pruned {removed} blobs from {self.root}")
+            except Exception as e:
+                logging.warning(f"Blob store prune failed: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_blob_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
+
+async def spool_upload(upload, store=None, expected_digest=None):
+    """Stream an upload (anything with an async ``read(size)``) into the store; returns its digest.
+
+    Chunks are hashed and written on a worker thread, never on the event loop. When
+    the client announces the content's SHA-256 as ``expected_digest`` and that blob is
+    already stored, the upload is not read at all.
+    """
+    store = store or get_blob_store()
+    if expected_digest:
+        expected_digest = expected_digest.lower()
+        if _DIGEST.match(expected_digest) and store.exists(expected_digest):
+            store.touch(expected_digest)
+            return expected_digest
+    writer = await asyncio.to_thread(store.writer)
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(writer.write, chunk)
+        digest = await asyncio.to_thread(writer.commit)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    store.maybe_prune()
+    return digest
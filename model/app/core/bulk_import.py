@@ -0,0 +1,160 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from pymongo import UpdateOne
+from app.core.catalog import add_to_resident_catalog, get_catalog
+from app.core.result_cache import bump_generation
+from app.core.catalog_sync import SEQ_FIELD, stamp
+from app.core.config import settings
+from app.core.db import get_products_collection
+from app.core.ingest import prepare_images, product_document
+
+REQUIRED_FIELDS = ("name", "price", "description", "category")
+
+class DirectoryImageSource:
+    """Manifest images read from a directory (paths relative to it, or bare file names)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def read(self, path):
+        for candidate in (os.path.join(self.root, path), os.path.join(self.root, os.path.basename(path))):
+            if os.path.isfile(candidate):
+                with open(candidate, "rb") as f:
+                    return f.read()
+        raise FileNotFoundError(f"Image not found: {path}")
+
+class ZipImageSource:
+    """Manifest images read from a zip archive (a path or the raw bytes)."""
+
+    def __init__(self, archive):
+        self.zip = zipfile.ZipFile(io.BytesIO(archive) if isinstance(archive, (bytes, bytearray)) else archive)
+        self.names = {}
+        for name in self.zip.namelist():
+            if not name.endswith("/"):
+                self.names.setdefault(name, name)
+                self.names.setdefault(os.path.basename(name), name)
+
+    def read(self, path):
+        name = self.names.get(os.path.normpath(path)) or self.names.get(os.path.basename(path))
+        if name is None:
+            raise FileNotFoundError(f"Image not found in archive: {path}")
+        return self.zip.read(name)
+
+def load_manifest(manifest):
+    """Product entries of a ``products.json``-style manifest (a path, bytes or an already parsed list)."""
+    if isinstance(manifest, (bytes, bytearray)):
+        manifest = json.loads(manifest)
+    elif isinstance(manifest, (str, os.PathLike)):
+        with open(manifest, "r") as f:
+            manifest = json.load(f)
+    if not isinstance(manifest, list):
+        raise ValueError("Manifest must be a JSON array of products")
+    return manifest
+
+def manifest_key(entry):
+    """Stable identity of a manifest entry, stored as ``import_key`` so re-runs skip it."""
+    return hashlib.sha256(json.dumps(entry, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def entry_images(entry):
+    images = entry.get("images", entry.get("image")) or []
+    return [images] if isinstance(images, str) else list(images)
+
+def import_products(manifest, source, products_col=None, catalog=None, storage=None, chunk_size=None, progress=None):
+    """Import every product of ``manifest`` with images read from ``source``.
+
+    Products are processed in chunks of ``chunk_size``: one lookup skips entries a
+    previous (interrupted) run already committed, the images of the whole chunk are
+    deduplicated, embedded and uploaded together (``prepare_images``), and the chunk
+    is committed with one unordered ``bulk_write`` of upserts keyed by ``import_key``.
+    Running the same manifest again therefore resumes where it stopped.
+
+    ``progress(done, total, stats)`` is called after every chunk. Returns the stats.
+    """
+    entries = load_manifest(manifest)
+    products_col = products_col if products_col is not None else get_products_collection()
+    catalog = catalog if catalog is not None else get_catalog()
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    stats = {
+        "total": len(entries),
+        "imported": 0,
+        "skipped": 0,
+        "duplicates": 0,
+        "failed": 0,
+        "images": 0,
+        "duplicate_images": 0,
+        "image_errors": 0,
+        "error_details": [],
+    }
+    start = time.perf_counter()
+    for offset in range(0, len(entries), chunk_size):
+        chunk = entries[offset:offset + chunk_size]
+        keys = [manifest_key(entry) for entry in chunk]
+        done = {doc["import_key"] for doc in products_col.find({"import_key": {"$in": keys}}, {"import_key": 1, "_id": 0})}
+
+        pending, groups = [], []
+        for entry, key in zip(chunk, keys):
+            if key in done:
+                stats["skipped"] += 1
+                continue
+            missing = [field for field in REQUIRED_FIELDS if entry.get(field) is None]
+            if missing:
+                stats["failed"] += 1
+                stats["error_details"].append(f"{entry.get('name', '?')}: missing {', '.join(missing)}")
+                continue
+            images = []
+            for path in entry_images(entry):
+                try:
+                    images.append(source.read(path))
+                except Exception as e:
+                    stats["image_errors"] += 1
+                    stats["error_details"].append(f"{entry['name']}: {e}")
+            pending.append((entry, key))
+            groups.append(images)
+
+        docs = []
+        for (entry, key), images in zip(pending, prepare_images(groups, products_col, catalog, storage)):
+            stats["duplicate_images"] += images["exact_duplicates"] + images["near_duplicates"]
+            stats["image_errors"] += images["errors"]
+            stats["error_details"].extend(f"{entry['name']}: {detail}" for detail in images["error_details"])
+            if not images["image_urls"]:
+                if images["errors"] or not (images["exact_duplicates"] or images["near_duplicates"]):
+                    stats["failed"] += 1
+                else:
+                    stats["duplicates"] += 1
+                continue
+            doc = product_document(entry, images)
+            doc["import_key"] = key
+            docs.append(doc)
+
+        if docs:
+            # One sequence block per chunk; the sequences of upserts that match are never filled
+            stamp(docs)
+            ops = [UpdateOne({"import_key": doc["import_key"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs]
+            result = products_col.bulk_write(ops, ordered=False)
+            inserted = []
+            for op_index, product_id in result.upserted_ids.items():
+                docs[op_index]["_id"] = product_id
+                inserted.append(docs[op_index])
+                stats["imported"] += 1
+                stats["images"] += len(docs[op_index]["image_urls"])
+            add_to_resident_catalog(inserted)
+            # An upsert that matched was committed concurrently by another run
+            stats["skipped"] += len(ops) - len(result.upserted_ids)
+            if inserted:
+                # Cached search results predate this chunk's products
+                bump_generation(max(doc[SEQ_FIELD] for doc in inserted))
+
+        elapsed = time.perf_counter() - start
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["products_per_second"] = round(stats["imported"] / elapsed, 2) if elapsed > 0 else 0.0
+        logging.info(f"Bulk import: {offset + len(chunk)}/{len(entries)} processed, {stats['imported']} imported ({stats['products_per_second']} products/s)")
+        if progress:
+            progress(offset + len(chunk), len(entries), stats)
+    stats.setdefault("elapsed_seconds", 0.0)
+    stats.setdefault("products_per_second", 0.0)
+    return stats
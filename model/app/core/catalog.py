@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from bson import ObjectId
+from app.core.db import get_products_collection
+from app.core.catalog_sync import SEQ_FIELD, SyncCheckpoint, current_sequence, reserve_sequence
+from app.core.result_cache import bump_generation
+from app.core.vector_store import create_vector_store, get_vector_store_class
+from app.core.embedding_codec import decode_embeddings
+from app.core.text_index import InvertedIndex
+from app.core.perceptual_hash import BKTree
+from app.core.config import settings
+
+class ProductCatalog:
+    """Worker-resident copy of the product catalog.
+
+    Product metadata is kept without embeddings in ``products``; similarity search is
+    delegated to ``store``, the VectorStore selected by ``VECTOR_BACKEND``, keyword
+    search to ``text_index``, a BM25 inverted index over the product text, and
+    near-duplicate image lookups to ``phash_index``, a BK-tree of perceptual hashes.
+
+    The catalog is kept current in place: ``sync`` pulls the products written since
+    its checkpoint (see ``catalog_sync``), appends new ones to every index and
+    tombstones deleted or replaced ones. Tombstoned slots are only reclaimed by the
+    next full reload (``CATALOG_REFRESH_SECONDS``).
+    """
+
+    def __init__(self, ids, products, store, seqs=None, checkpoint=0):
+        self.ids = ids
+        self.products = products
+        self.store = store
+        self.index_of = {product_id: i for i, product_id in enumerate(ids)}
+        self.text_index = InvertedIndex()
+        self.phash_index = BKTree()
+        for product_id, product in zip(ids, products):
+            self.text_index.add(product_id, product)
+            self._index_phashes(product_id, product)
+        self.seq_of = dict(zip(ids, seqs if seqs is not None else [0] * len(ids)))
+        self.sync_state = SyncCheckpoint(checkpoint)
+        for seq in self.seq_of.values():
+            self.sync_state.applied(seq)
+        self.tombstones = 0
+        self.lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, products_col=None):
+        """Read every product from MongoDB once (embeddings only for resident backends)."""
+        products_col = products_col if products_col is not None else get_products_collection()
+        resident = get_vector_store_class().resident
+        projection = None if resident else {"embeddings": 0}
+        # Read before the scan: products written while it runs are pulled by the next sync
+        checkpoint = current_sequence()
+        settled_before = time.time() - settings.CATALOG_SYNC_GAP_SECONDS
+        ids, products, embeddings, seqs = [], [], [], []
+        seen, settled = set(), 0
+        # Tombstones are read too, only so that their sequences count as seen
+        for doc in products_col.find({}, projection):
+            seq = doc.pop(SEQ_FIELD, 0)
+            seen.add(seq)
+            if doc.get("deleted"):
+                continue
+            product_id = doc.pop("_id")
+            # Sequences are reserved in order: all those below one inserted before the gap window are settled
+            if isinstance(product_id, ObjectId) and product_id.generation_time.timestamp() < settled_before:
+                settled = max(settled, seq)
+            ids.append(str(product_id))
+            seqs.append(seq)
+            # Packed documents decode straight into normalized float32 rows
+            embeddings.append(decode_embeddings(doc.pop("embeddings", None)))
+            products.append(doc)
+        store = create_vector_store(ids, embeddings)
+        logging.info(f"Loaded resident catalog: {len(products)} products ({type(store).__name__})")
+        catalog = cls(ids, products, store, seqs, checkpoint)
+        # Reserved before the checkpoint but not committed yet when the scan passed them
+        catalog.sync_state.expect(set(range(settled + 1, checkpoint + 1)) - seen)
+        return catalog
+
+    def __len__(self):
+        return len(self.index_of)
+
+    def product(self, product_id):
+        return self.products[self.index_of[product_id]]
+
+    def apply_changes(self, docs):
+        """Apply inserted, replaced or deleted (``deleted: true``) product documents in place.
+
+        Documents already applied at their ``sync_seq`` are skipped. Only resident stores
+        are written; backends that keep their own index outside the worker (Atlas) are
+        written by the process that made the change (``add_to_resident_catalog``,
+        ``delete_product``). Returns how many documents changed the catalog.
+        """
+        changed = 0
+        additions = {}
+        with self.lock:
+            for doc in docs:
+                product_id = str(doc["_id"])
+                seq = doc.get(SEQ_FIELD, 0)
+                self.sync_state.applied(seq)
+                if product_id in self.seq_of and seq <= self.seq_of[product_id]:
+                    continue
+                self.seq_of[product_id] = seq
+                if product_id in self.index_of:
+                    self._tombstone(product_id)
+                additions.pop(product_id, None)
+                if not doc.get("deleted"):
+                    additions[product_id] = doc
+                changed += 1
+            if self.store.resident and additions:
+                # One append to the matrix (and ANN index) for the whole batch
+                self.store.add_many([(product_id, decode_embeddings(doc.get("embeddings"))) for product_id, doc in additions.items()])
+            for product_id, doc in additions.items():
+                product = {k: v for k, v in doc.items() if k not in ("_id", "embeddings", SEQ_FIELD)}
+                self.index_of[product_id] = len(self.ids)
+                self.ids.append(product_id)
+                self.products.append(product)
+                self.text_index.add(product_id, product)
+                self._index_phashes(product_id, product)
+        return changed
+
+    def _tombstone(self, product_id):
+        i = self.index_of.pop(product_id)
+        product, self.products[i] = self.products[i], None
+        self.text_index.remove(product_id)
+        for phash in product.get("image_phashes") or []:
+            self.phash_index.remove(phash, product_id)
+        if self.store.resident:
+            self.store.remove(product_id)
+        self.tombstones += 1
+
+    def sync(self, products_col=None):
+        """Pull and apply the products written since the last sync; returns how many changed the catalog.
+
+        Each round trip is one range query on the indexed ``sync_seq``, so the cost
+        follows the number of changes, not the size of the catalog.
+        """
+        products_col = products_col if products_col is not None else get_products_collection()
+        projection = None if self.store.resident else {"embeddings": 0}
+        batch_size = settings.CATALOG_SYNC_BATCH_SIZE
+        changed = 0
+        with self._sync_lock:
+            while True:
+                with self.lock:
+                    query = self.sync_state.delta_query()
+                docs = list(products_col.find(query, projection).sort(SEQ_FIELD, 1).limit(batch_size))
+                changed += self.apply_changes(docs)
+                with self.lock:
+                    self.sync_state.advance()
+                if len(docs) < batch_size:
+                    break
+        if changed:
+            logging.info(f"Catalog sync: applied {changed} changes, {len(self)} products (checkpoint {self.sync_state.checkpoint})")
+        return changed
+
+    def caught_up(self, generation):
+        """Whether every change up to the result-cache ``generation`` (a write sequence) is applied."""
+        return self.sync_state.checkpoint >= generation
+
+    def _index_phashes(self, product_id, product):
+        for phash in product.get("image_phashes") or []:
+            self.phash_index.add(phash, product_id)
+
+    def near_duplicates(self, phash, max_distance=None):
+        """Products holding an image within ``max_distance`` bits of ``phash``: ``[(product_id, distance), ...]``."""
+        max_distance = settings.PHASH_MAX_DISTANCE if max_distance is None else max_distance
+        with self.lock:
+            return self.phash_index.search(phash, max_distance)
+
+    def search(self, query_embedding, threshold, product_ids=None):
+        """Match a query embedding; returns ``[(product_id, [(image_index, similarity), ...]), ...]``."""
+        with self.lock:
+            hits = self.store.search(query_embedding, threshold, product_ids)
+            return [(product_id, image_hits) for product_id, image_hits in hits if product_id in self.index_of]
+
+    def search_many(self, query_embeddings, threshold, product_ids=None):
+        """Match several query embeddings at once (best similarity per image over the queries)."""
+        with self.lock:
+            hits = self.store.search_many(query_embeddings, threshold, product_ids)
+            return [(product_id, image_hits) for product_id, image_hits in hits if product_id in self.index_of]
+
+    def text_search(self, query, product_ids=None, limit=None):
+        """BM25 keyword search; returns ``[(product_id, score, matched_terms), ...]`` best first."""
+        with self.lock:
+            return self.text_index.search(query, product_ids, limit)
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_watcher = None
+
+def get_catalog():
+    """Return the resident catalog, loading it on first use and reloading it once stale.
+
+    Changes made by other processes are pulled by the catalog watcher thread, or
+    here on every call when ``CATALOG_SYNC_INTERVAL_SECONDS`` is 0.
+    """
+    global _catalog
+    with _catalog_lock:
+        stale = _catalog is not None and time.time() - _catalog.loaded_at > settings.CATALOG_REFRESH_SECONDS
+        if _catalog is None or stale:
+            _catalog = ProductCatalog.load()
+        catalog = _catalog
+    if settings.CATALOG_SYNC_INTERVAL_SECONDS > 0:
+        start_catalog_watcher()
+    else:
+        catalog.sync()
+    return catalog
+
+def _watch():
+    while True:
+        time.sleep(settings.CATALOG_SYNC_INTERVAL_SECONDS)
+        catalog = _catalog
+        if catalog is None:
+            continue
+        try:
+            catalog.sync()
+        except Exception as e:
+            logging.warning(f"Catalog sync failed: {e}")
+
+def start_catalog_watcher():
+    """Sync the resident catalog every ``CATALOG_SYNC_INTERVAL_SECONDS`` from a daemon thread (one per process)."""
+    global _watcher
+    with _catalog_lock:
+        # A forked worker inherits the object but not the thread
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch, name="catalog-sync", daemon=True)
+            _watcher.start()
+
+def add_to_resident_catalog(product_docs):
+    """Make newly inserted products (documents carrying their ``_id``) searchable.
+
+    Updates this process's catalog if it holds one; backends that persist their own
+    index (Atlas) are always written here, even when this process's catalog sync has
+    already applied the documents. Other workers pick the products up with their next sync.
+    """
+    if not product_docs:
+        return
+    with _catalog_lock:
+        if not get_vector_store_class().resident:
+            store = _catalog.store if _catalog is not None else create_vector_store()
+            store.add_many([(str(doc["_id"]), decode_embeddings(doc.get("embeddings"))) for doc in product_docs])
+        if _catalog is not None:
+            _catalog.apply_changes(product_docs)
+
+def delete_product(product_id, products_col=None):
+    """Delete a product everywhere; returns False when there is no such product.
+
+    The document is kept as a tombstone (``deleted: true`` under a new ``sync_seq``,
+    without embeddings or image hashes) so that every worker's sync removes it.
+    """
+    products_col = products_col if products_col is not None else get_products_collection()
+    seq = reserve_sequence()
+    result = products_col.update_one(
+        {"_id": ObjectId(product_id), "deleted": {"$ne": True}},
+        {"$set": {"deleted": True, SEQ_FIELD: seq}, "$unset": {"embeddings": "", "image_hashes": "", "image_phashes": ""}},
+    )
+    if not result.matched_count:
+        return False
+    with _catalog_lock:
+        if not get_vector_store_class().resident:
+            store = _catalog.store if _catalog is not None else create_vector_store()
+            store.remove(str(product_id))
+        if _catalog is not None:
+            _catalog.apply_changes([{"_id": product_id, "deleted": True, SEQ_FIELD: seq}])
+    # Cached search results may still rank it
+    bump_generation(seq)
+    return True
@@ -0,0 +1,176 @@
+import numpy as np
+from app.core.config import settings
+
+
+def normalize_rows(vectors):
+    """L2-normalize a 1-D vector or each row of a 2-D matrix as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def grow(buffer, size):
+    """Return ``buffer`` if it holds ``size`` rows, else a copy with at least doubled capacity."""
+    if len(buffer) >= size:
+        return buffer
+    grown = np.zeros((max(size, 2 * len(buffer)),) + buffer.shape[1:], dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+class CatalogMatrix:
+    """All catalog image embeddings packed into one contiguous, pre-normalized float32 matrix.
+
+    Row ``i`` of ``vectors`` is one product image. ``offsets`` is the image->product
+    offset table: the images of product ``p`` are rows ``offsets[p]:offsets[p + 1]``,
+    in the same order as the product's ``image_urls``/``image_hashes``.
+
+    The arrays are views over buffers with spare capacity, so ``append`` copies only
+    the new products (plus an amortized doubling now and then), not the catalog.
+    """
+
+    def __init__(self, vectors, offsets):
+        self._vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        counts = np.diff(self._offsets)
+        self._image_product = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        # reduceat misbehaves on empty segments, so only reduce over products that own images
+        self._nonempty = np.flatnonzero(counts > 0)
+        self.num_images = len(self._vectors)
+        self.num_products = len(counts)
+        self._num_nonempty = len(self._nonempty)
+
+    @property
+    def vectors(self):
+        return self._vectors[:self.num_images]
+
+    @property
+    def offsets(self):
+        return self._offsets[:self.num_products + 1]
+
+    @property
+    def image_product(self):
+        return self._image_product[:self.num_images]
+
+    @property
+    def nonempty(self):
+        return self._nonempty[:self._num_nonempty]
+
+    def append(self, embeddings_per_product, normalized=False):
+        """Add products at the end of the matrix in place; returns their new image rows."""
+        new = CatalogMatrix.from_embeddings(embeddings_per_product, dim=self._vectors.shape[1], normalized=normalized)
+        first_row, first_product = self.num_images, self.num_products
+        if first_row == 0 and new._vectors.shape[1] != self._vectors.shape[1]:
+            self._vectors = np.zeros((0, new._vectors.shape[1]), dtype=np.float32)
+        end_row, end_product = first_row + new.num_images, first_product + new.num_products
+        self._vectors = grow(self._vectors, end_row)
+        self._vectors[first_row:end_row] = new.vectors
+        self._image_product = grow(self._image_product, end_row)
+        self._image_product[first_row:end_row] = first_product + new.image_product
+        self._offsets = grow(self._offsets, end_product + 1)
+        self._offsets[first_product + 1:end_product + 1] = first_row + new.offsets[1:]
+        self._nonempty = grow(self._nonempty, self._num_nonempty + new._num_nonempty)
+        self._nonempty[self._num_nonempty:self._num_nonempty + new._num_nonempty] = first_product + new.nonempty
+        self.num_images, self.num_products = end_row, end_product
+        self._num_nonempty += new._num_nonempty
+        return np.arange(first_row, end_row)
+
+    @classmethod
+    def from_embeddings(cls, embeddings_per_product, dim=None, normalized=False):
+        """Build the matrix from one list of embeddings per product.
+
+        ``normalized`` skips the L2 normalization for rows that are already unit length
+        (as decoded from storage by ``decode_embeddings``).
+        """
+        blocks = []
+        offsets = [0]
+        for embs in embeddings_per_product:
+            block = np.asarray(embs, dtype=np.float32)
+            if block.size == 0:
+                offsets.append(offsets[-1])
+                continue
+            block = block.reshape(-1, block.shape[-1])
+            blocks.append(block)
+            offsets.append(offsets[-1] + block.shape[0])
+        if blocks:
+            vectors = np.concatenate(blocks, axis=0)
+            vectors = vectors if normalized else normalize_rows(vectors)
+        else:
+            vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        return cls(vectors, offsets)
+
+    @classmethod
+    def from_products(cls, products, dim=None):
+        """Build the matrix from product documents carrying an ``embeddings`` field (packed or lists)."""
+        from app.core.embedding_codec import decode_embeddings
+        dim = dim or settings.EMBEDDING_DIMENSION
+        return cls.from_embeddings((decode_embeddings(p.get("embeddings"), dim) for p in products), dim=dim, normalized=True)
+
+    def image_scores(self, query_embedding):
+        """Cosine similarity of the query against every catalog image, clipped to [0, 1]."""
+        query = normalize_rows(query_embedding)
+        return np.clip(self.vectors @ query, 0.0, 1.0)
+
+    def product_scores(self, image_scores):
+        """Per-product max of ``image_scores`` as a single segment reduction (0 for image-less products)."""
+        best = np.zeros(self.num_products, dtype=np.float32)
+        nonempty = self.nonempty
+        if len(nonempty):
+            best[nonempty] = np.maximum.reduceat(image_scores, self.offsets[nonempty])
+        return best
+
+    def search(self, query_embedding, threshold, product_mask=None):
+        """Return ``[(product_index, [(image_index, similarity), ...]), ...]`` best match first.
+
+        A product is returned when at least one of its images reaches ``threshold``;
+        image indices are local to the product. ``product_mask`` optionally restricts
+        the search to a boolean subset of products.
+        """
+        if self.num_images == 0:
+            return []
+        return self.rank(self.image_scores(query_embedding), threshold, product_mask)
+
+    def search_many(self, query_embeddings, threshold, product_mask=None):
+        """Like ``search`` for several queries at once (e.g. video frames).
+
+        All queries are scored with a single queries x catalog matrix product and each
+        image keeps its best similarity over the queries.
+        """
+        if self.num_images == 0 or len(query_embeddings) == 0:
+            return []
+        queries = normalize_rows(query_embeddings).reshape(-1, self._vectors.shape[1])
+        sims = np.clip(queries @ self.vectors.T, 0.0, 1.0).max(axis=0)
+        return self.rank(sims, threshold, product_mask)
+
+    def rank(self, sims, threshold, product_mask=None):
+        """Threshold per-image similarities and group them by product, best product first."""
+        best = self.product_scores(sims)
+        # Image-less products score 0 but have nothing to match, whatever the threshold
+        hit = (best >= threshold) & (np.diff(self.offsets) > 0)
+        if product_mask is not None:
+            hit &= product_mask
+        hit_products = np.flatnonzero(hit)
+        order = hit_products[np.argsort(-best[hit_products], kind="stable")]
+        image_hit = sims >= threshold
+        results = []
+        for p in order:
+            start, end = self.offsets[p], self.offsets[p + 1]
+            local = np.flatnonzero(image_hit[start:end])
+            results.append((int(p), [(int(i), float(sims[start + i])) for i in local]))
+        return results
+
+    def group_hits(self, rows, sims, threshold, product_mask=None):
+        """Group scored candidate image rows (e.g. ANN results) into the ``search`` output format."""
+        rows = np.asarray(rows, dtype=np.int64)
+        sims = np.asarray(sims, dtype=np.float32)
+        keep = sims >= threshold
+        rows, sims = rows[keep], sims[keep]
+        products = self.image_product[rows]
+        if product_mask is not None:
+            keep = product_mask[products]
+            rows, sims, products = rows[keep], sims[keep], products[keep]
+        grouped = {}
+        for row, sim, p in zip(rows.tolist(), sims.tolist(), products.tolist()):
+            grouped.setdefault(p, []).append((row - int(self.offsets[p]), sim))
+        ranked = sorted(grouped.items(), key=lambda item: max(sim for _, sim in item[1]), reverse=True)
+        return [(p, sorted(image_hits)) for p, image_hits in ranked]
@@ -0,0 +1,102 @@
+"""Incremental synchronization of worker-resident catalogs.
+
+Every product write (insert or deletion) takes the next value of a counter in
+MongoDB and stores it on the document as ``sync_seq``. A worker remembers the
+sequence it has synced up to and periodically fetches only the documents above it
+(one indexed range query), so new products become searchable within
+``CATALOG_SYNC_INTERVAL_SECONDS`` at a cost proportional to the change, not to the
+catalog. Only a plain collection is needed: no change streams, so a standalone
+``mongod`` or a local stand-in works too.
+
+Sequences are reserved before the write is committed, so a document can appear
+after a higher one has already been synced. ``SyncCheckpoint`` therefore only
+advances over a missing sequence once it has stayed missing for
+``CATALOG_SYNC_GAP_SECONDS`` (a writer that crashed, or an upsert that matched an
+existing document, never fills its sequence). The same holds across a full load:
+sequences reserved before it but not yet committed when the scan ran are re-opened
+with ``SyncCheckpoint.expect``.
+"""
+import time
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.db import get_counters_collection
+
+SEQ_FIELD = "sync_seq"
+COUNTER_ID = "products"
+
+def reserve_sequence(count=1, counters_col=None):
+    """Reserve ``count`` consecutive sequence numbers; returns the first one."""
+    counters_col = counters_col if counters_col is not None else get_counters_collection()
+    counter = counters_col.find_one_and_update(
+        {"_id": COUNTER_ID}, {"$inc": {"seq": count}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"] - count + 1
+
+def current_sequence(counters_col=None):
+    """Last reserved sequence number (0 before the first write)."""
+    counters_col = counters_col if counters_col is not None else get_counters_collection()
+    counter = counters_col.find_one({"_id": COUNTER_ID})
+    return counter["seq"] if counter else 0
+
+def stamp(docs, counters_col=None):
+    """Give each document of ``docs`` the next sequence number, with one counter round trip."""
+    if docs:
+        first = reserve_sequence(len(docs), counters_col)
+        for i, doc in enumerate(docs):
+            doc[SEQ_FIELD] = first + i
+    return docs
+
+class SyncCheckpoint:
+    """Highest sequence below which every change has been applied (or given up on).
+
+    Sequences applied above the checkpoint are kept in ``pending`` and excluded from
+    the next delta query; ``missing`` records when each hole below them was first seen.
+    """
+
+    def __init__(self, checkpoint=0):
+        self.checkpoint = checkpoint
+        self.pending = set()
+        self.missing = {}
+
+    def delta_query(self):
+        """MongoDB filter of the changes not applied yet."""
+        condition = {"$gt": self.checkpoint}
+        if self.pending:
+            condition["$nin"] = sorted(self.pending)
+        return {SEQ_FIELD: condition}
+
+    def applied(self, seq):
+        if seq is not None and seq > self.checkpoint:
+            self.pending.add(seq)
+
+    def expect(self, seqs, now=None):
+        """Re-open ``seqs`` (at or below the checkpoint) so the next syncs query them again.
+
+        Every other sequence between the lowest of them and the checkpoint counts as
+        applied. The re-opened ones expire like any hole, after ``CATALOG_SYNC_GAP_SECONDS``.
+        """
+        seqs = {seq for seq in seqs if 0 < seq <= self.checkpoint}
+        if not seqs:
+            return
+        now = time.monotonic() if now is None else now
+        floor = min(seqs) - 1
+        self.pending.update(seq for seq in range(floor + 1, self.checkpoint + 1) if seq not in seqs)
+        for seq in seqs:
+            self.missing.setdefault(seq, now)
+        self.checkpoint = floor
+
+    def advance(self, now=None):
+        """Move the checkpoint over applied sequences and holes older than ``CATALOG_SYNC_GAP_SECONDS``."""
+        now = time.monotonic() if now is None else now
+        top = max(self.pending | self.missing.keys(), default=self.checkpoint)
+        for seq in range(self.checkpoint + 1, top):
+            if seq not in self.pending:
+                self.missing.setdefault(seq, now)
+        while self.checkpoint < top:
+            seq = self.checkpoint + 1
+            if seq not in self.pending and now - self.missing[seq] < settings.CATALOG_SYNC_GAP_SECONDS:
+                break
+            self.pending.discard(seq)
+            self.missing.pop(seq, None)
+            self.checkpoint = seq
+        return self.checkpoint
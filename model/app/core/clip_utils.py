@@ -1,12 +1,22 @@
+import logging
+import numpy as np
 import torch
 import clip
 from PIL import Image
 from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embedding_server import EmbeddingClient
+from app.core.inference_backends import prepare_image_encoder
+from app.core.image_decode import decode_image, downscale, iter_batches
 
 _clip_model = None
 _clip_preprocess = None
+_image_encoder = None
 _clip_device = "cuda" if torch.cuda.is_available() else "cpu"
 EMBEDDING_DIM = settings.EMBEDDING_DIMENSION  # Use configurable dimension
+_text_cache = EmbeddingCache("text")
+_image_cache = EmbeddingCache("image")
+_embedding_client = EmbeddingClient(settings.EMBEDDING_SERVER_SOCKET) if settings.EMBEDDING_SERVER_SOCKET else None
 
 def initialize_clip():
     """Initialize CLIP model and preprocess, loading only once."""
@@ -15,35 +25,116 @@ def initialize_clip():
         _clip_model, _clip_preprocess = clip.load(settings.CLIP_MODEL_NAME, device=_clip_device)
     return _clip_model, _clip_preprocess
 
-def image_to_embedding(pil_image):
-    """Convert a PIL image to a CLIP embedding using configured dimensions."""
+def get_image_encoder():
+    """Image tower on the backend selected by CLIP_IMAGE_BACKEND (warmed up and parity-checked once)."""
+    global _image_encoder
+    if _image_encoder is None:
+        model, _ = initialize_clip()
+        backend = settings.CLIP_IMAGE_BACKEND
+        if _clip_device != "cpu" and backend != "eager":
+            logging.info(f"CLIP_IMAGE_BACKEND '{backend}' targets CPU inference; using eager on {_clip_device}")
+            backend = "eager"
+        _image_encoder = prepare_image_encoder(
+            model, backend, model.visual.input_resolution, settings.CLIP_PARITY_TOLERANCE,
+            model_name=settings.CLIP_MODEL_NAME, onnx_dir=settings.CLIP_ONNX_DIR,
+        )
+    return _image_encoder
+
+def get_embedding_client():
+    """Client of the host-wide embedding server, or None when EMBEDDING_SERVER_SOCKET is unset."""
+    return _embedding_client
+
+def _check_dim(embeddings):
+    if embeddings.shape[1] != EMBEDDING_DIM:
+        raise ValueError(f"CLIP embedding must be {EMBEDDING_DIM} dimensions, got {embeddings.shape[1]}")
+    return embeddings
+
+def encode_image_tensors(image_tensors):
+    """One forward pass of the image encoder over preprocessed tensors; returns (n, dim) float32."""
+    return get_image_encoder()(torch.stack(image_tensors).to(_clip_device))
+
+def encode_texts_local(texts):
+    """One forward pass of the text encoder; returns (n, dim) float32."""
+    model, _ = initialize_clip()
+    tokens = clip.tokenize(list(texts), truncate=True).to(_clip_device)
+    with torch.no_grad():
+        return model.encode_text(tokens).float().cpu().numpy()
+
+def _encode_images(images, batch_size=8):
+    """(n, dim) embeddings of PIL images or encoded image bytes.
+
+    Images are decoded and preprocessed on the shared thread pool and streamed to the
+    model ``batch_size`` at a time, from the embedding server when configured, else
+    from the local model.
+    """
+    if _embedding_client is not None:
+        try:
+            # Shrunk on the pool before the pixels are serialized (only JPEGs are draft-decoded small)
+            rows = [_embedding_client.encode_images(batch) for batch in iter_batches(images, batch_size, lambda image: downscale(decode_image(image)))]
+            return _check_dim(np.concatenate(rows))
+        except (ConnectionError, OSError) as e:
+            logging.warning(f"Embedding server unavailable, encoding locally: {e}")
+    _, preprocess = initialize_clip()
+    rows = [encode_image_tensors(batch) for batch in iter_batches(images, batch_size, lambda image: preprocess(decode_image(image)))]
+    return _check_dim(np.concatenate(rows))
+
+def _encode_texts(texts):
+    if _embedding_client is not None:
+        try:
+            return _check_dim(_embedding_client.encode_texts(texts))
+        except (ConnectionError, OSError) as e:
+            logging.warning(f"Embedding server unavailable, encoding locally: {e}")
+    return _check_dim(encode_texts_local(texts))
+
+def image_to_embedding(pil_image, cache_key=None):
+    """Convert a PIL image to a CLIP embedding using configured dimensions.
+
+    ``cache_key`` (the SHA-256 of the image content) lets repeated images skip CLIP.
+    """
     if not isinstance(pil_image, Image.Image):
         raise ValueError("Input must be a PIL.Image.Image object")
-    model, preprocess = initialize_clip()
-    image_input = preprocess(pil_image).unsqueeze(0).to(_clip_device)
-    with torch.no_grad():
-        embedding = model.encode_image(image_input).cpu().numpy()[0]
-    if embedding.shape[0] != EMBEDDING_DIM:
-        raise ValueError(f"CLIP embedding must be {EMBEDDING_DIM} dimensions, got {embedding.shape[0]}")
+    if cache_key is not None:
+        cached = _image_cache.get(cache_key)
+        if cached is not None:
+            return cached.tolist()
+    embedding = _encode_images([pil_image])[0]
+    if cache_key is not None:
+        _image_cache.set(cache_key, embedding)
     return embedding.tolist()
 
-def batch_images_to_embeddings(pil_images, target_size=(224, 224), batch_size=8):
-    """Convert a list of PIL images to a list of CLIP embeddings using batching and resizing."""
-    if not pil_images:
+def batch_images_to_embeddings(images, batch_size=8, cache_keys=None):
+    """Convert a list of PIL images (or encoded image bytes) to a list of CLIP embeddings using batching.
+
+    Images keep their aspect ratio (CLIP's preprocess resizes and center-crops them).
+    With ``cache_keys`` (content hashes, one per image) only cache misses are run through CLIP.
+    """
+    if not images:
         return []
-    model, preprocess = initialize_clip()
-    # Resize images if needed
-    resized_images = [img.resize(target_size) for img in pil_images]
-    # Preprocess all images
-    image_inputs = torch.stack([preprocess(img) for img in resized_images]).to(_clip_device)
-    embeddings = []
-    with torch.no_grad():
-        for i in range(0, len(image_inputs), batch_size):
-            batch = image_inputs[i:i+batch_size]
-            batch_emb = model.encode_image(batch).cpu().numpy()
-            embeddings.extend(batch_emb)
-    # Ensure correct shape
-    for emb in embeddings:
-        if emb.shape[0] != EMBEDDING_DIM:
-            raise ValueError(f"CLIP embedding must be {EMBEDDING_DIM} dimensions, got {emb.shape[0]}")
-    return [emb.tolist() for emb in embeddings] 
\ No newline at end of file
+    if cache_keys is not None:
+        keys = list(cache_keys)
+        found = _image_cache.get_many(keys)
+        missing = [i for i, vector in enumerate(found) if vector is None]
+        if missing:
+            computed = _encode_images([images[i] for i in missing], batch_size)
+            _image_cache.set_many({keys[i]: vector for i, vector in zip(missing, computed)})
+            for i, vector in zip(missing, computed):
+                found[i] = vector
+        return [vector.tolist() for vector in found]
+    return _encode_images(images, batch_size).tolist()
+
+def normalize_query_text(text):
+    """Cache key form of a text query: lowercased with collapsed whitespace."""
+    return " ".join(text.lower().split())
+
+def text_to_embedding(text):
+    """Encode a text query with CLIP's text tower into the image embedding space.
+
+    Query vectors are cached (in-process LRU backed by Redis) by normalized text.
+    """
+    key = normalize_query_text(text)
+    cached = _text_cache.get(key)
+    if cached is not None:
+        return cached.tolist()
+    embedding = _encode_texts([key])[0]
+    _text_cache.set(key, embedding)
+    return embedding.tolist()
@@ -25,6 +25,14 @@ class Settings:
     CLOUDINARY_API_KEY: str = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET: str = os.getenv("CLOUDINARY_API_SECRET")
     
+    # Image Storage
+    IMAGE_STORAGE: str = os.getenv("IMAGE_STORAGE", "cloudinary").lower()  # cloudinary | http
+    IMAGE_STORAGE_URL: str = os.getenv("IMAGE_STORAGE_URL", "http://localhost:8090/images")  # Base URL of the http storage
+    UPLOAD_CONCURRENCY: int = int(os.getenv("UPLOAD_CONCURRENCY", "4"))  # Concurrent image uploads per worker process
+    UPLOAD_RETRIES: int = int(os.getenv("UPLOAD_RETRIES", "3"))
+    UPLOAD_BACKOFF_SECONDS: float = float(os.getenv("UPLOAD_BACKOFF_SECONDS", "0.5"))  # First retry delay, doubled per attempt
+    BULK_IMPORT_CHUNK_SIZE: int = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "32"))  # Products embedded and committed together by bulk imports
+    
     # Application Configuration
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     DEBUG: bool = os.getenv("DEBUG", "0").lower() in ("1", "true", "yes")
@@ -53,7 +61,52 @@ class Settings:
     # AI Model Configuration
     CLIP_MODEL_NAME: str = os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
     EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "512"))
+    CLIP_IMAGE_BACKEND: str = os.getenv("CLIP_IMAGE_BACKEND", "eager").lower()  # eager | torchscript | onnx | eager-int8 | torchscript-int8 | onnx-int8
+    CLIP_PARITY_TOLERANCE: float = float(os.getenv("CLIP_PARITY_TOLERANCE", "0.99"))  # Min cosine vs eager embeddings, else fall back to eager
+    CLIP_ONNX_DIR: str = os.getenv("CLIP_ONNX_DIR", "/tmp/clip-onnx")  # Where exported ONNX graphs are cached
+    IMAGE_DECODE_SIZE: int = int(os.getenv("IMAGE_DECODE_SIZE", "224"))  # JPEGs are draft-decoded down to this size (CLIP input resolution)
+    EMBEDDING_STORAGE_DTYPE: str = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").lower()  # float32 | float16 packing of stored product embeddings
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "500"))  # Documents rewritten per batch by the embedding migration
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # Images per forward pass when ingesting
+    PREPROCESS_THREADS: int = int(os.getenv("PREPROCESS_THREADS", "4"))  # Threads decoding/preprocessing images for CLIP
     SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
+    TEXT_SIMILARITY_THRESHOLD: float = float(os.getenv("TEXT_SIMILARITY_THRESHOLD", "0.25"))  # Text-to-image CLIP scores run much lower than image-to-image
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # In-process LRU entries per cache
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))  # Redis TTL of cached embeddings (seconds)
+    SEARCH_CACHE_TTL: int = int(os.getenv("SEARCH_CACHE_TTL", "3600"))  # Redis TTL of cached search rankings (seconds)
+    SEARCH_SINGLE_FLIGHT_TTL: int = int(os.getenv("SEARCH_SINGLE_FLIGHT_TTL", "300"))  # Longest an in-flight search is joined by identical ones (seconds)
+    BLOB_STORE_DIR: str = os.getenv("BLOB_STORE_DIR", "/tmp/taja-blobs")  # Uploads handed to workers by digest (shared by API and workers)
+    BLOB_STORE_TTL: int = int(os.getenv("BLOB_STORE_TTL", "86400"))  # Blobs unused for this long are pruned (seconds)
+    BLOB_STORE_PRUNE_INTERVAL: int = int(os.getenv("BLOB_STORE_PRUNE_INTERVAL", "600"))  # Seconds between prune passes per process
+    EMBEDDING_SERVER_SOCKET: str = os.getenv("EMBEDDING_SERVER_SOCKET", "")  # Unix socket of the host-wide embedding server (empty = load CLIP in-process)
+    EMBEDDING_SERVER_MAX_BATCH: int = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "16"))
+    EMBEDDING_SERVER_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))  # How long a request waits for others to batch with
+    PHASH_MAX_DISTANCE: int = int(os.getenv("PHASH_MAX_DISTANCE", "6"))  # Max differing bits (of 64) for a near-duplicate image
+    
+    # Search Configuration
+    CATALOG_REFRESH_SECONDS: int = int(os.getenv("CATALOG_REFRESH_SECONDS", "3600"))  # Full reload (and tombstone compaction) interval of the worker-resident catalog
+    CATALOG_SYNC_INTERVAL_SECONDS: float = float(os.getenv("CATALOG_SYNC_INTERVAL_SECONDS", "2"))  # Delta pull interval of the worker catalog watcher (0 = sync on every search)
+    CATALOG_SYNC_BATCH_SIZE: int = int(os.getenv("CATALOG_SYNC_BATCH_SIZE", "500"))  # Changed products fetched per sync query
+    CATALOG_SYNC_GAP_SECONDS: float = float(os.getenv("CATALOG_SYNC_GAP_SECONDS", "30"))  # How long a sync waits for a reserved but unwritten sequence
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "exact").lower()  # exact | hnsw | atlas
+    SEARCH_TOP_K: int = int(os.getenv("SEARCH_TOP_K", "100"))  # Images retrieved per query by the ANN/Atlas backends
+    HNSW_M: int = int(os.getenv("HNSW_M", "16"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "128"))
+    VECTOR_COLLECTION: str = os.getenv("VECTOR_COLLECTION", "product_vectors")  # Per-image vectors for Atlas $vectorSearch
+    ATLAS_NUM_CANDIDATES: int = int(os.getenv("ATLAS_NUM_CANDIDATES", "1000"))
+    VIDEO_MAX_FRAMES: int = int(os.getenv("VIDEO_MAX_FRAMES", "8"))  # Keyframes embedded per query video
+    VIDEO_CANDIDATE_FRAMES: int = int(os.getenv("VIDEO_CANDIDATE_FRAMES", "24"))  # Frames sampled before keyframe selection
+    VIDEO_SCENE_CHANGE_THRESHOLD: float = float(os.getenv("VIDEO_SCENE_CHANGE_THRESHOLD", "0.2"))
+    VIDEO_FRAME_DEDUP_SIMILARITY: float = float(os.getenv("VIDEO_FRAME_DEDUP_SIMILARITY", "0.97"))
+    SEARCH_RANKING_MODE: str = os.getenv("SEARCH_RANKING_MODE", "filter").lower()  # filter | rrf | weighted
+    HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", "60"))
+    HYBRID_VECTOR_WEIGHT: float = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.7"))  # Share of vector similarity in weighted ranking
+    SEARCH_SYNC_WAIT_SECONDS: float = float(os.getenv("SEARCH_SYNC_WAIT_SECONDS", "0"))  # Default /search wait budget (0 = always 202 + job_id)
+    SEARCH_SYNC_MAX_WAIT_SECONDS: float = float(os.getenv("SEARCH_SYNC_MAX_WAIT_SECONDS", "10"))  # Cap on the per-request wait
+    PROGRESS_MIN_INTERVAL_MS: int = int(os.getenv("PROGRESS_MIN_INTERVAL_MS", "250"))  # Closer job progress updates are coalesced
+    PROGRESS_STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("PROGRESS_STREAM_HEARTBEAT_SECONDS", "15"))  # Ping interval of idle SSE/WebSocket streams
+    PROGRESS_STREAM_TIMEOUT_SECONDS: float = float(os.getenv("PROGRESS_STREAM_TIMEOUT_SECONDS", "600"))  # Longest a progress stream stays open
     
     # Monitoring
     ENABLE_METRICS: bool = os.getenv("ENABLE_METRICS", "true").lower() in ("1", "true", "yes")
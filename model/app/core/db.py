@@ -11,6 +11,8 @@ load_dotenv()
 _client = None
 _db = None
 _products_col = None
+_vectors_col = None
+_counters_col = None
 
 def get_db():
     global _client, _db
@@ -24,4 +26,49 @@ def get_products_collection():
     if _products_col is None:
         db = get_db()
         _products_col = db[settings.MONGO_COLLECTION]
-    return _products_col 
\ No newline at end of file
+    return _products_col 
+
+def ensure_indexes():
+    """Create the regular indexes ingestion relies on (idempotent)."""
+    products_col = get_products_collection()
+    # Duplicate detection looks images up by content hash
+    products_col.create_index("image_hashes", name="image_hashes_1")
+    # Bulk imports upsert by manifest entry, which also makes them resumable
+    products_col.create_index("import_key", name="import_key_1", unique=True, sparse=True)
+    # Worker catalogs pull the products written after their last sync sequence
+    products_col.create_index("sync_seq", name="sync_seq_1", sparse=True)
+
+def get_vectors_collection():
+    """Per-image embedding documents searched with Atlas $vectorSearch (VECTOR_BACKEND=atlas)."""
+    global _vectors_col
+    if _vectors_col is None:
+        db = get_db()
+        _vectors_col = db[settings.VECTOR_COLLECTION]
+    return _vectors_col
+
+def get_counters_collection():
+    """Named counters (the catalog sync sequence)."""
+    global _counters_col
+    if _counters_col is None:
+        db = get_db()
+        _counters_col = db["counters"]
+    return _counters_col
+
+def vector_index_definition():
+    """Atlas Vector Search index definition for the vectors collection."""
+    return {
+        "fields": [
+            {"type": "vector", "path": "embedding", "numDimensions": settings.EMBEDDING_DIMENSION, "similarity": "cosine"},
+            {"type": "filter", "path": "product_id"},
+        ]
+    }
+
+def ensure_vector_index():
+    """Create the Atlas vector index if it does not exist yet (Atlas clusters only)."""
+    from pymongo.operations import SearchIndexModel
+    vectors_col = get_vectors_collection()
+    existing = {index["name"] for index in vectors_col.list_search_indexes()}
+    if VECTOR_INDEX_NAME not in existing:
+        vectors_col.create_search_index(
+            SearchIndexModel(definition=vector_index_definition(), name=VECTOR_INDEX_NAME, type="vectorSearch")
+        )
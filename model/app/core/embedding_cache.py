@@ -0,0 +1,98 @@
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+import redis
+from app.core.config import settings
+
+_redis_client = None
+_redis_checked = False
+
+def get_binary_redis():
+    """Shared Redis connection returning raw bytes (None when Redis is unavailable)."""
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        try:
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+            _redis_client.ping()
+        except Exception as e:
+            _redis_client = None
+            logging.warning(f"Redis unavailable, embedding cache is in-process only: {e}")
+    return _redis_client
+
+class EmbeddingCache:
+    """Two-tier cache of float32 embeddings: an in-process LRU in front of Redis.
+
+    Redis keys are namespaced by cache kind and CLIP model, so switching models never
+    serves stale vectors. Values are stored as raw float32 bytes.
+    """
+
+    def __init__(self, namespace, max_items=None, ttl=None, redis_client=None):
+        self.namespace = namespace
+        self.max_items = max_items or settings.EMBEDDING_CACHE_SIZE
+        self.ttl = ttl or settings.EMBEDDING_CACHE_TTL
+        self._redis = redis_client
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        return self._redis if self._redis is not None else get_binary_redis()
+
+    def redis_key(self, key):
+        return f"emb:{self.namespace}:{settings.CLIP_MODEL_NAME}:{key}"
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Cached vectors for ``keys`` (None where missing); Redis is hit once for all LRU misses."""
+        found = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[i] = vector
+                else:
+                    missing.append(i)
+        client = self.redis
+        if missing and client is not None:
+            try:
+                values = client.mget([self.redis_key(keys[i]) for i in missing])
+            except Exception as e:
+                logging.warning(f"Embedding cache read failed: {e}")
+                values = [None] * len(missing)
+            for i, value in zip(missing, values):
+                if value:
+                    vector = np.frombuffer(value, dtype=np.float32)
+                    found[i] = vector
+                    self._remember(keys[i], vector)
+        return found
+
+    def set(self, key, vector):
+        self.set_many({key: vector})
+
+    def set_many(self, items):
+        """Store ``{key: vector}`` in both tiers (one pipelined Redis round trip)."""
+        vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in items.items()}
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        client = self.redis
+        if vectors and client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, vector in vectors.items():
+                    pipe.set(self.redis_key(key), vector.tobytes(), ex=self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logging.warning(f"Embedding cache write failed: {e}")
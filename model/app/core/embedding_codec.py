@@ -0,0 +1,97 @@
+"""Binary storage of product embeddings in MongoDB.
+
+A product's image embeddings are stored as one BSON binary value: the L2-normalized
+rows packed as float32 (or float16 with ``EMBEDDING_STORAGE_DTYPE=float16``), with
+the dtype recorded in the binary subtype. That is 4 (or 2) bytes per component
+instead of a BSON double plus its array key, and readers decode straight into a
+NumPy matrix without building Python lists or normalizing again.
+
+Documents written before this format hold ``List[List[float]]``; ``decode_embeddings``
+reads both, and ``migrate_embeddings`` rewrites the old ones in place.
+"""
+import logging
+import time
+import numpy as np
+from bson import Binary, encode as bson_encode
+from pymongo import UpdateOne
+from app.core.config import settings
+
+# User-defined BSON binary subtypes (128-255) identifying the packed dtype
+EMBEDDING_SUBTYPES = {"float32": 0x80, "float16": 0x81}
+_DTYPE_OF_SUBTYPE = {subtype: np.dtype(name) for name, subtype in EMBEDDING_SUBTYPES.items()}
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def encode_embeddings(vectors, dtype=None):
+    """Pack ``(n, dim)`` embeddings (lists or an array) as L2-normalized rows in a BSON binary."""
+    dtype = (dtype or settings.EMBEDDING_STORAGE_DTYPE).lower()
+    if dtype not in EMBEDDING_SUBTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}'. Choose one of: {', '.join(EMBEDDING_SUBTYPES)}")
+    rows = np.asarray(vectors, dtype=np.float32)
+    rows = rows.reshape(-1, rows.shape[-1]) if rows.size else np.zeros((0, 0), dtype=np.float32)
+    return Binary(_normalize(rows).astype(dtype).tobytes(), EMBEDDING_SUBTYPES[dtype])
+
+def is_packed(value):
+    return isinstance(value, Binary) and value.subtype in _DTYPE_OF_SUBTYPE
+
+def decode_embeddings(value, dim=None):
+    """``(n, dim)`` L2-normalized float32 matrix of a stored ``embeddings`` value (binary or legacy lists)."""
+    dim = dim or settings.EMBEDDING_DIMENSION
+    if value is None or len(value) == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    if is_packed(value):
+        dtype = _DTYPE_OF_SUBTYPE[value.subtype]
+        if len(value) % (dim * dtype.itemsize):
+            raise ValueError(f"Packed embeddings of {len(value)} bytes are not {dtype.name} rows of dimension {dim}")
+        rows = np.frombuffer(value, dtype=dtype).reshape(-1, dim)
+        if dtype == np.float32:
+            return rows
+        # Half precision rounding moves the norm slightly off 1
+        return _normalize(rows.astype(np.float32))
+    rows = np.asarray(value, dtype=np.float32)
+    return _normalize(rows.reshape(-1, rows.shape[-1]))
+
+def migrate_embeddings(products_col=None, batch_size=None, dtype=None, reencode=False, progress=None):
+    """Rewrite stored embeddings into the packed format, batch by batch, while the app keeps running.
+
+    Only documents still holding lists are touched, unless ``reencode`` also repacks
+    binary ones (e.g. to switch between float32 and float16). Batches are paged by
+    ``_id``, so an interrupted run can simply be started again. ``progress(done, total,
+    stats)`` is called after each batch. Returns the stats.
+    """
+    if products_col is None:
+        from app.core.db import get_products_collection
+        products_col = get_products_collection()
+    batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+    dtype = (dtype or settings.EMBEDDING_STORAGE_DTYPE).lower()
+    query = {"embeddings": {"$exists": True}} if reencode else {"embeddings": {"$type": "array"}}
+    total = products_col.count_documents(query)
+    stats = {"migrated": 0, "bytes_before": 0, "bytes_after": 0, "elapsed_seconds": 0.0}
+    start = time.perf_counter()
+    last_id = None
+    done = 0
+    while True:
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        docs = list(products_col.find(page, {"embeddings": 1}).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        ops = []
+        for doc in docs:
+            packed = encode_embeddings(decode_embeddings(doc["embeddings"]), dtype)
+            stats["bytes_before"] += len(bson_encode({"embeddings": doc["embeddings"]}))
+            stats["bytes_after"] += len(bson_encode({"embeddings": packed}))
+            # Skip documents deleted or re-embedded since they were read, instead of restoring stale embeddings
+            current = doc["embeddings"] if reencode else {"$type": "array"}
+            ops.append(UpdateOne({"_id": doc["_id"], "embeddings": current, "deleted": {"$ne": True}}, {"$set": {"embeddings": packed}}))
+        result = products_col.bulk_write(ops, ordered=False)
+        stats["migrated"] += result.matched_count
+        done += len(docs)
+        stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        logging.info(f"Embedding migration: {done}/{total} documents rewritten")
+        if progress:
+            progress(done, total, stats)
+    stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return stats
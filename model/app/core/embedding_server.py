@@ -0,0 +1,226 @@
+"""Host-wide CLIP embedding server.
+
+One process per host loads the model once and serves every API and worker process
+over a unix socket. Concurrent requests are coalesced into dynamic batches: the
+first queued input waits at most ``EMBEDDING_SERVER_MAX_WAIT_MS`` for others, up
+to ``EMBEDDING_SERVER_MAX_BATCH`` inputs per forward pass.
+
+Run it with ``python -m app.core.embedding_server`` and point clients at it with
+``EMBEDDING_SERVER_SOCKET``.
+
+Wire format (both directions): a 4-byte big-endian header length, a JSON header,
+then the payload announced by the header. Images travel as raw RGB bytes,
+embeddings as float32 rows.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+from app.core.image_decode import downscale
+
+_HEADER = struct.Struct(">I")
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Connection closed")
+        received += n
+    return bytes(buf)
+
+def send_message(sock, header, payload=b""):
+    header = dict(header, payload=len(payload))
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data + payload)
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, size))
+    payload = _recv_exact(sock, header["payload"]) if header.get("payload") else b""
+    return header, payload
+
+class MicroBatcher:
+    """Runs ``fn(items) -> rows`` over dynamic batches of individually submitted items."""
+
+    def __init__(self, fn, max_batch, max_wait_ms):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                rows = self.fn([item for item, _ in batch])
+                for (_, future), row in zip(batch, rows):
+                    future.set_result(row)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.items += len(batch)
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    """Unix-socket server answering ``image``, ``text`` and ``info`` requests."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_batch=None, max_wait_ms=None):
+        from app.core import clip_utils
+        max_batch = max_batch or settings.EMBEDDING_SERVER_MAX_BATCH
+        max_wait_ms = settings.EMBEDDING_SERVER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.model, self.preprocess = clip_utils.initialize_clip()
+        self.image_batcher = MicroBatcher(clip_utils.encode_image_tensors, max_batch, max_wait_ms)
+        self.text_batcher = MicroBatcher(clip_utils.encode_texts_local, max_batch, max_wait_ms)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o666)
+
+    def info(self):
+        return {
+            "model": settings.CLIP_MODEL_NAME,
+            "dim": settings.EMBEDDING_DIMENSION,
+            "image_batches": self.image_batcher.batches,
+            "images": self.image_batcher.items,
+            "text_batches": self.text_batcher.batches,
+            "texts": self.text_batcher.items,
+        }
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """One client connection; requests on it are served one after another."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                op = header.get("op")
+                if op == "info":
+                    send_message(self.request, {"ok": True, **server.info()})
+                    continue
+                if op == "image":
+                    # Preprocessing runs on this connection's thread, inference on the batcher
+                    futures, offset = [], 0
+                    for width, height in header["sizes"]:
+                        size = width * height * 3
+                        image = Image.frombuffer("RGB", (width, height), payload[offset:offset + size], "raw", "RGB", 0, 1)
+                        futures.append(server.image_batcher.submit(server.preprocess(image)))
+                        offset += size
+                elif op == "text":
+                    futures = [server.text_batcher.submit(text) for text in header["texts"]]
+                else:
+                    raise ValueError(f"Unknown op '{op}'")
+                rows = np.stack([future.result() for future in futures]).astype(np.float32)
+                send_message(self.request, {"ok": True, "n": rows.shape[0], "dim": rows.shape[1]}, rows.tobytes())
+            except Exception as e:
+                logging.exception("Embedding request failed")
+                send_message(self.request, {"ok": False, "error": str(e)})
+
+class EmbeddingClient:
+    """Client of the embedding server; one connection per thread, reconnected on failure."""
+
+    def __init__(self, socket_path, timeout=60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def request(self, header, payload=b""):
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_message(sock, header, payload)
+                response, data = recv_message(sock)
+                break
+            except (ConnectionError, OSError):
+                self._close()
+                # A stale connection (e.g. server restart) is retried once on a fresh one
+                if attempt:
+                    raise
+        if not response.get("ok"):
+            raise RuntimeError(f"Embedding server error: {response.get('error')}")
+        return response, data
+
+    def _rows(self, header, payload=b""):
+        response, data = self.request(header, payload)
+        return np.frombuffer(data, dtype=np.float32).reshape(response["n"], response["dim"])
+
+    def encode_images(self, pil_images):
+        """``(n, dim)`` float32 embeddings of RGB PIL images.
+
+        Images are sent as raw pixels, so larger ones are first shrunk with ``downscale``.
+        """
+        images = [downscale(image if image.mode == "RGB" else image.convert("RGB")) for image in pil_images]
+        return self._rows({"op": "image", "sizes": [list(image.size) for image in images]}, b"".join(image.tobytes() for image in images))
+
+    def encode_texts(self, texts):
+        """``(n, dim)`` float32 embeddings of text queries."""
+        return self._rows({"op": "text", "texts": list(texts)})
+
+    def info(self):
+        return self.request({"op": "info"})[0]
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Host-wide CLIP embedding server")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET or "/tmp/clip-embedder.sock")
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_SERVER_MAX_WAIT_MS)
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO), format="%(asctime)s [%(levelname)s] %(message)s")
+    server = EmbeddingServer(args.socket, args.max_batch, args.max_wait_ms)
+    logging.info(f"Embedding server for '{settings.CLIP_MODEL_NAME}' listening on {args.socket} (max batch {args.max_batch}, max wait {args.max_wait_ms} ms)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
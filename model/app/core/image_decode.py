@@ -0,0 +1,62 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from app.core.config import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_preprocess_pool():
+    """Threads shared by image decoding/preprocessing (PIL releases the GIL while resizing)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.PREPROCESS_THREADS, thread_name_prefix="preprocess")
+        return _pool
+
+def decode_image(image, draft_size=None):
+    """RGB PIL image from encoded bytes (or an already decoded PIL image).
+
+    JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while decoding,
+    down to the smallest size whose sides are still at least ``draft_size`` (defaults
+    to ``IMAGE_DECODE_SIZE``, CLIP's input resolution). A 12 MP photo is then never
+    fully materialized just to be shrunk to 224 px.
+    """
+    if isinstance(image, Image.Image):
+        return image if image.mode == "RGB" else image.convert("RGB")
+    pil_image = Image.open(io.BytesIO(image))
+    draft_size = draft_size or settings.IMAGE_DECODE_SIZE
+    if pil_image.format == "JPEG":
+        pil_image.draft("RGB", (draft_size, draft_size))
+    return pil_image.convert("RGB")
+
+def downscale(image, min_side=None):
+    """Shrink an RGB PIL image so its shorter side is ``min_side``, keeping the aspect ratio.
+
+    ``min_side`` defaults to twice ``IMAGE_DECODE_SIZE``: enough for CLIP's own resize
+    and center crop, while an image sent to the embedding server is a few hundred KB
+    instead of tens of MB. Smaller images are returned as they are.
+    """
+    min_side = min_side or 2 * settings.IMAGE_DECODE_SIZE
+    scale = min_side / min(image.size)
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.BICUBIC, reducing_gap=3.0)
+
+def iter_batches(items, batch_size, transform, pool=None):
+    """Yield ``[transform(item), ...]`` batches of ``items`` in order, transformed in parallel.
+
+    At most two batches are in flight (the one being yielded and the next one being
+    prepared), so peak memory is O(batch_size) however many items there are.
+    """
+    pool = pool or get_preprocess_pool()
+    pending = None
+    for start in range(0, len(items), batch_size):
+        futures = [pool.submit(transform, item) for item in items[start:start + batch_size]]
+        if pending is not None:
+            yield [future.result() for future in pending]
+        pending = futures
+    if pending is not None:
+        yield [future.result() for future in pending]
@@ -0,0 +1,151 @@
+import logging
+import os
+import numpy as np
+import torch
+
+# eager:       the CLIP model as loaded (fp32 on CPU)
+# torchscript: traced and frozen visual tower
+# onnx:        visual tower exported to ONNX and run with ONNX Runtime
+# *-int8:      the same with dynamically int8-quantized Linear layers / MatMuls
+IMAGE_BACKENDS = ("eager", "torchscript", "onnx", "eager-int8", "torchscript-int8", "onnx-int8")
+
+class ImageEncoder:
+    """Runs the CLIP image tower: preprocessed ``(n, 3, H, W)`` tensor -> ``(n, dim)`` float32 array."""
+
+    name = "base"
+
+    def __call__(self, images):
+        raise NotImplementedError
+
+class EagerEncoder(ImageEncoder):
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, images):
+        with torch.no_grad():
+            return self.model.encode_image(images).float().cpu().numpy()
+
+class VisualModuleEncoder(ImageEncoder):
+    """Eager or TorchScript module taking fp32 images (used for the quantized and traced variants)."""
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, images):
+        with torch.no_grad():
+            return self.module(images.float()).float().cpu().numpy()
+
+class ONNXEncoder(ImageEncoder):
+    def __init__(self, path, name, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.name = name
+
+    def __call__(self, images):
+        array = images.float().cpu().numpy() if isinstance(images, torch.Tensor) else np.asarray(images, dtype=np.float32)
+        return self.session.run(None, {self.input_name: array})[0].astype(np.float32)
+
+def _quantize_int8(module):
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _trace(module, example):
+    with torch.no_grad():
+        traced = torch.jit.trace(module, example, check_trace=False)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+def _export_onnx(module, example, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written aside and renamed, so processes starting together never load a partial graph
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            module, example, tmp_path,
+            input_names=["images"], output_names=["embeddings"],
+            dynamic_axes={"images": {0: "batch"}, "embeddings": {0: "batch"}},
+            opset_version=17,
+        )
+    os.replace(tmp_path, path)
+
+def onnx_path(model_name, onnx_dir, int8=False):
+    safe_name = model_name.replace("/", "-").replace("@", "-")
+    return os.path.join(onnx_dir, f"{safe_name}{'.int8' if int8 else ''}.onnx")
+
+def build_image_encoder(model, backend, input_resolution, model_name="clip", onnx_dir="/tmp/clip-onnx"):
+    """Image encoder for ``backend`` (one of IMAGE_BACKENDS) around a loaded CLIP model.
+
+    ONNX graphs are exported once into ``onnx_dir`` and reused by later processes.
+    """
+    if backend not in IMAGE_BACKENDS:
+        raise ValueError(f"Unknown image backend '{backend}'. Choose one of: {', '.join(IMAGE_BACKENDS)}")
+    if backend == "eager":
+        return EagerEncoder(model)
+    example = torch.randn(1, 3, input_resolution, input_resolution)
+    if backend.startswith("onnx"):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        path = onnx_path(model_name, onnx_dir)
+        if not os.path.exists(path):
+            _export_onnx(model.visual.float().eval(), example, path)
+        if backend == "onnx-int8":
+            int8_path = onnx_path(model_name, onnx_dir, int8=True)
+            if not os.path.exists(int8_path):
+                tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+                quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+                os.replace(tmp_path, int8_path)
+            path = int8_path
+        return ONNXEncoder(path, backend)
+    visual = model.visual.float().eval()
+    if backend.endswith("int8"):
+        visual = _quantize_int8(visual)
+    if backend.startswith("torchscript"):
+        visual = _trace(visual, example)
+    return VisualModuleEncoder(visual, backend)
+
+def cosine_rows(a, b):
+    """Row-wise cosine similarity of two ``(n, dim)`` arrays."""
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
+
+def parity_inputs(input_resolution, n=4, seed=0):
+    """Fixed pseudo-images (in CLIP's normalized input range) for warm-up and parity checks."""
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randn(n, 3, input_resolution, input_resolution, generator=generator)
+
+def check_parity(encoder, reference, inputs, tolerance):
+    """Lowest cosine similarity between ``encoder`` and ``reference`` embeddings of ``inputs``.
+
+    Raises ValueError when it falls below ``tolerance``.
+    """
+    worst = float(cosine_rows(encoder(inputs), reference(inputs)).min())
+    if worst < tolerance:
+        raise ValueError(f"Backend '{encoder.name}' diverges from eager: min cosine {worst:.4f} < {tolerance}")
+    return worst
+
+def warm_up(encoder, inputs, runs=2):
+    """First calls pay for graph optimization and allocator growth; run them before serving."""
+    for _ in range(runs):
+        encoder(inputs)
+
+def prepare_image_encoder(model, backend, input_resolution, tolerance, model_name="clip", onnx_dir="/tmp/clip-onnx"):
+    """Build, warm up and parity-check the configured backend; falls back to eager on any failure."""
+    eager = EagerEncoder(model)
+    inputs = parity_inputs(input_resolution)
+    if backend != "eager":
+        try:
+            encoder = build_image_encoder(model, backend, input_resolution, model_name, onnx_dir)
+            warm_up(encoder, inputs)
+            worst = check_parity(encoder, eager, inputs, tolerance)
+            logging.info(f"Image encoder backend '{backend}' ready (min cosine vs eager {worst:.4f})")
+            return encoder
+        except Exception as e:
+            logging.error(f"Image encoder backend '{backend}' unavailable, using eager: {e}")
+    warm_up(eager, inputs)
+    return eager
@@ -0,0 +1,126 @@
+import hashlib
+from app.core.clip_utils import batch_images_to_embeddings
+from app.core.config import settings
+from app.core.embedding_codec import encode_embeddings
+from app.core.image_decode import decode_image
+from app.core.perceptual_hash import phash, BKTree
+from app.core.storage import submit_upload
+
+# Product fields stored only when provided
+OPTIONAL_FIELDS = ("weight_kg", "color", "sizes", "key_features")
+
+def find_existing_hashes(products_col, sha256s):
+    """Subset of ``sha256s`` already stored on some product (one indexed $in query)."""
+    unique = list(set(sha256s))
+    if not unique:
+        return set()
+    existing = set()
+    for doc in products_col.find({"image_hashes": {"$in": unique}}, {"image_hashes": 1, "_id": 0}):
+        existing.update(doc.get("image_hashes", []))
+    return existing & set(unique)
+
+def empty_image_result():
+    return {
+        "image_urls": [],
+        "image_hashes": [],
+        "image_phashes": [],
+        "embeddings": [],
+        "exact_duplicates": 0,
+        "near_duplicates": 0,
+        "errors": 0,
+        "error_details": [],
+    }
+
+def prepare_images(image_groups, products_col, catalog, storage=None, progress=None):
+    """Deduplicate, embed and upload the images of one or more products.
+
+    ``image_groups`` holds one list of raw image bytes per product. All images go
+    through the same stages at once: SHA-256 hashing and one ``$in`` lookup for exact
+    duplicates (also across the groups), perceptual hashing for near-duplicates,
+    uploads started on the shared pool, and streamed CLIP batches of
+    ``EMBEDDING_BATCH_SIZE`` images overlapping them. Returns one result dict per group (see ``empty_image_result``).
+
+    ``progress(fraction, message)`` is called as the stages complete.
+    """
+    progress = progress or (lambda fraction, message: None)
+    results = [empty_image_result() for _ in image_groups]
+    sha256s = [[hashlib.sha256(image_bytes).hexdigest() for image_bytes in images] for images in image_groups]
+    existing = find_existing_hashes(products_col, [sha256 for group in sha256s for sha256 in group])
+    progress(0.1, "Checking for duplicate images...")
+
+    candidates = []
+    seen = set()
+    accepted = BKTree()
+    for g, images in enumerate(image_groups):
+        result = results[g]
+        for i, (image_bytes, sha256) in enumerate(zip(images, sha256s[g])):
+            if sha256 in existing or sha256 in seen:
+                result["exact_duplicates"] += 1
+                progress(0.1, f"Image {i+1} is duplicate, skipping...")
+                continue
+            seen.add(sha256)
+            try:
+                # Re-encoded or resized copies are caught by perceptual hash before CLIP and the upload
+                # A small draft decode is plenty for the 32x32 hash; CLIP decodes again, streamed
+                image_phash = phash(decode_image(image_bytes, draft_size=64))
+                if catalog.near_duplicates(image_phash) or accepted.search(image_phash, settings.PHASH_MAX_DISTANCE):
+                    result["near_duplicates"] += 1
+                    progress(0.1, f"Image {i+1} is a near-duplicate, skipping...")
+                    continue
+                accepted.add(image_phash, sha256)
+                candidates.append((g, i, sha256, image_bytes, image_phash))
+            except Exception as e:
+                result["errors"] += 1
+                result["error_details"].append(str(e))
+                progress(0.1, f"Error processing image {i+1}: {str(e)}")
+
+    # Uploads start right away on the bounded pool and overlap with the embedding pass
+    uploads = [submit_upload(image_bytes, sha256, storage) for _, _, sha256, image_bytes, _ in candidates]
+    embeddings = []
+    if candidates:
+        progress(0.2, f"Uploading {len(candidates)} images, generating embeddings...")
+        try:
+            embeddings = batch_images_to_embeddings(
+                [c[3] for c in candidates], batch_size=settings.EMBEDDING_BATCH_SIZE, cache_keys=[c[2] for c in candidates]
+            )
+        except Exception as e:
+            for upload in uploads:
+                upload.cancel()
+            for g, *_ in candidates:
+                results[g]["errors"] += 1
+            for g in {c[0] for c in candidates}:
+                results[g]["error_details"].append(str(e))
+            progress(0.2, f"Error generating embeddings: {str(e)}")
+            candidates, uploads = [], []
+
+    for n, ((g, i, sha256, _, image_phash), embedding, upload) in enumerate(zip(candidates, embeddings, uploads)):
+        result = results[g]
+        try:
+            image_url = upload.result()
+            result["image_urls"].append(image_url)
+            result["image_hashes"].append(sha256)
+            result["image_phashes"].append(image_phash)
+            result["embeddings"].append(embedding)
+            progress(0.3 + 0.7 * (n + 1) / len(candidates), f"Image {i+1} processed successfully")
+        except Exception as e:
+            result["errors"] += 1
+            result["error_details"].append(str(e))
+            progress(0.3 + 0.7 * (n + 1) / len(candidates), f"Error uploading image {i+1}: {str(e)}")
+    return results
+
+def product_document(fields, images):
+    """Product document from its form/manifest ``fields`` and the ``prepare_images`` result."""
+    doc = {
+        "name": fields["name"],
+        "price": fields["price"],
+        "description": fields["description"],
+        "category": fields["category"],
+        "image_urls": images["image_urls"],
+        "image_hashes": images["image_hashes"],
+        "image_phashes": images["image_phashes"],
+        "embeddings": encode_embeddings(images["embeddings"]),
+    }
+    for field in OPTIONAL_FIELDS:
+        if fields.get(field) is not None:
+            doc[field] = fields[field]
+    return doc
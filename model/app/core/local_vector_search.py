@@ -0,0 +1,93 @@
+"""In-memory stand-in for the Atlas vectors collection.
+
+Implements the part of the collection contract ``AtlasVectorStore`` relies on:
+``bulk_write`` of upserting ``UpdateOne`` operations, ``delete_many``, and
+``aggregate`` pipelines starting with a ``$vectorSearch`` stage followed by
+``$project``. Scores follow Atlas' cosine similarity, ``(1 + cos) / 2``. The kNN is
+an exact scan, so results equal what a perfectly recalled Atlas index returns.
+Meant for tests and local development without an Atlas cluster.
+"""
+import numpy as np
+from app.core.db import VECTOR_INDEX_NAME
+
+def _matches(doc, query):
+    for field, condition in (query or {}).items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in":
+                    if value not in operand:
+                        return False
+                elif op == "$eq":
+                    if value != operand:
+                        return False
+                else:
+                    raise NotImplementedError(f"Unsupported filter operator {op}")
+        elif value != condition:
+            return False
+    return True
+
+class LocalVectorSearchCollection:
+    """Documents held in a list; see the module docstring for the supported operations."""
+
+    def __init__(self, index_name=VECTOR_INDEX_NAME):
+        self.index_name = index_name
+        self.docs = []
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            # pymongo write models expose no public accessors for their parts
+            query, update, upsert = operation._filter, operation._doc, operation._upsert
+            doc = next((doc for doc in self.docs if _matches(doc, query)), None)
+            if doc is None:
+                if not upsert:
+                    continue
+                doc = dict(query)
+                self.docs.append(doc)
+            doc.update(update.get("$set", {}))
+
+    def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not _matches(doc, query)]
+
+    def find(self, query=None):
+        return [dict(doc) for doc in self.docs if _matches(doc, query)]
+
+    def aggregate(self, pipeline):
+        stage, *rest = pipeline
+        if "$vectorSearch" not in stage:
+            raise NotImplementedError("Pipelines must start with $vectorSearch")
+        results = self._vector_search(stage["$vectorSearch"])
+        for stage in rest:
+            if "$project" not in stage:
+                raise NotImplementedError(f"Unsupported stage {next(iter(stage))}")
+            results = [(self._project(doc, score, stage["$project"]), score) for doc, score in results]
+        return [doc for doc, _ in results]
+
+    def _vector_search(self, spec):
+        if spec["index"] != self.index_name:
+            raise ValueError(f"Unknown vector index '{spec['index']}'")
+        if spec["limit"] > spec["numCandidates"]:
+            raise ValueError("numCandidates must be at least limit")
+        candidates = [doc for doc in self.docs if _matches(doc, spec.get("filter"))]
+        if not candidates:
+            return []
+        vectors = np.asarray([doc[spec["path"]] for doc in candidates], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(spec["queryVector"], dtype=np.float32)
+        cosine = vectors @ (query / max(np.linalg.norm(query), 1e-12))
+        order = np.argsort(-cosine, kind="stable")[:spec["limit"]]
+        return [(candidates[i], float((1.0 + cosine[i]) / 2.0)) for i in order]
+
+    @staticmethod
+    def _project(doc, score, projection):
+        projected = {} if projection.get("_id", 1) == 0 else {"_id": doc.get("_id")}
+        for field, spec in projection.items():
+            if field == "_id":
+                continue
+            if spec == {"$meta": "vectorSearchScore"}:
+                projected[field] = score
+            elif spec == 1:
+                projected[field] = doc.get(field)
+            else:
+                raise NotImplementedError(f"Unsupported projection of {field}")
+        return projected
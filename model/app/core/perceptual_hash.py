@@ -0,0 +1,158 @@
+import logging
+import time
+import urllib.request
+import cv2
+import numpy as np
+from pymongo import UpdateOne
+from app.core.config import settings
+
+def phash(pil_image, hash_size=8, highfreq_factor=4):
+    """64-bit DCT perceptual hash of a PIL image, as a 16-digit hex string.
+
+    The image is reduced to a 32x32 grayscale thumbnail and the low-frequency 8x8
+    block of its DCT is thresholded at its median, so re-compressed, resized or
+    slightly re-toned copies of a photo hash to (nearly) the same bits.
+    """
+    size = hash_size * highfreq_factor
+    gray = np.asarray(pil_image.convert("L").resize((size, size)), dtype=np.float32)
+    low = cv2.dct(gray)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming(a, b):
+    """Number of differing bits between two hashes (ints or hex strings)."""
+    if isinstance(a, str):
+        a = int(a, 16)
+    if isinstance(b, str):
+        b = int(b, 16)
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over perceptual hashes under the Hamming distance.
+
+    Each node keeps its children keyed by their distance to it; by the triangle
+    inequality a radius query only descends into children whose key lies within
+    ``max_distance`` of the query's distance to the node.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, hash_hex, item):
+        """Index ``item`` (e.g. a product id) under ``hash_hex``."""
+        value = int(hash_hex, 16)
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def remove(self, hash_hex, item):
+        """Drop ``item`` from ``hash_hex``; the node stays in the tree to route searches."""
+        value = int(hash_hex, 16)
+        node = self.root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                if item in node[1]:
+                    node[1].remove(item)
+                    self.size -= 1
+                return
+            node = node[2].get(distance)
+
+    def search(self, hash_hex, max_distance):
+        """``[(item, distance), ...]`` of every indexed hash within ``max_distance``, nearest first."""
+        if self.root is None:
+            return []
+        value = int(hash_hex, 16)
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((item, distance) for item in node[1])
+            for key, child in node[2].items():
+                if distance - max_distance <= key <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda hit: hit[1])
+
+def fetch_image(url, timeout=30):
+    """Bytes of the image stored at ``url``."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+def backfill_phashes(products_col=None, fetch=None, batch_size=None, progress=None):
+    """Compute ``image_phashes`` for stored products that predate perceptual hashing.
+
+    Each product's images are fetched from its ``image_urls`` (``fetch(url)`` returns
+    the bytes) and hashed on the preprocess pool. A product is only written when all of
+    its images could be hashed, and only if its images did not change meanwhile, so a
+    failed product is retried by the next run. Batches are paged by ``_id``.
+    ``progress(done, total, stats)`` is called after each batch. Returns the stats.
+    """
+    from app.core.db import get_products_collection
+    from app.core.image_decode import decode_image, get_preprocess_pool
+    products_col = products_col if products_col is not None else get_products_collection()
+    fetch = fetch or fetch_image
+    batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+    query = {"image_phashes": {"$exists": False}, "deleted": {"$ne": True}, "image_urls.0": {"$exists": True}}
+    total = products_col.count_documents(query)
+    stats = {"hashed": 0, "images": 0, "failed": 0, "elapsed_seconds": 0.0}
+    start = time.perf_counter()
+    pool = get_preprocess_pool()
+
+    def hash_url(url):
+        try:
+            # A small draft decode is plenty for the 32x32 hash
+            return phash(decode_image(fetch(url), draft_size=64))
+        except Exception as e:
+            logging.warning(f"pHash backfill: cannot hash {url}: {e}")
+            return None
+
+    last_id = None
+    done = 0
+    while True:
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        docs = list(products_col.find(page, {"image_urls": 1}).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        hashes = iter(pool.map(hash_url, [url for doc in docs for url in doc["image_urls"]]))
+        ops = []
+        for doc in docs:
+            phashes = [next(hashes) for _ in doc["image_urls"]]
+            if None in phashes:
+                stats["failed"] += 1
+                continue
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], "image_urls": doc["image_urls"], "image_phashes": {"$exists": False}},
+                {"$set": {"image_phashes": phashes}},
+            ))
+            stats["images"] += len(phashes)
+        if ops:
+            products_col.bulk_write(ops, ordered=False)
+        stats["hashed"] += len(ops)
+        done += len(docs)
+        stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        logging.info(f"pHash backfill: {done}/{total} products processed")
+        if progress:
+            progress(done, total, stats)
+    stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return stats
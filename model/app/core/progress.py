@@ -0,0 +1,149 @@
+"""Job progress: coalesced writes on the task side, pub/sub streaming on the API side.
+
+Every update is stored under ``progress:{job_id}`` (for polling) and published on the
+channel of the same name (for streaming), both in one pipelined round trip. Updates
+closer together than ``PROGRESS_MIN_INTERVAL_MS`` are coalesced: only the latest one
+is written, once the interval has passed. The first and terminal (100 or -1) updates
+are always written at once.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import redis
+from app.core.config import settings
+
+PROGRESS_TTL = 3600  # 1 hour
+
+_redis_client = None
+_redis_checked = False
+
+def get_redis():
+    """Shared Redis connection for progress writes (None when Redis is unavailable)."""
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        try:
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            _redis_client.ping()
+        except Exception as e:
+            _redis_client = None
+            logging.warning(f"Redis unavailable, job progress is not reported: {e}")
+    return _redis_client
+
+def progress_key(job_id):
+    """Redis key holding the latest update, also the pub/sub channel updates go out on."""
+    return f"progress:{job_id}"
+
+def is_terminal(progress):
+    return progress >= 100 or progress < 0
+
+class ProgressReporter:
+    """Coalescing progress writer of one job."""
+
+    def __init__(self, job_id, redis_client=None, min_interval_ms=None):
+        self.job_id = job_id
+        self.redis = redis_client if redis_client is not None else get_redis()
+        interval_ms = settings.PROGRESS_MIN_INTERVAL_MS if min_interval_ms is None else min_interval_ms
+        self.min_interval = interval_ms / 1000.0
+        self.last_write = 0.0
+        self.pending = None
+        self.timer = None
+        self.writes = 0
+        self.lock = threading.Lock()
+
+    def update(self, progress, message=""):
+        data = {"progress": progress, "message": message, "timestamp": time.time()}
+        with self.lock:
+            self.pending = data
+            wait = self.last_write + self.min_interval - time.monotonic()
+            if wait <= 0 or is_terminal(progress):
+                self._write()
+            elif self.timer is None:
+                # Sent once the interval has passed, unless a later update supersedes it first
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Write the pending update, if any."""
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        data, self.pending = self.pending, None
+        if data is None or self.redis is None:
+            return
+        payload = json.dumps(data)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(progress_key(self.job_id), payload, ex=PROGRESS_TTL)
+            pipe.publish(progress_key(self.job_id), payload)
+            pipe.execute()
+            self.writes += 1
+        except Exception as e:
+            logging.warning(f"Progress update of job {self.job_id} failed: {e}")
+        self.last_write = time.monotonic()
+
+_reporters = {}
+_reporters_lock = threading.Lock()
+
+def update_progress(job_id, progress, message=""):
+    """Report a job's progress (0-100, -1 on failure); the reporter is dropped at a terminal update."""
+    with _reporters_lock:
+        reporter = _reporters.get(job_id)
+        if reporter is None:
+            reporter = _reporters[job_id] = ProgressReporter(job_id)
+        if is_terminal(progress):
+            _reporters.pop(job_id, None)
+    reporter.update(progress, message)
+
+async def job_events(job_id, async_result, heartbeat=None, timeout=None):
+    """Yield ``(event, data)`` pairs for a job until it finishes.
+
+    ``progress`` events carry the stored updates as they are published, then one
+    ``result`` (the task's return value) or ``failed`` event ends the stream.
+    ``ping`` events are sent every ``heartbeat`` seconds of silence, and ``timeout``
+    ends a stream that has run for ``timeout`` seconds without the job finishing.
+    ``async_result`` is the job's Celery AsyncResult.
+    """
+    import redis.asyncio as aioredis
+    heartbeat = heartbeat or settings.PROGRESS_STREAM_HEARTBEAT_SECONDS
+    deadline = time.monotonic() + (timeout or settings.PROGRESS_STREAM_TIMEOUT_SECONDS)
+    client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the current state so no update falls in between
+        await pubsub.subscribe(progress_key(job_id))
+        current = await client.get(progress_key(job_id))
+        if current:
+            yield "progress", json.loads(current)
+        last_event = time.monotonic()
+        while not await asyncio.to_thread(async_result.ready):
+            if time.monotonic() > deadline:
+                yield "timeout", {"job_id": job_id}
+                return
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is not None:
+                data = json.loads(message["data"])
+                yield "progress", data
+                last_event = time.monotonic()
+                if is_terminal(data["progress"]):
+                    # The task stores its return value right after its last update
+                    while not await asyncio.to_thread(async_result.ready) and time.monotonic() < deadline:
+                        await asyncio.sleep(0.05)
+            elif time.monotonic() - last_event >= heartbeat:
+                yield "ping", {"timestamp": time.time()}
+                last_event = time.monotonic()
+        if async_result.successful():
+            yield "result", async_result.result
+        else:
+            yield "failed", {"error": str(async_result.info)}
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,36 @@
+from app.core.config import settings
+
+# How an optional text query combines with image/video similarity on /search:
+# - filter:   keep only vector matches whose text matches the query (legacy behaviour)
+# - rrf:      reciprocal-rank fusion of the vector and keyword rankings
+# - weighted: weighted sum of vector similarity and max-normalized BM25 score
+RANKING_MODES = ("filter", "rrf", "weighted")
+
+def fuse_rankings(vector_hits, keyword_hits, mode, rrf_k=None, vector_weight=None):
+    """Fuse two rankings in one pass over their candidates.
+
+    ``vector_hits`` is ``[(product_id, similarity), ...]`` and ``keyword_hits`` is
+    ``[(product_id, bm25_score), ...]``, both best first. Returns
+    ``[(product_id, fused_score), ...]`` best first; in the fusion modes a product
+    found by only one side is still ranked.
+    """
+    if mode not in RANKING_MODES:
+        raise ValueError(f"Unknown ranking mode '{mode}'. Choose one of: {', '.join(RANKING_MODES)}")
+    if mode == "filter":
+        allowed = {product_id for product_id, _ in keyword_hits}
+        return [(product_id, score) for product_id, score in vector_hits if product_id in allowed]
+
+    scores = {}
+    if mode == "rrf":
+        rrf_k = rrf_k or settings.HYBRID_RRF_K
+        for ranking in (vector_hits, keyword_hits):
+            for rank, (product_id, _) in enumerate(ranking, start=1):
+                scores[product_id] = scores.get(product_id, 0.0) + 1.0 / (rrf_k + rank)
+    else:
+        weight = settings.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight
+        max_keyword = max((score for _, score in keyword_hits), default=0.0) or 1.0
+        for product_id, similarity in vector_hits:
+            scores[product_id] = weight * similarity
+        for product_id, score in keyword_hits:
+            scores[product_id] = scores.get(product_id, 0.0) + (1.0 - weight) * score / max_keyword
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
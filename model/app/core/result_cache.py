@@ -0,0 +1,223 @@
+"""Search-result cache.
+
+Entries hold only the ranking: for each of the top ``RESULT_LIMIT`` products its id,
+scores and matched image indices, packed with ``struct`` and zlib-compressed (a few
+hundred bytes instead of the full JSON result list). Matches are rebuilt from the
+product documents on a hit.
+
+Keys are namespaced by everything that changes results: the CLIP model, the
+similarity thresholds and ranking parameters, and the catalog generation: the
+highest write sequence (``sync_seq``, see ``catalog_sync``) committed so far,
+raised by every product write. A search task only stores its ranking when its
+catalog has applied every change up to the generation it read, so a cached ranking
+never hides a newer product, even one that worker has not synced yet; superseded
+entries simply expire. A lookup reads the generation and the entry in one round
+trip (a server-side script).
+
+Identical searches arriving while the first one is still running share its job
+(single flight): the first request claims the request digest for its job id, the
+others get that id back, and the job releases the claim once its ranking is cached.
+"""
+import hashlib
+import struct
+import zlib
+from app.core.config import settings
+from app.core.embedding_cache import get_binary_redis
+
+RESULT_LIMIT = 5  # Matches returned per search
+FORMAT_VERSION = 2
+GENERATION_KEY = "catalog:generation"
+MATCH_TYPES = (None, "semantic", "keyword")
+
+_HAS_RELEVANCE = 1
+_HAS_MATCHED_WORDS = 2
+_HAS_SIMILARITY = 4
+_ENTRY = struct.Struct(">12sBB")  # product id, flags, match type
+_HIT = struct.Struct(">Hf")  # image index, similarity
+
+# KEYS[1]: generation counter; ARGV: key namespace, request digest
+_LOOKUP_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+return {generation, redis.call('GET', ARGV[1] .. ':' .. generation .. ':' .. ARGV[2])}
+"""
+_lookup = None
+
+# Single flight: KEYS[1] is the in-flight claim, ARGV the claiming job id and TTL
+_CLAIM_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner then return owner end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return ARGV[1]
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+_claim = None
+_release = None
+
+# KEYS[1]: generation counter; ARGV[1]: committed write sequence. Raises, never lowers.
+_BUMP_SCRIPT = """
+local generation = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > generation then
+  redis.call('SET', KEYS[1], ARGV[1])
+  return tonumber(ARGV[1])
+end
+return generation
+"""
+_bump = None
+
+def get_cache_key(media_digest=None, query=None, ranking=None):
+    """Digest of a search request: the SHA-256 of the query image/video, the text and the ranking mode."""
+    m = hashlib.sha256()
+    if media_digest:
+        m.update(media_digest.encode("utf-8"))
+    if query:
+        m.update(query.encode("utf-8"))
+        if ranking:
+            m.update(f"|ranking={ranking}".encode("utf-8"))
+    return m.hexdigest()
+
+def cache_namespace():
+    """Key prefix of the current model and search settings."""
+    fingerprint = hashlib.sha256("|".join(str(value) for value in (
+        settings.CLIP_MODEL_NAME, settings.SIMILARITY_THRESHOLD, settings.TEXT_SIMILARITY_THRESHOLD,
+        settings.HYBRID_RRF_K, settings.HYBRID_VECTOR_WEIGHT,
+    )).encode("utf-8")).hexdigest()[:16]
+    return f"search:v{FORMAT_VERSION}:{fingerprint}"
+
+def build_match(product, image_hits, extras=None):
+    """Format a product and its ``(image_index, similarity)`` hits as a search match."""
+    match = {
+        "name": product["name"],
+        "price": product["price"],
+        "description": product["description"],
+        "category": product["category"],
+        "image_urls": product["image_urls"],
+        "matched_images": [
+            {
+                "image_url": product["image_urls"][idx],
+                "image_hash": product["image_hashes"][idx],
+                "similarity": sim
+            }
+            for idx, sim in image_hits
+        ]
+    }
+    match.update(extras or {})
+    return match
+
+def build_matches(ranked, products):
+    """Matches of ``ranked`` entries; ``products`` maps product id to document (missing ids are skipped)."""
+    return [build_match(products[pid], image_hits, extras) for pid, image_hits, extras in ranked if pid in products]
+
+def encode_ranking(ranked):
+    """Compact binary form of ``[(product_id, image_hits, extras), ...]`` (product ids are ObjectId hex strings)."""
+    parts = [struct.pack(">BH", FORMAT_VERSION, len(ranked))]
+    for pid, image_hits, extras in ranked:
+        flags = (
+            (_HAS_RELEVANCE if "relevance_score" in extras else 0)
+            | (_HAS_MATCHED_WORDS if "matched_words" in extras else 0)
+            | (_HAS_SIMILARITY if "similarity" in extras else 0)
+        )
+        parts.append(_ENTRY.pack(bytes.fromhex(pid), flags, MATCH_TYPES.index(extras.get("match_type"))))
+        if flags & _HAS_RELEVANCE:
+            parts.append(struct.pack(">f", extras["relevance_score"]))
+        if flags & _HAS_MATCHED_WORDS:
+            parts.append(struct.pack(">H", min(extras["matched_words"], 0xFFFF)))
+        if flags & _HAS_SIMILARITY:
+            parts.append(struct.pack(">f", extras["similarity"]))
+        parts.append(struct.pack(">H", len(image_hits)))
+        parts.extend(_HIT.pack(idx, sim) for idx, sim in image_hits)
+    return zlib.compress(b"".join(parts))
+
+def decode_ranking(blob):
+    """Inverse of ``encode_ranking`` (scores come back at float32 precision, rounded to 6 decimals)."""
+    data = zlib.decompress(blob)
+    version, count = struct.unpack_from(">BH", data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported result cache format {version}")
+    offset = 3
+    ranked = []
+    for _ in range(count):
+        raw_id, flags, match_type = _ENTRY.unpack_from(data, offset)
+        offset += _ENTRY.size
+        extras = {}
+        if MATCH_TYPES[match_type]:
+            extras["match_type"] = MATCH_TYPES[match_type]
+        if flags & _HAS_RELEVANCE:
+            extras["relevance_score"] = round(struct.unpack_from(">f", data, offset)[0], 6)
+            offset += 4
+        if flags & _HAS_MATCHED_WORDS:
+            extras["matched_words"] = struct.unpack_from(">H", data, offset)[0]
+            offset += 2
+        if flags & _HAS_SIMILARITY:
+            extras["similarity"] = round(struct.unpack_from(">f", data, offset)[0], 6)
+            offset += 4
+        (n_hits,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        image_hits = [_HIT.unpack_from(data, offset + i * _HIT.size) for i in range(n_hits)]
+        offset += n_hits * _HIT.size
+        ranked.append((raw_id.hex(), [(idx, round(sim, 6)) for idx, sim in image_hits], extras))
+    return ranked
+
+def lookup(digest, redis_client=None):
+    """``(generation, ranked)`` for a request digest; ``ranked`` is None on a miss.
+
+    The generation is the one to ``store`` a freshly computed ranking under.
+    """
+    global _lookup
+    client = redis_client or get_binary_redis()
+    if client is None:
+        return 0, None
+    if _lookup is None:
+        _lookup = client.register_script(_LOOKUP_SCRIPT)
+    generation, blob = _lookup(keys=[GENERATION_KEY], args=[cache_namespace(), digest], client=client)
+    return int(generation), decode_ranking(blob) if blob else None
+
+def current_generation(redis_client=None):
+    client = redis_client or get_binary_redis()
+    if client is None:
+        return 0
+    return int(client.get(GENERATION_KEY) or 0)
+
+def store(digest, generation, ranked, redis_client=None):
+    """Cache the top ``RESULT_LIMIT`` of ``ranked`` under the catalog ``generation`` the search started from."""
+    client = redis_client or get_binary_redis()
+    if client is not None:
+        key = f"{cache_namespace()}:{generation}:{digest}"
+        client.set(key, encode_ranking(ranked[:RESULT_LIMIT]), ex=settings.SEARCH_CACHE_TTL)
+
+def bump_generation(seq, redis_client=None):
+    """Invalidate every cached search result once the write with sequence ``seq`` is committed."""
+    global _bump
+    client = redis_client or get_binary_redis()
+    if client is not None:
+        if _bump is None:
+            _bump = client.register_script(_BUMP_SCRIPT)
+        _bump(keys=[GENERATION_KEY], args=[seq], client=client)
+
+def _inflight_key(digest):
+    return f"{cache_namespace()}:inflight:{digest}"
+
+def claim_search(digest, job_id, redis_client=None):
+    """Job id owning the search ``digest``: ``job_id`` if this call claimed it, else the running job's.
+
+    Without Redis every request owns its own job.
+    """
+    global _claim
+    client = redis_client or get_binary_redis()
+    if client is None:
+        return job_id
+    if _claim is None:
+        _claim = client.register_script(_CLAIM_SCRIPT)
+    owner = _claim(keys=[_inflight_key(digest)], args=[job_id, settings.SEARCH_SINGLE_FLIGHT_TTL], client=client)
+    return owner.decode("utf-8") if isinstance(owner, bytes) else owner
+
+def release_search(digest, job_id, redis_client=None):
+    """Drop the claim on ``digest`` if ``job_id`` still holds it."""
+    global _release
+    client = redis_client or get_binary_redis()
+    if client is not None:
+        if _release is None:
+            _release = client.register_script(_RELEASE_SCRIPT)
+        _release(keys=[_inflight_key(digest)], args=[job_id], client=client)
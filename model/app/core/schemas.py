@@ -17,7 +17,7 @@ class ProductBase(BaseModel):
     key_features: Optional[List[str]] = Field(None, description="Key product features and specifications (e.g., ['124 Liters', 'Environment Friendly Tech', 'Low Noise'])")
     image_urls: List[str]
     image_hashes: List[str]
-    embeddings: List[List[float]]
+    embeddings: bytes = Field(..., description="L2-normalized float32/float16 image embeddings packed as BSON binary (see app.core.embedding_codec)")
 
 class ProductCreate(ProductBase):
     pass
@@ -0,0 +1,98 @@
+import io
+import logging
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+
+class ImageStorage:
+    """Where product images are uploaded; ``upload`` returns the public URL of the stored image."""
+
+    def upload(self, image_bytes, key):
+        raise NotImplementedError
+
+class CloudinaryStorage(ImageStorage):
+    """Cloudinary uploads into ``folder`` (the production storage)."""
+
+    def __init__(self, folder="clip-products"):
+        import cloudinary
+        import cloudinary.uploader
+        cloudinary.config(
+            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+            api_key=settings.CLOUDINARY_API_KEY,
+            api_secret=settings.CLOUDINARY_API_SECRET,
+        )
+        self._uploader = cloudinary.uploader
+        self.folder = folder
+
+    def upload(self, image_bytes, key):
+        # Content-hash public ids make a retried upload idempotent
+        result = self._uploader.upload(io.BytesIO(image_bytes), folder=self.folder, public_id=key, overwrite=False)
+        return result["secure_url"]
+
+class HTTPStorage(ImageStorage):
+    """Plain HTTP object storage: ``PUT {base_url}/{key}``, served back from the same URL.
+
+    Works against any server accepting PUT uploads, e.g. ``scripts/local_storage_server.py``
+    as a local stand-in for Cloudinary.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def upload(self, image_bytes, key):
+        url = f"{self.base_url}/{key}"
+        request = urllib.request.Request(url, data=image_bytes, method="PUT", headers={"Content-Type": "application/octet-stream"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Upload to {url} failed with HTTP {response.status}")
+        return url
+
+STORAGE_BACKENDS = {
+    "cloudinary": lambda: CloudinaryStorage(),
+    "http": lambda: HTTPStorage(settings.IMAGE_STORAGE_URL),
+}
+
+_storage = None
+_upload_pool = None
+_lock = threading.Lock()
+
+def get_storage():
+    """The process-wide ImageStorage selected by ``IMAGE_STORAGE``."""
+    global _storage
+    with _lock:
+        if _storage is None:
+            if settings.IMAGE_STORAGE not in STORAGE_BACKENDS:
+                raise ValueError(f"Unknown IMAGE_STORAGE '{settings.IMAGE_STORAGE}'. Choose one of: {', '.join(STORAGE_BACKENDS)}")
+            _storage = STORAGE_BACKENDS[settings.IMAGE_STORAGE]()
+        return _storage
+
+def upload_with_retry(storage, image_bytes, key, retries=None, backoff=None):
+    """Upload, retrying failures with exponential backoff and jitter; the last error is raised."""
+    retries = settings.UPLOAD_RETRIES if retries is None else retries
+    backoff = settings.UPLOAD_BACKOFF_SECONDS if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return storage.upload(image_bytes, key)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            logging.warning(f"Upload of {key} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def get_upload_pool():
+    """Bounded thread pool shared by all uploads of this process (``UPLOAD_CONCURRENCY`` workers)."""
+    global _upload_pool
+    with _lock:
+        if _upload_pool is None:
+            _upload_pool = ThreadPoolExecutor(max_workers=settings.UPLOAD_CONCURRENCY, thread_name_prefix="upload")
+        return _upload_pool
+
+def submit_upload(image_bytes, key, storage=None):
+    """Start an upload in the background; returns a Future resolving to the image URL."""
+    storage = storage or get_storage()
+    return get_upload_pool().submit(upload_with_retry, storage, image_bytes, key)
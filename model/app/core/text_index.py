@@ -0,0 +1,111 @@
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field boosts applied to term frequencies (a simplified BM25F)
+FIELD_WEIGHTS = {
+    "name": 2.0,
+    "category": 1.5,
+    "color": 1.0,
+    "key_features": 1.0,
+    "description": 1.0,
+}
+
+def stem(token):
+    """Light English plural stemming, so "sneakers" and "sneaker" index as one term."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    """Lowercase, stemmed alphanumeric tokens of ``text`` ("T-Shirts" -> ["t", "shirt"])."""
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower())] if text else []
+
+def product_terms(product):
+    """Weighted term frequencies of a product over the indexed fields."""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = product.get(field)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        for token in tokenize(value if isinstance(value, str) else None):
+            terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+class InvertedIndex:
+    """In-memory inverted index over product text with BM25 ranking.
+
+    Postings map each term to ``{doc_id: weighted_tf}``; documents can be added one at a
+    time, so new products are indexed without a rebuild.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, product):
+        """Index (or re-index) one product under ``doc_id``."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        terms = product_terms(product)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = list(terms)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id, ()):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1.0 + (len(self.doc_lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, doc_ids=None, limit=None):
+        """BM25-ranked ``[(doc_id, score, matched_terms), ...]`` for a free-text query.
+
+        ``doc_ids`` optionally restricts the candidates. Only the postings of the query
+        terms are visited, never the whole catalog.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return []
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores, matched = {}, {}
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in docs.items():
+                if doc_ids is not None and doc_id not in doc_ids:
+                    continue
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(doc_id, score, matched[doc_id]) for doc_id, score in ranked]
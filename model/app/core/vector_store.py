@@ -0,0 +1,285 @@
+import logging
+import time
+import numpy as np
+from pymongo import UpdateOne
+from app.core.ann_index import HNSWIndex
+from app.core.catalog_matrix import CatalogMatrix, grow, normalize_rows
+from app.core.config import settings
+from app.core.db import VECTOR_INDEX_NAME, get_vectors_collection
+
+class VectorStore:
+    """Interface of the image-similarity backends used by the search tasks.
+
+    ``search`` returns ``[(product_id, [(image_index, similarity), ...]), ...]`` best
+    product first, where ``image_index`` is the position of the image in the product's
+    ``image_urls``/``image_hashes`` and only images reaching ``threshold`` are listed.
+    Embeddings handed to the stores are ``(n, dim)`` L2-normalized float32 matrices,
+    as decoded by ``decode_embeddings``.
+    """
+
+    # True when the backend keeps the embeddings in worker memory (so the catalog must load them)
+    resident = True
+
+    def search(self, query_embedding, threshold, product_ids=None):
+        """Match one query embedding, optionally restricted to a set of product ids."""
+        raise NotImplementedError
+
+    def search_many(self, query_embeddings, threshold, product_ids=None):
+        """Match several query embeddings; each image keeps its best similarity over the queries."""
+        grouped = {}
+        for query_embedding in query_embeddings:
+            for product_id, image_hits in self.search(query_embedding, threshold, product_ids):
+                best = dict(grouped.get(product_id, []))
+                for image_index, sim in image_hits:
+                    if sim > best.get(image_index, -1.0):
+                        best[image_index] = sim
+                grouped[product_id] = list(best.items())
+        return rank_grouped_hits(grouped)
+
+    def add(self, product_id, embeddings):
+        """Make a product's image embeddings searchable."""
+        raise NotImplementedError
+
+    def add_many(self, items):
+        """Add several ``(product_id, embeddings)`` pairs (backends may do it in one step)."""
+        for product_id, embeddings in items:
+            self.add(product_id, embeddings)
+
+    def remove(self, product_id):
+        """Stop returning a product (it may be added again later, e.g. with new embeddings)."""
+        raise NotImplementedError
+
+def rank_grouped_hits(grouped):
+    """Order ``{product_id: [(image_index, similarity), ...]}`` by best similarity, images by index."""
+    ranked = sorted(grouped.items(), key=lambda item: max(sim for _, sim in item[1]), reverse=True)
+    return [(product_id, sorted(image_hits)) for product_id, image_hits in ranked]
+
+class ExactVectorStore(VectorStore):
+    """Exact scan of the in-process CatalogMatrix (one matrix-vector product per query).
+
+    Removed products are tombstoned in ``deleted`` and masked out of every search;
+    their rows stay in the matrix until the catalog is next rebuilt.
+    """
+
+    def __init__(self, ids=(), embeddings=()):
+        self.ids = [str(product_id) for product_id in ids]
+        self.index_of = {product_id: i for i, product_id in enumerate(self.ids)}
+        self.matrix = CatalogMatrix.from_embeddings(embeddings, dim=settings.EMBEDDING_DIMENSION, normalized=True)
+        self._deleted = np.zeros(len(self.ids), dtype=bool)
+        self.tombstones = 0
+
+    @property
+    def deleted(self):
+        return self._deleted[:len(self.ids)]
+
+    def product_mask(self, product_ids):
+        if product_ids is None:
+            return ~self.deleted if self.tombstones else None
+        mask = np.zeros(len(self.ids), dtype=bool)
+        rows = [self.index_of[product_id] for product_id in product_ids if product_id in self.index_of]
+        mask[rows] = True
+        return mask
+
+    def search(self, query_embedding, threshold, product_ids=None):
+        hits = self.matrix.search(query_embedding, threshold, self.product_mask(product_ids))
+        return [(self.ids[p], image_hits) for p, image_hits in hits]
+
+    def search_many(self, query_embeddings, threshold, product_ids=None):
+        hits = self.matrix.search_many(query_embeddings, threshold, self.product_mask(product_ids))
+        return [(self.ids[p], image_hits) for p, image_hits in hits]
+
+    def add(self, product_id, embeddings):
+        """Append a product to the matrix; returns the new image rows."""
+        return self.add_many([(product_id, embeddings)])
+
+    def add_many(self, items):
+        """Append several products to the matrix in place; returns the new image rows."""
+        new_ids, blocks = [], []
+        for product_id, embeddings in items:
+            product_id = str(product_id)
+            if product_id in self.index_of or product_id in new_ids:
+                continue
+            new_ids.append(product_id)
+            blocks.append(embeddings if embeddings is not None else [])
+        if not new_ids:
+            return np.zeros(0, dtype=np.int64)
+        rows = self.matrix.append(blocks, normalized=True)
+        # grow() zero-fills the spare capacity, so new products start out not deleted
+        self._deleted = grow(self._deleted, len(self.ids) + len(new_ids))
+        for product_id in new_ids:
+            self.index_of[product_id] = len(self.ids)
+            self.ids.append(product_id)
+        return rows
+
+    def remove(self, product_id):
+        """Tombstone a product; returns its image rows."""
+        p = self.index_of.pop(str(product_id), None)
+        if p is None:
+            return np.zeros(0, dtype=np.int64)
+        self._deleted[p] = True
+        self.tombstones += 1
+        return np.arange(self.matrix.offsets[p], self.matrix.offsets[p + 1])
+
+class HNSWVectorStore(ExactVectorStore):
+    """Approximate search through an HNSW index over the CatalogMatrix rows.
+
+    The ``SEARCH_TOP_K`` nearest images are retrieved first and the similarity
+    threshold is applied afterwards, so only images among the top-k can be returned.
+    """
+
+    def __init__(self, ids=(), embeddings=()):
+        super().__init__(ids, embeddings)
+        if self.matrix.num_images:
+            self.index = HNSWIndex.build(self.matrix.vectors)
+        else:
+            self.index = HNSWIndex(settings.EMBEDDING_DIMENSION)
+
+    def search(self, query_embedding, threshold, product_ids=None):
+        top_k = settings.SEARCH_TOP_K
+        # Removed products are deleted from the index itself, so only an explicit filter needs a mask
+        mask = self.product_mask(product_ids) if product_ids is not None else None
+        label_filter = None
+        if mask is not None:
+            image_product = self.matrix.image_product
+            label_filter = lambda label: bool(mask[image_product[label]])
+            top_k = min(top_k, int(np.diff(self.matrix.offsets)[mask].sum()))
+        rows, sims = self.index.query(normalize_rows(query_embedding), top_k, label_filter)
+        hits = self.matrix.group_hits(rows, sims, threshold, mask)
+        return [(self.ids[p], image_hits) for p, image_hits in hits]
+
+    # One ANN query per embedding, merged per image (not the exact matrix scan)
+    search_many = VectorStore.search_many
+
+    def add_many(self, items):
+        rows = super().add_many(items)
+        if len(rows):
+            self.index.add(self.matrix.vectors[rows], rows)
+        return rows
+
+    def remove(self, product_id):
+        rows = super().remove(product_id)
+        self.index.delete(rows)
+        return rows
+
+class AtlasVectorStore(VectorStore):
+    """kNN pushed down to MongoDB Atlas through a ``$vectorSearch`` aggregation.
+
+    Atlas indexes one vector per document, so each product image is mirrored into the
+    vectors collection as ``{product_id, image_index, embedding}`` (L2-normalized).
+    Any collection object exposing ``aggregate`` and ``bulk_write`` with the same
+    contract (e.g. a local stand-in) can be injected.
+    """
+
+    resident = False
+
+    def __init__(self, collection=None):
+        self.collection = collection if collection is not None else get_vectors_collection()
+
+    def build_pipeline(self, query_embedding, product_ids=None):
+        query = normalize_rows(query_embedding)
+        vector_search = {
+            "index": VECTOR_INDEX_NAME,
+            "path": "embedding",
+            "queryVector": query.tolist(),
+            "numCandidates": max(settings.ATLAS_NUM_CANDIDATES, settings.SEARCH_TOP_K),
+            "limit": settings.SEARCH_TOP_K,
+        }
+        if product_ids is not None:
+            vector_search["filter"] = {"product_id": {"$in": sorted(product_ids)}}
+        return [
+            {"$vectorSearch": vector_search},
+            {"$project": {"_id": 0, "product_id": 1, "image_index": 1, "score": {"$meta": "vectorSearchScore"}}},
+        ]
+
+    def search(self, query_embedding, threshold, product_ids=None):
+        if product_ids is not None and not product_ids:
+            return []
+        grouped = {}
+        for doc in self.collection.aggregate(self.build_pipeline(query_embedding, product_ids)):
+            # Atlas reports cosine similarity as (1 + cos) / 2
+            sim = min(max(2.0 * float(doc["score"]) - 1.0, 0.0), 1.0)
+            if sim >= threshold:
+                grouped.setdefault(str(doc["product_id"]), []).append((int(doc["image_index"]), sim))
+        return rank_grouped_hits(grouped)
+
+    @staticmethod
+    def _upserts(product_id, embeddings):
+        if embeddings is None or len(embeddings) == 0:
+            return []
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        return [
+            UpdateOne(
+                {"product_id": str(product_id), "image_index": i},
+                {"$set": {"embedding": vector.tolist()}},
+                upsert=True,
+            )
+            for i, vector in enumerate(vectors)
+        ]
+
+    def add(self, product_id, embeddings):
+        self.add_many([(product_id, embeddings)])
+
+    def add_many(self, items):
+        """Upsert the image vectors of several products with one ``bulk_write``."""
+        operations = [operation for product_id, embeddings in items for operation in self._upserts(product_id, embeddings)]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def remove(self, product_id):
+        self.collection.delete_many({"product_id": str(product_id)})
+
+def backfill_vectors(products_col=None, store=None, batch_size=None, progress=None):
+    """Copy the embeddings of every stored product into ``store`` (the Atlas vectors collection by default).
+
+    Needed once before switching ``VECTOR_BACKEND`` to ``atlas`` on an existing
+    catalog, since only products written afterwards are mirrored automatically.
+    Batches are paged by ``_id`` and vectors are upserted, so an interrupted run can
+    simply be started again. ``progress(done, total, stats)`` is called after each
+    batch. Returns the stats.
+    """
+    from app.core.db import get_products_collection
+    from app.core.embedding_codec import decode_embeddings
+    products_col = products_col if products_col is not None else get_products_collection()
+    store = store if store is not None else AtlasVectorStore()
+    batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+    query = {"deleted": {"$ne": True}, "embeddings": {"$exists": True}}
+    total = products_col.count_documents(query)
+    stats = {"products": 0, "vectors": 0, "elapsed_seconds": 0.0}
+    start = time.perf_counter()
+    last_id = None
+    while True:
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        docs = list(products_col.find(page, {"embeddings": 1}).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        items = [(str(doc["_id"]), decode_embeddings(doc["embeddings"])) for doc in docs]
+        store.add_many(items)
+        stats["products"] += len(items)
+        stats["vectors"] += sum(len(embeddings) for _, embeddings in items)
+        stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        logging.info(f"Vector backfill: {stats['products']}/{total} products copied")
+        if progress:
+            progress(stats["products"], total, stats)
+    stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+VECTOR_BACKENDS = {
+    "exact": ExactVectorStore,
+    "hnsw": HNSWVectorStore,
+    "atlas": AtlasVectorStore,
+}
+
+def get_vector_store_class(backend=None):
+    backend = (backend or settings.VECTOR_BACKEND).lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}'. Choose one of: {', '.join(VECTOR_BACKENDS)}")
+    return VECTOR_BACKENDS[backend]
+
+def create_vector_store(ids=(), embeddings=(), backend=None):
+    """Create the configured backend; resident backends are built from ``ids``/``embeddings``."""
+    store_class = get_vector_store_class(backend)
+    if store_class.resident:
+        return store_class(ids, embeddings)
+    logging.info(f"Using {store_class.__name__} (index '{VECTOR_INDEX_NAME}')")
+    return store_class()
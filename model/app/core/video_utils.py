@@ -0,0 +1,140 @@
+import contextlib
+import os
+import tempfile
+import cv2
+import numpy as np
+
+# Above this many frames between samples, seeking beats grabbing forward
+SEEK_MIN_GAP = 48
+
+@contextlib.contextmanager
+def video_source(video):
+    """Yield a path OpenCV can open for ``video`` (a path or the raw bytes).
+
+    Bytes are exposed through an anonymous in-memory file (``memfd``) where the
+    platform supports it, so nothing touches the disk; other platforms fall back to
+    a temporary file.
+    """
+    if isinstance(video, (str, os.PathLike)):
+        yield os.fspath(video)
+        return
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("video", 0)
+        try:
+            with memoryview(video) as view:
+                written = 0
+                while written < len(view):
+                    written += os.write(fd, view[written:])
+            yield f"/proc/self/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+    tmp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+    try:
+        with tmp:
+            tmp.write(video)
+        yield tmp.name
+    finally:
+        os.remove(tmp.name)
+
+def frame_positions(frame_count, max_frames):
+    """Frame indices spreading ``max_frames`` samples evenly over the whole video."""
+    n = min(max_frames, frame_count)
+    return sorted(set(((np.arange(n) + 0.5) * frame_count / n).astype(int).tolist()))
+
+def _read_at(vidcap, position, target):
+    """Move from ``position`` to frame ``target`` and decode it; returns (frame, new_position)."""
+    gap = target - position
+    if gap < 0 or gap > SEEK_MIN_GAP:
+        if vidcap.set(cv2.CAP_PROP_POS_FRAMES, target):
+            position = target
+    # grab() demuxes without converting the skipped frames to BGR images
+    while position < target:
+        if not vidcap.grab():
+            return None, position
+        position += 1
+    if not vidcap.grab():
+        return None, position
+    ok, frame = vidcap.retrieve()
+    return (frame if ok else None), position + 1
+
+def _sample_sequential(vidcap, max_frames):
+    """Fallback for streams without a frame count: stride doubles as the video turns out longer."""
+    stride, index, kept = 1, 0, []
+    while vidcap.grab():
+        if index % stride == 0:
+            ok, frame = vidcap.retrieve()
+            if ok:
+                kept.append((index, frame))
+            if len(kept) >= 2 * max_frames:
+                stride *= 2
+                kept = [(i, f) for i, f in kept if i % stride == 0]
+        index += 1
+    if len(kept) > max_frames:
+        step = len(kept) / max_frames
+        kept = [kept[int(i * step)] for i in range(max_frames)]
+    return [frame for _, frame in kept]
+
+def sample_frames(video, max_frames=8):
+    """Sample up to ``max_frames`` BGR frames spread across the whole duration of ``video``.
+
+    ``video`` is a file path or the raw bytes of the upload. Only the sampled frames are
+    decoded into images: the sampler seeks to distant frames and grabs through short gaps.
+    """
+    with video_source(video) as path:
+        vidcap = cv2.VideoCapture(path)
+        try:
+            if not vidcap.isOpened():
+                raise ValueError("Could not open video")
+            frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            if frame_count <= 0:
+                return _sample_sequential(vidcap, max_frames)
+            frames, position = [], 0
+            for target in frame_positions(frame_count, max_frames):
+                frame, position = _read_at(vidcap, position, target)
+                if frame is not None:
+                    frames.append(frame)
+            return frames
+        finally:
+            vidcap.release()
+
+def _frame_histogram(frame, size=64):
+    """Normalized hue/saturation histogram of a downscaled frame."""
+    small = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def select_keyframes(frames, max_keyframes, min_change=0.2):
+    """Indices of scene-change keyframes among ``frames`` (BGR, in time order).
+
+    A frame becomes a keyframe when its histogram (Bhattacharyya) distance to the
+    previous keyframe reaches ``min_change``. When there are more keyframes than
+    ``max_keyframes``, the biggest scene changes are kept; the first frame always is.
+    """
+    if not frames:
+        return []
+    histograms = [_frame_histogram(frame) for frame in frames]
+    keyframes, changes = [0], [float("inf")]
+    for i in range(1, len(frames)):
+        change = cv2.compareHist(histograms[keyframes[-1]], histograms[i], cv2.HISTCMP_BHATTACHARYYA)
+        if change >= min_change:
+            keyframes.append(i)
+            changes.append(change)
+    if len(keyframes) > max_keyframes:
+        strongest = np.argsort(changes, kind="stable")[::-1][:max_keyframes]
+        keyframes = sorted(keyframes[i] for i in strongest)
+    return keyframes
+
+def prune_near_duplicates(embeddings, max_similarity=0.97):
+    """Indices of embeddings to keep, dropping any whose cosine similarity to a kept one exceeds ``max_similarity``."""
+    if len(embeddings) == 0:
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    sims = vectors @ vectors.T
+    keep = []
+    for i in range(len(vectors)):
+        if not keep or sims[i, keep].max() <= max_similarity:
+            keep.append(i)
+    return keep
@@ -2,8 +2,8 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.add_product import router as add_product_router
 from app.api.search import router as search_router
-from app.core.db import get_db
-from app.core.clip_utils import initialize_clip
+from app.core.db import get_db, ensure_indexes, ensure_vector_index, VECTOR_INDEX_NAME
+from app.core.clip_utils import initialize_clip, get_embedding_client
 from app.core.config import settings
 import logging
 import time
@@ -41,16 +41,24 @@ def on_startup():
     logging.info(f"Environment: {settings.ENVIRONMENT}")
     logging.info(f"Debug mode: {settings.DEBUG}")
     
-    # Preload CLIP model
-    try:
-        model, preprocess = initialize_clip()
-        if model is None or preprocess is None:
-            raise RuntimeError("CLIP model failed to load.")
-        logging.info(f"CLIP model '{settings.CLIP_MODEL_NAME}' loaded successfully.")
-        logging.info(f"Embedding dimension: {settings.EMBEDDING_DIMENSION}")
-    except Exception as e:
-        logging.error(f"Failed to load CLIP model: {e}")
-        sys.exit(1)
+    # Preload CLIP model (unless a host-wide embedding server holds it)
+    client = get_embedding_client()
+    if client is not None:
+        try:
+            info = client.info()
+            logging.info(f"Using embedding server at {settings.EMBEDDING_SERVER_SOCKET} (model '{info['model']}')")
+        except Exception as e:
+            logging.warning(f"Embedding server at {settings.EMBEDDING_SERVER_SOCKET} not reachable yet: {e}")
+    else:
+        try:
+            model, preprocess = initialize_clip()
+            if model is None or preprocess is None:
+                raise RuntimeError("CLIP model failed to load.")
+            logging.info(f"CLIP model '{settings.CLIP_MODEL_NAME}' loaded successfully.")
+            logging.info(f"Embedding dimension: {settings.EMBEDDING_DIMENSION}")
+        except Exception as e:
+            logging.error(f"Failed to load CLIP model: {e}")
+            sys.exit(1)
     
     # Test MongoDB connection
     try:
@@ -61,11 +69,26 @@ def on_startup():
         logging.error(f"Failed to connect to MongoDB: {e}")
         sys.exit(1)
     
+    try:
+        ensure_indexes()
+        logging.info("MongoDB indexes are in place.")
+    except Exception as e:
+        logging.warning(f"Could not ensure MongoDB indexes: {e}")
+    
+    # Atlas vector search needs its search index on the vectors collection
+    if settings.VECTOR_BACKEND == "atlas":
+        try:
+            ensure_vector_index()
+            logging.info(f"Atlas vector index '{VECTOR_INDEX_NAME}' is available on '{settings.VECTOR_COLLECTION}'")
+        except Exception as e:
+            logging.warning(f"Could not verify Atlas vector index '{VECTOR_INDEX_NAME}': {e}")
+    
     # Log configuration summary
     logging.info(f"File upload max size: {settings.MAX_FILE_SIZE // (1024*1024)}MB")
     logging.info(f"Allowed image types: {', '.join(settings.ALLOWED_IMAGE_TYPES)}")
     logging.info(f"Allowed video types: {', '.join(settings.ALLOWED_VIDEO_TYPES)}")
     logging.info(f"Similarity threshold: {settings.SIMILARITY_THRESHOLD}")
+    logging.info(f"Vector backend: {settings.VECTOR_BACKEND}")
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -128,13 +151,21 @@ def full_health_check():
     
     # Check CLIP model
     try:
-        model, preprocess = initialize_clip()
-        if model is not None and preprocess is not None:
+        client = get_embedding_client()
+        if client is not None:
+            info = client.info()
             status["clip_model"] = "ok"
-            status["clip_model_name"] = settings.CLIP_MODEL_NAME
-            status["embedding_dimension"] = settings.EMBEDDING_DIMENSION
+            status["clip_model_name"] = info["model"]
+            status["embedding_dimension"] = info["dim"]
+            status["embedding_server"] = settings.EMBEDDING_SERVER_SOCKET
         else:
-            status["clip_model"] = "not loaded"
+            model, preprocess = initialize_clip()
+            if model is not None and preprocess is not None:
+                status["clip_model"] = "ok"
+                status["clip_model_name"] = settings.CLIP_MODEL_NAME
+                status["embedding_dimension"] = settings.EMBEDDING_DIMENSION
+            else:
+                status["clip_model"] = "not loaded"
     except Exception as e:
         status["clip_model"] = f"error: {str(e)}"
     
@@ -165,6 +196,7 @@ def get_config():
         "clip_model_name": settings.CLIP_MODEL_NAME,
         "embedding_dimension": settings.EMBEDDING_DIMENSION,
         "similarity_threshold": settings.SIMILARITY_THRESHOLD,
+        "vector_backend": settings.VECTOR_BACKEND,
         "enable_metrics": settings.ENABLE_METRICS,
         "enable_health_checks": settings.ENABLE_HEALTH_CHECKS,
     }
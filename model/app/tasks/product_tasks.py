@@ -1,132 +1,78 @@
 from app.worker import celery_app
 from app.core.db import get_products_collection
-from app.core.clip_utils import image_to_embedding
-from app.core.config import settings
-import hashlib
-import io
-from PIL import Image
-import cloudinary
-import cloudinary.uploader
-import redis
-import json
-import time
-
-# Redis client for progress tracking
-try:
-    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.ping()
-except Exception as e:
-    redis_client = None
-    print(f"Redis connection failed: {e}")
-
-def update_progress(job_id, progress, message=""):
-    """Update progress in Redis"""
-    if redis_client:
-        progress_data = {
-            "progress": progress,
-            "message": message,
-            "timestamp": time.time()
-        }
-        redis_client.set(f"progress:{job_id}", json.dumps(progress_data), ex=3600)
+from app.core.catalog import add_to_resident_catalog, get_catalog
+from app.core.ingest import prepare_images, product_document
+from app.core.bulk_import import import_products, ZipImageSource
+from app.core.progress import update_progress
+from app.core.blob_store import get_blob_store
+from app.core.embedding_codec import migrate_embeddings
+from app.core.result_cache import bump_generation
+from app.core.catalog_sync import SEQ_FIELD, stamp
 
 @celery_app.task(bind=True)
-def add_product_task(self, images_data, name, price, description, category, weight_kg=None, color=None, sizes=None, key_features=None):
+def add_product_task(self, image_digests, name, price, description, category, weight_kg=None, color=None, sizes=None, key_features=None):
     job_id = self.request.id
     try:
         update_progress(job_id, 0, "Starting product addition...")
         
         products_col = get_products_collection()
-        image_urls = []
-        image_hashes = []
-        embeddings = []
-        duplicates = 0
-        errors = 0
-        error_details = []
-        
+        images_data = [get_blob_store().get(digest) for digest in image_digests]
         total_images = len(images_data)
-        update_progress(job_id, 5, f"Processing {total_images} images...")
+        update_progress(job_id, 5, f"Hashing {total_images} images...")
+        catalog = get_catalog()
         
-        for i, image_bytes in enumerate(images_data):
-            try:
-                # Calculate progress for this image
-                image_progress = 5 + (i / total_images) * 80
-                update_progress(job_id, int(image_progress), f"Processing image {i+1}/{total_images}...")
-                
-                # Generate hash
-                sha256 = hashlib.sha256(image_bytes).hexdigest()
-                
-                # Check for duplicates
-                if products_col.find_one({"image_hashes": sha256}):
-                    duplicates += 1
-                    update_progress(job_id, int(image_progress), f"Image {i+1} is duplicate, skipping...")
-                    continue
-                
-                # Process image
-                update_progress(job_id, int(image_progress + 5), f"Generating embedding for image {i+1}...")
-                pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-                embedding = image_to_embedding(pil_image)
-                
-                # Upload to Cloudinary
-                update_progress(job_id, int(image_progress + 10), f"Uploading image {i+1} to Cloudinary...")
-                upload_result = cloudinary.uploader.upload(io.BytesIO(image_bytes), folder="clip-products")
-                image_url = upload_result["secure_url"]
-                
-                # Store data
-                image_urls.append(image_url)
-                image_hashes.append(sha256)
-                embeddings.append(embedding)
-                
-                update_progress(job_id, int(image_progress + 15), f"Image {i+1} processed successfully")
-                
-            except Exception as e:
-                errors += 1
-                error_details.append(str(e))
-                update_progress(job_id, int(image_progress), f"Error processing image {i+1}: {str(e)}")
+        images = prepare_images(
+            [images_data], products_col, catalog,
+            progress=lambda fraction, message: update_progress(job_id, int(5 + fraction * 80), message),
+        )[0]
+        exact_duplicates = images["exact_duplicates"]
+        near_duplicates = images["near_duplicates"]
+        errors = images["errors"]
+        error_details = images["error_details"]
         
         update_progress(job_id, 85, "Checking results...")
         
-        if len(image_urls) == 0:
-            update_progress(job_id, 100, f"Product addition completed. No new images added. Duplicates: {duplicates}, Errors: {errors}")
+        duplicates = exact_duplicates + near_duplicates
+        if len(images["image_urls"]) == 0:
+            update_progress(job_id, 100, f"Product addition completed. No new images added. Duplicates: {duplicates} ({near_duplicates} near), Errors: {errors}")
             return {
                 "status": "duplicate",
                 "added": 0,
                 "duplicates": duplicates,
+                "exact_duplicates": exact_duplicates,
+                "near_duplicates": near_duplicates,
                 "errors": errors,
                 "error_details": error_details
             }
         
         update_progress(job_id, 90, "Saving product to database...")
         
-        # Create product document with new fields
-        product_doc = {
+        product_doc = product_document({
             "name": name,
             "price": price,
             "description": description,
             "category": category,
-            "image_urls": image_urls,
-            "image_hashes": image_hashes,
-            "embeddings": embeddings,
-        }
+            "weight_kg": weight_kg,
+            "color": color,
+            "sizes": sizes,
+            "key_features": key_features,
+        }, images)
         
-        # Add optional fields if provided
-        if weight_kg is not None:
-            product_doc["weight_kg"] = weight_kg
-        if color is not None:
-            product_doc["color"] = color
-        if sizes is not None:
-            product_doc["sizes"] = sizes
-        if key_features is not None:
-            product_doc["key_features"] = key_features
-        
-        # Insert into database
+        # Insert into database (the sequence number lets other workers' catalogs pick it up)
+        stamp([product_doc])
         products_col.insert_one(product_doc)
+        add_to_resident_catalog([product_doc])
+        # Cached search results predate this product
+        bump_generation(product_doc[SEQ_FIELD])
         
-        update_progress(job_id, 100, f"Product added successfully! Images: {len(image_urls)}, Duplicates: {duplicates}, Errors: {errors}")
+        update_progress(job_id, 100, f"Product added successfully! Images: {len(images['image_urls'])}, Duplicates: {duplicates} ({near_duplicates} near), Errors: {errors}")
         
         return {
             "status": "success",
             "added": 1,
             "duplicates": duplicates,
+            "exact_duplicates": exact_duplicates,
+            "near_duplicates": near_duplicates,
             "errors": errors,
             "error_details": error_details
         }
@@ -134,4 +80,39 @@ def add_product_task(self, images_data, name, price, description, category, weig
     except Exception as e:
         update_progress(job_id, -1, f"Error adding product: {str(e)}")
         print(f"Error in add_product_task: {e}")
-        raise 
\ No newline at end of file
+        raise
+
+@celery_app.task(bind=True)
+def bulk_import_task(self, manifest_bytes, archive_digest):
+    job_id = self.request.id
+    try:
+        update_progress(job_id, 0, "Starting bulk import...")
+        source = ZipImageSource(get_blob_store().open_path(archive_digest))
+        
+        def report(done, total, stats):
+            update_progress(job_id, int(done / total * 99), f"Imported {stats['imported']}/{total} products ({stats['products_per_second']} products/s)...")
+        
+        stats = import_products(manifest_bytes, source, progress=report)
+        update_progress(job_id, 100, f"Bulk import completed! Imported: {stats['imported']}, Skipped: {stats['skipped']}, Duplicates: {stats['duplicates']}, Failed: {stats['failed']}")
+        return {"status": "success", **stats}
+    except Exception as e:
+        update_progress(job_id, -1, f"Error in bulk import: {str(e)}")
+        print(f"Error in bulk_import_task: {e}")
+        raise
+
+@celery_app.task(bind=True)
+def migrate_embeddings_task(self, dtype=None, reencode=False):
+    job_id = self.request.id
+    try:
+        update_progress(job_id, 0, "Starting embedding migration...")
+        
+        def report(done, total, stats):
+            update_progress(job_id, int(done / total * 99) if total else 99, f"Rewrote {done}/{total} products...")
+        
+        stats = migrate_embeddings(dtype=dtype, reencode=reencode, progress=report)
+        update_progress(job_id, 100, f"Embedding migration completed! Migrated: {stats['migrated']}, {stats['bytes_before']} -> {stats['bytes_after']} bytes")
+        return {"status": "success", **stats}
+    except Exception as e:
+        update_progress(job_id, -1, f"Error in embedding migration: {str(e)}")
+        print(f"Error in migrate_embeddings_task: {e}")
+        raise
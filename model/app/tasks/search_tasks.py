@@ -1,268 +1,212 @@
 from app.worker import celery_app
-from app.core.clip_utils import image_to_embedding, batch_images_to_embeddings
+from app.core.clip_utils import image_to_embedding, batch_images_to_embeddings, text_to_embedding
+from app.core.catalog import get_catalog
 from app.core.config import settings
-import numpy as np
+from app.core.progress import update_progress
+from app.core.ranking import fuse_rankings
+from app.core import result_cache
+from app.core.result_cache import RESULT_LIMIT, get_cache_key, build_matches
+from app.core.image_decode import decode_image
+from app.core.blob_store import get_blob_store
+from app.core.video_utils import sample_frames, select_keyframes, prune_near_duplicates
 import cv2
 from PIL import Image
-import io
-import tempfile
-import os
-import redis
-import json
 import hashlib
-import time
 
-CACHE_TTL = 3600  # 1 hour - updated for restart
+def best_similarity(image_hits):
+    return max((sim for _, sim in image_hits), default=0.0)
 
-# Connect to Redis using settings
-try:
-    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.ping()
-except Exception as e:
-    redis_client = None
-    print(f"Redis connection failed: {e}")
+def rank_products(catalog, hits, query=None, ranking="filter"):
+    """Rank vector hits, folding in the optional text query.
 
-def get_cache_key(video_bytes=None, image_bytes=None, query=None):
-    m = hashlib.sha256()
-    if video_bytes:
-        m.update(video_bytes)
-    if image_bytes:
-        m.update(image_bytes)
-    if query:
-        m.update(query.encode("utf-8"))
-    return m.hexdigest()
+    Vector similarity and BM25 keyword relevance are fused in one pass over both
+    candidate sets (see ``fuse_rankings`` for the modes). Returns
+    ``[(product_id, image_hits, extras), ...]`` best first (see ``build_matches``).
+    ``similarity`` in the extras is always the best image similarity; ``relevance_score``
+    is only set by the fusion modes, where it is the fused score.
+    """
+    if not query:
+        return [(pid, image_hits, {}) for pid, image_hits in hits]
+    image_hits_by_id = dict(hits)
+    keyword = catalog.text_search(query)
+    matched_words = {pid: matched for pid, _, matched in keyword}
+    vector_ranking = [(pid, best_similarity(image_hits)) for pid, image_hits in hits]
+    keyword_ranking = [(pid, score) for pid, score, _ in keyword]
+    ranked = []
+    for pid, score in fuse_rankings(vector_ranking, keyword_ranking, ranking):
+        image_hits = image_hits_by_id.get(pid, [])
+        extras = {"matched_words": matched_words.get(pid, 0)}
+        if image_hits:
+            extras["similarity"] = best_similarity(image_hits)
+        if ranking != "filter":
+            extras["relevance_score"] = score
+        ranked.append((pid, image_hits, extras))
+    return ranked
 
-def update_progress(job_id, progress, message=""):
-    """Update progress in Redis"""
-    if redis_client:
-        progress_data = {
-            "progress": progress,
-            "message": message,
-            "timestamp": time.time()
-        }
-        redis_client.set(f"progress:{job_id}", json.dumps(progress_data), ex=3600)
+def dedupe_image_hits(product, image_hits):
+    """Keep one hit per image hash (the one with the best similarity)."""
+    best = {}
+    for idx, sim in image_hits:
+        h = product["image_hashes"][idx]
+        if h not in best or sim > best[h][1]:
+            best[h] = (idx, sim)
+    return list(best.values())
+
+def catalog_matches(catalog, ranked):
+    """Search matches of the top ``ranked`` entries, from the resident catalog."""
+    return build_matches(ranked[:RESULT_LIMIT], {pid: catalog.product(pid) for pid, _, _ in ranked[:RESULT_LIMIT]})
 
 @celery_app.task(bind=True)
-def video_search_task(self, video_bytes, query, products_data):
+def video_search_task(self, video_digest, query, ranking="filter"):
     job_id = self.request.id
+    cache_key = get_cache_key(video_digest, query=query, ranking=ranking)
     try:
         update_progress(job_id, 0, "Starting video search...")
         
-        def extract_frames_from_bytes(video_bytes, interval=2, max_frames=8):
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                tmp.write(video_bytes)
-                tmp_path = tmp.name
-            vidcap = cv2.VideoCapture(tmp_path)
-            frames = []
-            fps = vidcap.get(cv2.CAP_PROP_FPS) or 25
-            count = 0
-            while True:
-                success, image = vidcap.read()
-                if not success or len(frames) >= max_frames:
-                    break
-                if int(count % (fps * interval)) == 0:
-                    frames.append(image)
-                count += 1
-            vidcap.release()
-            os.remove(tmp_path)
-            return frames
-        
         update_progress(job_id, 5, "Loading video data...")
         update_progress(job_id, 10, "Extracting video frames...")
-        frames = extract_frames_from_bytes(video_bytes, interval=2, max_frames=8)
+        # The upload is read straight from the shared blob store, never copied into memory
+        frames = sample_frames(get_blob_store().open_path(video_digest), max_frames=settings.VIDEO_CANDIDATE_FRAMES)
         
         update_progress(job_id, 20, f"Extracted {len(frames)} frames from video...")
-        update_progress(job_id, 25, "Converting frames to PIL images...")
-        pil_frames = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames if frame is not None]
+        update_progress(job_id, 25, "Selecting scene-change keyframes...")
+        # Cheap pre-CLIP stage: only distinct views are embedded and compared
+        keyframes = select_keyframes(frames, settings.VIDEO_MAX_FRAMES, settings.VIDEO_SCENE_CHANGE_THRESHOLD)
+        pil_frames = [Image.fromarray(cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB)) for i in keyframes]
         
-        update_progress(job_id, 30, f"Converted {len(pil_frames)} frames...")
-        update_progress(job_id, 35, "Preparing frames for AI analysis...")
+        update_progress(job_id, 30, f"Selected {len(pil_frames)} keyframes...")
         update_progress(job_id, 40, "Generating embeddings for video frames...")
-        frame_embeddings = batch_images_to_embeddings(pil_frames, target_size=(224, 224), batch_size=8)
+        # Frames are keyed by their decoded pixels, so a re-sent video skips CLIP entirely
+        frame_hashes = [hashlib.sha256(frames[i].tobytes()).hexdigest() for i in keyframes]
+        frame_embeddings = batch_images_to_embeddings(pil_frames, batch_size=8, cache_keys=frame_hashes)
+        frame_embeddings = [frame_embeddings[i] for i in prune_near_duplicates(frame_embeddings, settings.VIDEO_FRAME_DEDUP_SIMILARITY)]
+        frames_skipped = len(frames) - len(frame_embeddings)
         
-        update_progress(job_id, 50, f"Generated embeddings for {len(frame_embeddings)} frames...")
+        update_progress(job_id, 50, f"Generated embeddings for {len(frame_embeddings)} distinct frames ({frames_skipped} skipped)...")
         update_progress(job_id, 55, "Starting database comparison...")
         
-        product_matches = {}
-        total_frames = len(frame_embeddings)
+        # Results are cached under the catalog generation the search starts from
+        generation = result_cache.current_generation()
+        catalog = get_catalog()
+        # A catalog that has not applied every write up to it yet must not cache under it
+        cacheable = catalog.caught_up(generation)
+        update_progress(job_id, 60, f"Comparing {len(frame_embeddings)} frames with {len(catalog)} products...")
         
-        for i, emb in enumerate(frame_embeddings):
-            progress = 55 + (i / total_frames) * 25
-            update_progress(job_id, int(progress), f"Processing frame {i+1}/{total_frames}...")
-            
-            emb_np = np.array(emb)
-            for p in products_data:
-                prod_embs = np.array(p["embeddings"])
-                sims = np.dot(prod_embs, emb_np) / (np.linalg.norm(prod_embs, axis=1) * np.linalg.norm(emb_np) + 1e-8)
-                sims = np.clip(sims, 0.0, 1.0)
-                matched_images = []
-                for idx, sim in enumerate(sims):
-                    if sim >= settings.SIMILARITY_THRESHOLD:
-                        matched_images.append({
-                            "image_url": p["image_urls"][idx],
-                            "image_hash": p["image_hashes"][idx],
-                            "similarity": float(sim)
-                        })
-                if matched_images:
-                    if p["name"] not in product_matches:
-                        product_matches[p["name"]] = {
-                            "name": p["name"],
-                            "price": p["price"],
-                            "description": p["description"],
-                            "category": p["category"],
-                            "image_urls": p["image_urls"],
-                            "matched_images": matched_images
-                        }
-                    else:
-                        existing = product_matches[p["name"]]["matched_images"]
-                        all_imgs = existing + matched_images
-                        img_dict = {}
-                        for m in all_imgs:
-                            h = m["image_hash"]
-                            if h not in img_dict or m["similarity"] > img_dict[h]["similarity"]:
-                                img_dict[h] = m
-                        product_matches[p["name"]]["matched_images"] = list(img_dict.values())
+        # One frames x catalog matrix product; every image keeps its best similarity over the frames
+        hits = catalog.search_many(frame_embeddings, settings.SIMILARITY_THRESHOLD)
+        ranked = [(pid, dedupe_image_hits(catalog.product(pid), image_hits), extras) for pid, image_hits, extras in rank_products(catalog, hits, query, ranking)]
         
-        update_progress(job_id, 85, f"Found {len(product_matches)} matching products...")
+        update_progress(job_id, 85, f"Found {len(ranked)} matching products...")
         update_progress(job_id, 90, "Finalizing results...")
-        results = list(product_matches.values())
-        results.sort(key=lambda x: max([m["similarity"] for m in x["matched_images"]]) if x["matched_images"] else 0, reverse=True)
         
-        cache_key = get_cache_key(video_bytes=video_bytes, query=query)
-        if redis_client:
-            redis_client.set(cache_key, json.dumps(results), ex=CACHE_TTL)
-        
-        update_progress(job_id, 100, f"Video search completed! Found {len(results)} matches")
-        return {"matches": results[:5]}
+        if cacheable:
+            result_cache.store(cache_key, generation, ranked)
+        # Identical searches arriving from now on hit the cache instead of joining this job
+        result_cache.release_search(cache_key, job_id)
+        
+        update_progress(job_id, 100, f"Video search completed! Found {len(ranked)} matches")
+        return {
+            "matches": catalog_matches(catalog, ranked),
+            "frames_sampled": len(frames),
+            "frames_analyzed": len(frame_embeddings),
+            "frames_skipped": frames_skipped
+        }
     except Exception as e:
         update_progress(job_id, -1, f"Error: {str(e)}")
         print(f"Error in video_search_task: {e}")
+        result_cache.release_search(cache_key, job_id)
         raise
 
 @celery_app.task(bind=True)
-def image_search_task(self, image_bytes, query, products_data):
+def image_search_task(self, image_digest, query, ranking="filter"):
     job_id = self.request.id
+    cache_key = get_cache_key(image_digest, query=query, ranking=ranking)
     try:
         update_progress(job_id, 0, "Starting image search...")
         
         update_progress(job_id, 5, "Loading image data...")
-        pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        # JPEG uploads are decoded at reduced resolution, just above CLIP's input size
+        pil_image = decode_image(get_blob_store().get(image_digest))
         
         update_progress(job_id, 15, "Processing image format...")
         update_progress(job_id, 25, "Preparing image for AI analysis...")
         
         update_progress(job_id, 35, "Generating image embedding...")
-        query_embedding = image_to_embedding(pil_image)
+        query_embedding = image_to_embedding(pil_image, cache_key=image_digest)
         
         update_progress(job_id, 45, "Embedding generation completed...")
         update_progress(job_id, 50, "Starting database comparison...")
         
-        def cosine_sim(a, b):
-            a = np.array(a)
-            b = np.array(b)
-            return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-        
-        results = []
-        total_products = len(products_data)
-        update_progress(job_id, 55, f"Comparing with {total_products} products...")
+        generation = result_cache.current_generation()
+        catalog = get_catalog()
+        cacheable = catalog.caught_up(generation)
+        update_progress(job_id, 55, f"Comparing with {len(catalog)} products...")
         
-        for i, p in enumerate(products_data):
-            # More granular progress updates
-            progress = 55 + (i / total_products) * 35
-            if i % max(1, total_products // 10) == 0:  # Update every 10% of products
-                update_progress(job_id, int(progress), f"Checking product {i+1}/{total_products}...")
-            
-            matched_images = []
-            for idx, emb in enumerate(p["embeddings"]):
-                sim = cosine_sim(query_embedding, emb)
-                sim = min(max(sim, 0.0), 1.0)
-                if sim >= settings.SIMILARITY_THRESHOLD:
-                    matched_images.append({
-                        "image_url": p["image_urls"][idx],
-                        "image_hash": p["image_hashes"][idx],
-                        "similarity": sim
-                    })
-            if matched_images:
-                results.append({
-                    "name": p["name"],
-                    "price": p["price"],
-                    "description": p["description"],
-                    "category": p["category"],
-                    "image_urls": p["image_urls"],
-                    "matched_images": matched_images
-                })
+        hits = catalog.search(query_embedding, settings.SIMILARITY_THRESHOLD)
+        ranked = rank_products(catalog, hits, query, ranking)
         
-        update_progress(job_id, 90, f"Found {len(results)} matching products...")
+        update_progress(job_id, 90, f"Found {len(ranked)} matching products...")
         update_progress(job_id, 95, "Finalizing results...")
-        results.sort(key=lambda x: max([m["similarity"] for m in x["matched_images"]]) if x["matched_images"] else 0, reverse=True)
         
-        cache_key = get_cache_key(image_bytes=image_bytes, query=query)
-        if redis_client:
-            redis_client.set(cache_key, json.dumps(results), ex=CACHE_TTL)
+        if cacheable:
+            result_cache.store(cache_key, generation, ranked)
+        # Identical searches arriving from now on hit the cache instead of joining this job
+        result_cache.release_search(cache_key, job_id)
         
-        update_progress(job_id, 100, f"Search completed! Found {len(results)} matches")
-        return {"matches": results[:5]}
+        update_progress(job_id, 100, f"Search completed! Found {len(ranked)} matches")
+        return {"matches": catalog_matches(catalog, ranked)}
     except Exception as e:
         update_progress(job_id, -1, f"Error: {str(e)}")
         print(f"Error in image_search_task: {e}")
+        result_cache.release_search(cache_key, job_id)
         raise
 
 @celery_app.task(bind=True)
-def text_search_task(self, query, products_data):
+def text_search_task(self, query):
     job_id = self.request.id
+    cache_key = get_cache_key(query=query)
     try:
         update_progress(job_id, 0, "Starting text search...")
         
         update_progress(job_id, 10, "Processing text query...")
-        update_progress(job_id, 20, "Preparing search parameters...")
-        
-        # Simple text-based filtering (can be enhanced with embeddings later)
-        words = query.lower().split()
-        results = []
-        total_products = len(products_data)
-        
-        update_progress(job_id, 30, f"Searching through {total_products} products...")
-        
-        for i, p in enumerate(products_data):
-            progress = 30 + (i / total_products) * 60
-            if i % max(1, total_products // 10) == 0:
-                update_progress(job_id, int(progress), f"Checking product {i+1}/{total_products}...")
-            
-            # Check if any word matches in name or description
-            name_lower = p["name"].lower()
-            desc_lower = p["description"].lower()
-            
-            matches = 0
-            for word in words:
-                if word in name_lower or word in desc_lower:
-                    matches += 1
-            
-            # Calculate relevance score based on matches
-            if matches > 0:
-                relevance = matches / len(words)
-                results.append({
-                    "name": p["name"],
-                    "price": p["price"],
-                    "description": p["description"],
-                    "category": p["category"],
-                    "image_urls": p["image_urls"],
-                    "relevance_score": relevance,
-                    "matched_words": matches
-                })
-        
-        update_progress(job_id, 90, f"Found {len(results)} matching products...")
+        update_progress(job_id, 20, "Encoding query with the CLIP text encoder...")
+        query_embedding = text_to_embedding(query)
+        
+        generation = result_cache.current_generation()
+        catalog = get_catalog()
+        cacheable = catalog.caught_up(generation)
+        update_progress(job_id, 40, f"Matching query against images of {len(catalog)} products...")
+        
+        # Semantic matches: the text vector against the image-embedding catalog
+        semantic = catalog.search(query_embedding, settings.TEXT_SIMILARITY_THRESHOLD)
+        
+        update_progress(job_id, 70, "Searching the keyword index...")
+        # BM25 over the inverted index only visits the postings of the query terms
+        keyword = catalog.text_search(query)
+        matched_words = {pid: matched for pid, _, matched in keyword}
+        
+        # Image matches first (by similarity), then keyword-only matches (by BM25 score)
+        ranked = [
+            (pid, image_hits, {"match_type": "semantic", "similarity": best_similarity(image_hits), "matched_words": matched_words.get(pid, 0)})
+            for pid, image_hits in semantic
+        ]
+        seen = {pid for pid, _ in semantic}
+        for pid, score, matched in keyword:
+            if pid not in seen:
+                ranked.append((pid, [], {"match_type": "keyword", "relevance_score": score, "matched_words": matched}))
+        
+        update_progress(job_id, 90, f"Found {len(ranked)} matching products...")
         update_progress(job_id, 95, "Finalizing results...")
         
-        # Sort by relevance score
-        results.sort(key=lambda x: x["relevance_score"], reverse=True)
-        
-        cache_key = get_cache_key(query=query)
-        if redis_client:
-            redis_client.set(cache_key, json.dumps(results), ex=CACHE_TTL)
+        if cacheable:
+            result_cache.store(cache_key, generation, ranked)
+        # Identical searches arriving from now on hit the cache instead of joining this job
+        result_cache.release_search(cache_key, job_id)
         
-        update_progress(job_id, 100, f"Text search completed! Found {len(results)} matches")
-        return {"matches": results[:5]}
+        update_progress(job_id, 100, f"Text search completed! Found {len(ranked)} matches")
+        return {"matches": catalog_matches(catalog, ranked)}
     except Exception as e:
         update_progress(job_id, -1, f"Error: {str(e)}")
         print(f"Error in text_search_task: {e}")
+        result_cache.release_search(cache_key, job_id)
         raise 
\ No newline at end of file
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Compute perceptual hashes for products stored before near-duplicate detection.
+
+Uploads are checked against the image_phashes of the catalog, which only products
+ingested since then carry. This downloads the images of the other products from
+their image_urls and stores their hashes, in batches paged by _id, while the
+services keep running. Re-running it is safe: only products still without
+image_phashes are touched, so products whose images could not be fetched are
+retried. Workers index the new hashes at their next full catalog reload
+(CATALOG_REFRESH_SECONDS) or restart.
+
+Usage (from the model/ directory, with the usual .env):
+    python scripts/backfill_phashes.py
+    python scripts/backfill_phashes.py --batch-size 100
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.perceptual_hash import backfill_phashes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None, help="Products per batch (default EMBEDDING_MIGRATION_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    def report(done, total, stats):
+        print(f"{done}/{total} products  {stats['hashed']} hashed  {stats['failed']} failed  {stats['elapsed_seconds']:.1f}s")
+
+    stats = backfill_phashes(batch_size=args.batch_size, progress=report)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Copy the embeddings of existing products into the Atlas vectors collection.
+
+With VECTOR_BACKEND=atlas, product writes are mirrored into VECTOR_COLLECTION as one
+document per image. Products stored before the switch are not, so run this once
+before switching an existing deployment to the atlas backend. Batches are paged by
+_id and vectors are upserted, so re-running it (e.g. after an interruption) is safe.
+
+Usage (from the model/ directory, with the usual .env):
+    python scripts/backfill_vectors.py
+    python scripts/backfill_vectors.py --batch-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.vector_store import backfill_vectors  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None, help="Products per batch (default EMBEDDING_MIGRATION_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    def report(done, total, stats):
+        print(f"{done}/{total} products  {stats['vectors']} vectors  {stats['elapsed_seconds']:.1f}s")
+
+    stats = backfill_vectors(batch_size=args.batch_size, progress=report)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CPU inference backends of the CLIP image encoder on this machine.
+
+For every backend the encoder is built, warmed up and compared with eager PyTorch
+(minimum cosine similarity over a fixed set of inputs). It then reports batched
+throughput in images per second and the p50/p99 latency of single-image calls.
+
+Usage (from the model/ directory):
+    python scripts/benchmark_inference.py
+    python scripts/benchmark_inference.py --backends eager onnx onnx-int8 --batch-size 16 --runs 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.inference_backends import (  # noqa: E402
+    IMAGE_BACKENDS, EagerEncoder, build_image_encoder, cosine_rows, parity_inputs, warm_up,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.CLIP_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=list(IMAGE_BACKENDS), choices=IMAGE_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=10, help="Batches timed for throughput")
+    parser.add_argument("--runs", type=int, default=30, help="Single-image calls timed for latency")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads for the run")
+    parser.add_argument("--onnx-dir", default=settings.CLIP_ONNX_DIR)
+    args = parser.parse_args()
+
+    import clip
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, _ = clip.load(args.model, device="cpu")
+    model.eval()
+    resolution = model.visual.input_resolution
+    eager = EagerEncoder(model)
+    parity = parity_inputs(resolution)
+    reference = eager(parity)
+    batch = parity_inputs(resolution, n=args.batch_size, seed=1)
+    single = parity_inputs(resolution, n=1, seed=2)
+    print(f"Model {args.model} ({resolution}px) on {torch.get_num_threads()} threads, batch size {args.batch_size}")
+    print(f"{'backend':18s} {'build s':>8s} {'min cos':>8s} {'img/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s}")
+
+    for backend in args.backends:
+        try:
+            start = time.perf_counter()
+            encoder = build_image_encoder(model, backend, resolution, args.model, args.onnx_dir)
+            build_seconds = time.perf_counter() - start
+            warm_up(encoder, parity)
+            min_cos = float(cosine_rows(encoder(parity), reference).min())
+
+            start = time.perf_counter()
+            for _ in range(args.batches):
+                encoder(batch)
+            images_per_second = args.batches * args.batch_size / (time.perf_counter() - start)
+
+            latencies = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                encoder(single)
+                latencies.append((time.perf_counter() - start) * 1000)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{backend:18s} {build_seconds:8.1f} {min_cos:8.4f} {images_per_second:8.1f} {p50:8.1f} {p99:8.1f}")
+        except Exception as e:
+            print(f"{backend:18s} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
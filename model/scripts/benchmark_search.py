@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the catalog matrix search engine against the legacy per-product loop.
+
+Builds a synthetic catalog of random embeddings, checks that both implementations
+return the same matches and reports timings. With --hnsw the HNSW index is measured
+as well (build time, query latency and recall of the thresholded matches).
+
+Usage (from the model/ directory):
+    python scripts/benchmark_search.py --products 20000 --dim 768
+    python scripts/benchmark_search.py --products 20000 --hnsw --hnsw-m 16 --hnsw-ef 128
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.catalog_matrix import CatalogMatrix  # noqa: E402
+
+
+def legacy_search(query_embedding, products, threshold):
+    """The original image_search_task scoring loop, kept here as the baseline."""
+    def cosine_sim(a, b):
+        a = np.array(a)
+        b = np.array(b)
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    results = []
+    for p in products:
+        matched = []
+        for idx, emb in enumerate(p["embeddings"]):
+            sim = min(max(cosine_sim(query_embedding, emb), 0.0), 1.0)
+            if sim >= threshold:
+                matched.append((idx, sim))
+        if matched:
+            results.append((p["name"], matched))
+    results.sort(key=lambda x: max(sim for _, sim in x[1]), reverse=True)
+    return results
+
+
+def make_catalog(num_products, dim, max_images, rng):
+    """Random catalog whose products are clustered around a few shared directions."""
+    centers = rng.standard_normal((64, dim))
+    products = []
+    for i in range(num_products):
+        center = centers[rng.integers(len(centers))]
+        count = int(rng.integers(1, max_images + 1))
+        embs = center + 0.6 * rng.standard_normal((count, dim))
+        products.append({"name": f"product-{i}", "embeddings": embs.tolist()})
+    query = (centers[0] + 0.6 * rng.standard_normal(dim)).tolist()
+    return products, query
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--max-images", type=int, default=4)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hnsw", action="store_true", help="Also benchmark the HNSW index")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=200)
+    parser.add_argument("--hnsw-ef", type=int, default=128)
+    parser.add_argument("--top-k", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    products, query = make_catalog(args.products, args.dim, args.max_images, rng)
+    print(f"Catalog: {args.products} products, dim={args.dim}, threshold={args.threshold}")
+
+    legacy_time, legacy = timed(lambda: legacy_search(query, products, args.threshold), 1)
+    build_time, catalog = timed(lambda: CatalogMatrix.from_products(products), 1)
+    print(f"Catalog matrix: {catalog.num_images} images, {catalog.vectors.nbytes / 1e6:.1f} MB")
+    search_time, hits = timed(lambda: catalog.search(query, args.threshold), args.repeat)
+
+    matrix = [(products[p]["name"], image_hits) for p, image_hits in hits]
+    same_products = [name for name, _ in legacy] == [name for name, _ in matrix]
+    max_diff = max(
+        (abs(a[1] - b[1]) for (_, la), (_, ma) in zip(legacy, matrix) for a, b in zip(la, ma)),
+        default=0.0,
+    )
+    print(f"Matches: legacy={len(legacy)} matrix={len(matrix)} identical_ranking={same_products} max_score_diff={max_diff:.2e}")
+
+    print(f"Legacy loop:          {legacy_time * 1000:10.1f} ms")
+    print(f"Matrix build (once):  {build_time * 1000:10.1f} ms")
+    print(f"Matrix search:        {search_time * 1000:10.1f} ms")
+    print(f"Speedup (search):     {legacy_time / search_time:10.1f}x")
+    print(f"Speedup (build+search): {legacy_time / (build_time + search_time):8.1f}x")
+
+    if args.hnsw:
+        from app.core.ann_index import HNSWIndex
+        from app.core.catalog_matrix import normalize_rows
+
+        index_time, index = timed(lambda: HNSWIndex.build(
+            catalog.vectors, M=args.hnsw_m, ef_construction=args.hnsw_ef_construction, ef_search=args.hnsw_ef,
+        ), 1)
+
+        def ann_search():
+            rows, sims = index.query(normalize_rows(query), args.top_k)
+            return catalog.group_hits(rows, sims, args.threshold)
+
+        ann_time, ann_hits = timed(ann_search, args.repeat)
+        exact_products = {p for p, _ in hits}
+        recall = len(exact_products & {p for p, _ in ann_hits}) / max(len(exact_products), 1)
+        print(f"HNSW build (M={args.hnsw_m}, efC={args.hnsw_ef_construction}): {index_time * 1000:10.1f} ms")
+        print(f"HNSW search (ef={args.hnsw_ef}, k={args.top_k}): {ann_time * 1000:10.2f} ms  recall={recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
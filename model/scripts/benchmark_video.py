@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark video frame sampling: the seek-based sampler against the legacy decoder.
+
+The legacy path writes the upload to a temporary file and decodes every frame with
+vidcap.read(), keeping one every 2 seconds until 8 frames are collected. The new
+sampler seeks/grabs to frames spread over the whole clip.
+
+Usage (from the model/ directory):
+    python scripts/benchmark_video.py path/to/clip.mp4
+    python scripts/benchmark_video.py --synthetic-seconds 60   # generates a test clip
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.video_utils import sample_frames  # noqa: E402
+
+
+def legacy_extract(video_bytes, interval=2, max_frames=8):
+    """The original extract_frames_from_bytes from video_search_task."""
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+        tmp.write(video_bytes)
+        tmp_path = tmp.name
+    vidcap = cv2.VideoCapture(tmp_path)
+    frames = []
+    fps = vidcap.get(cv2.CAP_PROP_FPS) or 25
+    count = 0
+    while True:
+        success, image = vidcap.read()
+        if not success or len(frames) >= max_frames:
+            break
+        if int(count % (fps * interval)) == 0:
+            frames.append(image)
+        count += 1
+    vidcap.release()
+    os.remove(tmp_path)
+    return frames
+
+
+def make_clip(seconds, fps=30, size=(1280, 720)):
+    """Write a synthetic clip with a moving gradient and return its bytes."""
+    path = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False).name
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    base = np.linspace(0, 255, size[0], dtype=np.uint8)[None, :, None].repeat(size[1], 0).repeat(3, 2)
+    for i in range(int(seconds * fps)):
+        writer.write(np.roll(base, i * 4, axis=1))
+    writer.release()
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Video file to sample")
+    parser.add_argument("--synthetic-seconds", type=float, default=60)
+    parser.add_argument("--max-frames", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.video:
+        with open(args.video, "rb") as f:
+            video_bytes = f.read()
+    else:
+        print(f"Generating a {args.synthetic_seconds:.0f}s synthetic clip...")
+        video_bytes = make_clip(args.synthetic_seconds)
+    print(f"Video size: {len(video_bytes) / 1e6:.1f} MB")
+
+    for name, fn in (
+        ("legacy read()", lambda: legacy_extract(video_bytes, max_frames=args.max_frames)),
+        ("seek sampler", lambda: sample_frames(video_bytes, max_frames=args.max_frames)),
+    ):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            frames = fn()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:15s} {best * 1000:9.1f} ms  frames={len(frames)}")
+
+
+if __name__ == "__main__":
+    main()
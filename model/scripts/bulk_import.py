@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Bulk-import products from a products.json-style manifest.
+
+Images are read from a directory (manifest paths are resolved relative to it, or
+by file name) or from a zip archive, then deduplicated, embedded and uploaded in
+chunks and committed with bulk_write. Re-running an interrupted import skips the
+products it already committed.
+
+Usage (from the model/ directory, with the usual .env):
+    python scripts/bulk_import.py images_data/products.json --images .
+    python scripts/bulk_import.py products.json --archive images.zip --chunk-size 64
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.bulk_import import DirectoryImageSource, ZipImageSource, import_products  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON array of products (see images_data/products.json)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--images", default=".", help="Directory the manifest image paths are relative to")
+    group.add_argument("--archive", help="Zip archive holding the manifest images")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Products per batch (default BULK_IMPORT_CHUNK_SIZE)")
+    args = parser.parse_args()
+
+    source = ZipImageSource(args.archive) if args.archive else DirectoryImageSource(args.images)
+
+    def report(done, total, stats):
+        print(f"{done}/{total} processed  imported={stats['imported']} skipped={stats['skipped']} "
+              f"duplicates={stats['duplicates']} failed={stats['failed']}  {stats['products_per_second']:.2f} products/s")
+
+    stats = import_products(args.manifest, source, chunk_size=args.chunk_size, progress=report)
+    for detail in stats.pop("error_details"):
+        print(f"  error: {detail}")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the image storage: accepts PUT uploads and serves them back.
+
+Point the model service at it with IMAGE_STORAGE=http and
+IMAGE_STORAGE_URL=http://localhost:8090/images to exercise product ingestion
+without a Cloudinary account.
+
+Usage (from the model/ directory):
+    python scripts/local_storage_server.py --port 8090 --root /tmp/images
+    python scripts/local_storage_server.py --fail-rate 0.3   # inject upload failures
+    python scripts/local_storage_server.py --fail-first 2 --drop-first 1   # deterministic failures
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(root, fail_rate=0.0, latency=0.0, fail_first=0, drop_first=0):
+    """Request handler class storing into ``root``.
+
+    The first ``drop_first`` uploads get their connection closed without a response,
+    the next ``fail_first`` get HTTP 503; after that ``fail_rate`` applies. The counters
+    are exposed as ``StorageHandler.stats``.
+    """
+    lock = threading.Lock()
+
+    class StorageHandler(BaseHTTPRequestHandler):
+        stats = {"puts": 0, "stored": 0}
+
+        def _path(self):
+            name = os.path.basename(self.path.rstrip("/"))
+            return os.path.join(root, name) if name else None
+
+        def do_PUT(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length)
+            time.sleep(latency)
+            with lock:
+                self.stats["puts"] += 1
+                attempt = self.stats["puts"]
+            if attempt <= drop_first:
+                self.close_connection = True
+                return
+            if attempt <= drop_first + fail_first or random.random() < fail_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            path = self._path()
+            if path is None:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with open(path, "wb") as f:
+                f.write(data)
+            with lock:
+                self.stats["stored"] += 1
+            self.send_response(201)
+            self.end_headers()
+
+        def do_GET(self):
+            path = self._path()
+            if path is None or not os.path.exists(path):
+                self.send_response(404)
+                self.end_headers()
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return StorageHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--root", default=os.path.join(os.getcwd(), "local_storage"))
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of uploads answered with HTTP 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every upload")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N uploads with HTTP 503")
+    parser.add_argument("--drop-first", type=int, default=0, help="Close the connection of the first N uploads without answering")
+    args = parser.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.root, args.fail_rate, args.latency, args.fail_first, args.drop_first))
+    print(f"Serving {args.root} on http://{args.host}:{args.port}/images/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rewrite stored product embeddings into the packed binary format.
+
+Products written before embeddings were packed hold them as arrays of doubles. This
+rewrites them, in batches paged by _id, as L2-normalized float32 (or float16)
+binary values while the API and workers keep running. Re-running it is safe: only
+documents still holding arrays are touched, unless --reencode is given (to switch
+every product to another --dtype).
+
+Usage (from the model/ directory, with the usual .env):
+    python scripts/migrate_embeddings.py
+    python scripts/migrate_embeddings.py --dtype float16 --reencode --batch-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.embedding_codec import EMBEDDING_SUBTYPES, migrate_embeddings  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", choices=list(EMBEDDING_SUBTYPES), default=None, help="Packed dtype (default EMBEDDING_STORAGE_DTYPE)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Documents per batch (default EMBEDDING_MIGRATION_BATCH_SIZE)")
+    parser.add_argument("--reencode", action="store_true", help="Also repack documents that are already binary")
+    args = parser.parse_args()
+
+    def report(done, total, stats):
+        print(f"{done}/{total} rewritten  {stats['bytes_before']} -> {stats['bytes_after']} bytes  {stats['elapsed_seconds']:.1f}s")
+
+    stats = migrate_embeddings(batch_size=args.batch_size, dtype=args.dtype, reencode=args.reencode, progress=report)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Shared setup of the unit tests (run from model/: ``python -m pytest test``)."""
+import os
+
+# Settings validates these on import; the unit tests never connect to the services
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+for name in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+    os.environ.setdefault(name, "test")
+
+# api_test.py drives a running server (see README.md), it is not a unit test
+collect_ignore = ["api_test.py"]
+
+import types
+import mongomock
+import pytest
+
+class BulkWriteCollection:
+    """mongomock collection whose ``bulk_write`` applies UpdateOne models one by one.
+
+    mongomock's own ``bulk_write`` does not accept the write models of current pymongo.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def bulk_write(self, operations, ordered=True):
+        upserted_ids, matched_count = {}, 0
+        for i, operation in enumerate(operations):
+            result = self._collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            matched_count += result.matched_count
+            if result.upserted_id is not None:
+                upserted_ids[i] = result.upserted_id
+        return types.SimpleNamespace(upserted_ids=upserted_ids, matched_count=matched_count)
+
+@pytest.fixture
+def mongo_db():
+    """A fresh in-memory MongoDB database."""
+    return mongomock.MongoClient().db
+
+@pytest.fixture
+def products_col(mongo_db):
+    return BulkWriteCollection(mongo_db.products)
+
+@pytest.fixture
+def redis_client():
+    """Redis seen by the result cache; None runs it without Redis (override to use one)."""
+    return None
+
+@pytest.fixture
+def vectors_col():
+    from app.core.local_vector_search import LocalVectorSearchCollection
+    return LocalVectorSearchCollection()
+
+@pytest.fixture
+def local_services(monkeypatch, mongo_db, products_col, vectors_col, redis_client):
+    """Point the catalog, its sync and the result cache at in-memory services (exact backend, no catalog loaded)."""
+    from app.core import catalog, db, result_cache
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "exact")
+    monkeypatch.setattr(db, "_products_col", products_col)
+    monkeypatch.setattr(db, "_vectors_col", vectors_col)
+    monkeypatch.setattr(db, "_counters_col", mongo_db.counters)
+    monkeypatch.setattr(catalog, "_catalog", None)
+    monkeypatch.setattr(result_cache, "get_binary_redis", lambda: redis_client)
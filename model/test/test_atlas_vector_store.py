@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.core.catalog_matrix import normalize_rows
+from app.core.local_vector_search import LocalVectorSearchCollection
+from app.core.embedding_codec import encode_embeddings
+from app.core.vector_store import AtlasVectorStore, ExactVectorStore, backfill_vectors
+
+DIM = 16
+
+@pytest.fixture(autouse=True)
+def small_dimension(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+    # Large enough for every image above the thresholds used below
+    monkeypatch.setattr(settings, "SEARCH_TOP_K", 1000)
+    monkeypatch.setattr(settings, "ATLAS_NUM_CANDIDATES", 1000)
+
+@pytest.fixture
+def stores():
+    rng = np.random.default_rng(0)
+    ids = [f"p{i}" for i in range(40)]
+    embeddings = [normalize_rows(rng.standard_normal((rng.integers(1, 4), DIM))) for _ in ids]
+    atlas = AtlasVectorStore(LocalVectorSearchCollection())
+    for product_id, embs in zip(ids, embeddings):
+        atlas.add(product_id, embs)
+    return rng, ids, embeddings, atlas, ExactVectorStore(ids, embeddings)
+
+def assert_same_results(results, expected):
+    assert [pid for pid, _ in results] == [pid for pid, _ in expected]
+    for (_, hits), (_, expected_hits) in zip(results, expected):
+        assert [i for i, _ in hits] == [i for i, _ in expected_hits]
+        assert np.allclose([s for _, s in hits], [s for _, s in expected_hits], atol=1e-5)
+
+def test_search_matches_exact_store(stores):
+    rng, ids, embeddings, atlas, exact = stores
+    for target in (0, 7, 33):
+        query = embeddings[target][0] + 0.3 * rng.standard_normal(DIM)
+        # Grouping per product and the (1 + cos) / 2 -> cos mapping reproduce the exact scan
+        assert_same_results(atlas.search(query, 0.1), exact.search(query, 0.1))
+
+def test_score_mapping(stores):
+    _, _, embeddings, atlas, _ = stores
+    query = embeddings[5][0]
+    docs = atlas.collection.aggregate(atlas.build_pipeline(query))
+    best = docs[0]
+    assert (best["product_id"], best["image_index"]) == ("p5", 0)
+    assert best["score"] == pytest.approx(1.0, abs=1e-6)
+    assert set(best) == {"product_id", "image_index", "score"}
+    hits = dict(atlas.search(query, 0.0))
+    for doc in docs[:10]:
+        sim = dict(hits[doc["product_id"]])[doc["image_index"]]
+        assert sim == pytest.approx(2.0 * doc["score"] - 1.0, abs=1e-6)
+
+def test_filter_is_pushed_down(stores):
+    _, _, embeddings, atlas, exact = stores
+    allowed = {"p3", "p1", "p20"}
+    pipeline = atlas.build_pipeline(embeddings[0][0], allowed)
+    assert pipeline[0]["$vectorSearch"]["filter"] == {"product_id": {"$in": ["p1", "p20", "p3"]}}
+    assert all(doc["product_id"] in allowed for doc in atlas.collection.aggregate(pipeline))
+    assert_same_results(atlas.search(embeddings[0][0], 0.0, allowed), exact.search(embeddings[0][0], 0.0, allowed))
+    assert atlas.search(embeddings[0][0], 0.0, set()) == []
+
+def test_add_is_idempotent_and_remove(stores):
+    _, _, embeddings, atlas, _ = stores
+    count = len(atlas.collection.docs)
+    atlas.add("p2", embeddings[2])
+    assert len(atlas.collection.docs) == count
+    atlas.remove("p2")
+    assert "p2" not in {pid for pid, _ in atlas.search(embeddings[2][0], 0.0)}
+
+def test_backfill_copies_existing_products(products_col):
+    rng = np.random.default_rng(1)
+    embeddings = [normalize_rows(rng.standard_normal((rng.integers(1, 4), DIM))) for _ in range(25)]
+    ids = [str(products_col.insert_one({"name": f"p{i}", "embeddings": encode_embeddings(embs)}).inserted_id) for i, embs in enumerate(embeddings)]
+    products_col.insert_one({"name": "legacy", "embeddings": embeddings[0].tolist()})
+    products_col.insert_one({"name": "gone", "deleted": True})
+    atlas = AtlasVectorStore(LocalVectorSearchCollection())
+    reports = []
+    stats = backfill_vectors(products_col, atlas, batch_size=10, progress=lambda done, total, _: reports.append((done, total)))
+    assert reports == [(10, 26), (20, 26), (26, 26)]
+    assert stats["products"] == 26 and stats["vectors"] == sum(len(embs) for embs in embeddings) + len(embeddings[0])
+    assert_same_results(atlas.search(embeddings[7][0], 0.2, set(ids)), ExactVectorStore(ids, embeddings).search(embeddings[7][0], 0.2))
+    # Upserts: running it again adds nothing
+    count = len(atlas.collection.docs)
+    backfill_vectors(products_col, atlas, batch_size=10)
+    assert len(atlas.collection.docs) == count
@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import os
+import time
+import pytest
+from app.core import blob_store
+from app.core.blob_store import BlobStore, spool_upload
+from app.core.config import settings
+
+class Upload:
+    """Stand-in for FastAPI's UploadFile: an async ``read(size)`` over bytes."""
+
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.offset = 0
+        self.reads = 0
+        self.fail_after = fail_after
+
+    async def read(self, size):
+        self.reads += 1
+        if self.fail_after is not None and self.reads > self.fail_after:
+            raise ConnectionError("client disconnected")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "CHUNK_SIZE", 1000)
+    return BlobStore(str(tmp_path))
+
+def stored_files(store):
+    return sorted(name for dirpath, _, names in os.walk(store.root) for name in names)
+
+def test_put_and_get_are_content_addressed(store):
+    data = os.urandom(5000)
+    digest = store.put(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert store.get(digest) == data
+    assert store.put(data) == digest
+    assert stored_files(store) == [digest]
+    with pytest.raises(ValueError):
+        store.path("../../etc/passwd")
+    with pytest.raises(FileNotFoundError):
+        store.get("0" * 64)
+
+def test_spool_upload_streams_and_dedupes(store):
+    data = os.urandom(4500)
+    upload = Upload(data)
+    digest = asyncio.run(spool_upload(upload, store))
+    assert digest == hashlib.sha256(data).hexdigest()
+    # Five chunks and the empty read at the end
+    assert upload.reads == 6
+    assert store.get(digest) == data
+    assert asyncio.run(spool_upload(Upload(data), store)) == digest
+    assert stored_files(store) == [digest]
+
+def test_known_digest_is_not_read_again(store):
+    data = os.urandom(3000)
+    digest = store.put(data)
+    os.utime(store.path(digest), (0, 0))
+    upload = Upload(data)
+    assert asyncio.run(spool_upload(upload, store, expected_digest=digest.upper())) == digest
+    assert upload.reads == 0
+    # Touched, so the prune keeps it
+    assert os.path.getmtime(store.path(digest)) > time.time() - 60
+
+def test_failed_upload_leaves_nothing_behind(store):
+    with pytest.raises(ConnectionError):
+        asyncio.run(spool_upload(Upload(os.urandom(4500), fail_after=2), store))
+    assert stored_files(store) == []
+
+def test_prune_removes_old_blobs_and_abandoned_uploads(store):
+    old, recent = store.put(b"old"), store.put(b"recent")
+    abandoned = store.writer()
+    abandoned.write(b"partial")
+    abandoned.file.close()
+    for path in (store.path(old), abandoned.tmp_path):
+        os.utime(path, (0, 0))
+    assert store.prune(max_age=3600) == 2
+    assert stored_files(store) == [recent]
+    assert store.get(recent) == b"recent"
+
+def test_maybe_prune_runs_at_most_once_per_interval(store, monkeypatch):
+    monkeypatch.setattr(settings, "BLOB_STORE_PRUNE_INTERVAL", 3600)
+    runs = []
+    monkeypatch.setattr(store, "prune", lambda: runs.append(1) or 0)
+    store.maybe_prune()
+    store.maybe_prune()
+    deadline = time.time() + 5
+    while not runs and time.time() < deadline:
+        time.sleep(0.01)
+    assert runs == [1]
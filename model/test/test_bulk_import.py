@@ -0,0 +1,126 @@
+import hashlib
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from app.core.config import settings
+
+# The ingest pipeline imports the CLIP encoder; embeddings themselves are faked below
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+from app.core import ingest  # noqa: E402
+from app.core.bulk_import import import_products, manifest_key  # noqa: E402
+from app.core.catalog import ProductCatalog  # noqa: E402
+from app.core.catalog_sync import SEQ_FIELD  # noqa: E402
+from app.core.storage import ImageStorage  # noqa: E402
+from app.core.vector_store import create_vector_store  # noqa: E402
+
+DIM = 16
+
+pytestmark = pytest.mark.usefixtures("local_services")
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+    # Only identical perceptual hashes count as near-duplicates of the random test images
+    monkeypatch.setattr(settings, "PHASH_MAX_DISTANCE", 0)
+
+    def embed(images, batch_size=None, cache_keys=None):
+        return [np.random.default_rng(int(key[:8], 16)).standard_normal(DIM).tolist() for key in cache_keys]
+
+    monkeypatch.setattr(ingest, "batch_images_to_embeddings", embed)
+
+class MemoryStorage(ImageStorage):
+    def __init__(self):
+        self.objects = {}
+
+    def upload(self, image_bytes, key):
+        self.objects[key] = image_bytes
+        return f"memory://{key}"
+
+class MemorySource:
+    def __init__(self, files):
+        self.files = files
+
+    def read(self, path):
+        if path not in self.files:
+            raise FileNotFoundError(f"Image not found: {path}")
+        return self.files[path]
+
+def png(seed):
+    image = Image.fromarray(np.random.default_rng(seed).integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def make_manifest(n):
+    manifest = [
+        {"name": f"product {i}", "price": 10 + i, "description": "test", "category": "misc", "images": [f"{i}.png"]}
+        for i in range(n)
+    ]
+    return manifest, MemorySource({f"{i}.png": png(i) for i in range(n)})
+
+def run(manifest, source, products_col, chunk_size=3, **kwargs):
+    catalog = ProductCatalog([], [], create_vector_store())
+    return import_products(manifest, source, products_col, catalog, MemoryStorage(), chunk_size=chunk_size, **kwargs)
+
+def count_bulk_writes(products_col, monkeypatch, fail_on=None):
+    """Record the size of every bulk_write; the ``fail_on``-th one (1-based) raises instead."""
+    calls = []
+    bulk_write = products_col.bulk_write
+
+    def recorded(operations, ordered=True):
+        calls.append(len(operations))
+        if len(calls) == fail_on:
+            raise ConnectionError("connection lost")
+        return bulk_write(operations, ordered)
+
+    monkeypatch.setattr(products_col, "bulk_write", recorded, raising=False)
+    return calls
+
+def test_products_are_committed_chunk_by_chunk(products_col, monkeypatch):
+    manifest, source = make_manifest(7)
+    writes = count_bulk_writes(products_col, monkeypatch)
+    reports = []
+    stats = run(manifest, source, products_col, progress=lambda done, total, _: reports.append((done, total)))
+    assert writes == [3, 3, 1]
+    assert reports == [(3, 7), (6, 7), (7, 7)]
+    assert (stats["imported"], stats["images"], stats["skipped"], stats["failed"]) == (7, 7, 0, 0)
+    docs = list(products_col.find())
+    assert sorted(doc["import_key"] for doc in docs) == sorted(manifest_key(entry) for entry in manifest)
+    assert sorted(doc[SEQ_FIELD] for doc in docs) == list(range(1, 8))
+    for doc in docs:
+        image = source.files[f"{doc['name'].split()[1]}.png"]
+        assert doc["image_hashes"] == [hashlib.sha256(image).hexdigest()]
+        assert doc["image_urls"] == [f"memory://{doc['image_hashes'][0]}"]
+
+def test_rerun_skips_committed_products(products_col, monkeypatch):
+    manifest, source = make_manifest(5)
+    run(manifest, source, products_col)
+    writes = count_bulk_writes(products_col, monkeypatch)
+    stats = run(manifest, source, products_col)
+    assert (stats["imported"], stats["skipped"], stats["duplicates"]) == (0, 5, 0)
+    assert writes == []
+    assert products_col.count_documents({}) == 5
+
+def test_concurrent_run_upserts_each_product_once(products_col, monkeypatch):
+    manifest, source = make_manifest(3)
+    # Another run committed the first entry after this one looked it up
+    products_col.insert_one({"import_key": manifest_key(manifest[0]), "name": "product 0"})
+    find = products_col.find
+    monkeypatch.setattr(products_col, "find", lambda query, *args: find({"_id": None}) if "import_key" in query else find(query, *args), raising=False)
+    stats = run(manifest, source, products_col)
+    assert (stats["imported"], stats["skipped"]) == (2, 1)
+    assert products_col.count_documents({"import_key": manifest_key(manifest[0])}) == 1
+
+def test_resume_after_a_failed_chunk(products_col, monkeypatch):
+    manifest, source = make_manifest(8)
+    writes = count_bulk_writes(products_col, monkeypatch, fail_on=2)
+    with pytest.raises(ConnectionError):
+        run(manifest, source, products_col)
+    assert products_col.count_documents({}) == 3
+    stats = run(manifest, source, products_col)
+    assert (stats["imported"], stats["skipped"]) == (5, 3)
+    # Only the chunks that were not committed are written again
+    assert writes == [3, 3, 3, 2]
+    assert sorted(doc["name"] for doc in products_col.find()) == sorted(entry["name"] for entry in manifest)
@@ -0,0 +1,105 @@
+import numpy as np
+from app.core.catalog_matrix import CatalogMatrix, normalize_rows
+
+DIM = 16
+
+def make_catalog(rng, counts):
+    return [rng.standard_normal((n, DIM)).astype(np.float32) for n in counts]
+
+def brute_force(embeddings, query, threshold):
+    """Reference ranking: cosine of every image, products ordered by their best image."""
+    query = query / np.linalg.norm(query)
+    results = []
+    for p, embs in enumerate(embeddings):
+        if not len(embs):
+            continue
+        sims = np.clip(normalize_rows(embs) @ query, 0.0, 1.0)
+        hits = [(i, float(s)) for i, s in enumerate(sims) if s >= threshold]
+        if hits:
+            results.append((p, hits))
+    return sorted(results, key=lambda item: -max(s for _, s in item[1]))
+
+def test_from_embeddings_normalizes_and_builds_offsets():
+    rng = np.random.default_rng(0)
+    embeddings = make_catalog(rng, [2, 0, 3])
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    assert matrix.vectors.shape == (5, DIM)
+    assert matrix.offsets.tolist() == [0, 2, 2, 5]
+    assert matrix.image_product.tolist() == [0, 0, 2, 2, 2]
+    assert np.allclose(np.linalg.norm(matrix.vectors, axis=1), 1.0)
+
+def test_empty_catalog():
+    matrix = CatalogMatrix.from_embeddings([], dim=DIM)
+    assert matrix.num_products == 0 and matrix.num_images == 0
+    assert matrix.search(np.ones(DIM), 0.0) == []
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(1)
+    embeddings = make_catalog(rng, [3, 1, 0, 4, 2] * 10)
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    query = embeddings[8][1] + 0.1 * rng.standard_normal(DIM).astype(np.float32)
+    results = matrix.search(query, 0.2)
+    expected = brute_force(embeddings, query, 0.2)
+    assert [p for p, _ in results] == [p for p, _ in expected]
+    assert results[0][0] == 8
+    for (_, hits), (_, expected_hits) in zip(results, expected):
+        assert [i for i, _ in hits] == [i for i, _ in expected_hits]
+        assert np.allclose([s for _, s in hits], [s for _, s in expected_hits], atol=1e-5)
+
+def test_product_mask_restricts_results():
+    rng = np.random.default_rng(2)
+    embeddings = make_catalog(rng, [2, 2, 2])
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    mask = np.array([False, True, False])
+    assert [p for p, _ in matrix.search(embeddings[0][0], 0.0, mask)] == [1]
+
+def test_search_many_keeps_best_similarity_per_image():
+    rng = np.random.default_rng(3)
+    embeddings = make_catalog(rng, [2, 3, 1])
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    queries = np.stack([embeddings[0][1], embeddings[1][2]])
+    results = dict(matrix.search_many(queries, 0.99))
+    assert results == {0: [(1, results[0][0][1])], 1: [(2, results[1][0][1])]}
+    best = np.max(np.clip(normalize_rows(queries) @ matrix.vectors.T, 0.0, 1.0), axis=0)
+    full = dict(matrix.search_many(queries, 0.0))
+    for p, hits in full.items():
+        for i, sim in hits:
+            assert np.isclose(sim, best[matrix.offsets[p] + i], atol=1e-6)
+
+def test_group_hits_matches_search_on_all_rows():
+    rng = np.random.default_rng(4)
+    embeddings = make_catalog(rng, [3, 2, 4])
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    query = embeddings[2][0]
+    sims = matrix.image_scores(query)
+    grouped = matrix.group_hits(np.arange(matrix.num_images), sims, 0.1)
+    assert grouped == matrix.search(query, 0.1)
+
+def test_zero_threshold_skips_products_without_images():
+    rng = np.random.default_rng(5)
+    embeddings = make_catalog(rng, [2, 0, 1])
+    matrix = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    results = matrix.search(rng.standard_normal(DIM), 0.0)
+    assert sorted(p for p, _ in results) == [0, 2]
+    assert all(hits for _, hits in results)
+
+def test_append_matches_a_matrix_built_at_once():
+    rng = np.random.default_rng(6)
+    embeddings = make_catalog(rng, [2, 0, 3, 1, 0, 4] * 20)
+    matrix = CatalogMatrix.from_embeddings([], dim=DIM)
+    capacities, first_row = set(), 0
+    for start in range(0, len(embeddings), 7):
+        batch = embeddings[start:start + 7]
+        rows = matrix.append(batch)
+        assert rows.tolist() == list(range(first_row, first_row + sum(len(embs) for embs in batch)))
+        first_row += len(rows)
+        capacities.add(len(matrix._vectors))
+    whole = CatalogMatrix.from_embeddings(embeddings, dim=DIM)
+    assert np.allclose(matrix.vectors, whole.vectors)
+    assert matrix.offsets.tolist() == whole.offsets.tolist()
+    assert matrix.image_product.tolist() == whole.image_product.tolist()
+    assert matrix.nonempty.tolist() == whole.nonempty.tolist()
+    # Capacity doubles, so the matrix is copied a logarithmic number of times
+    assert len(capacities) <= int(np.log2(whole.num_images)) + 2
+    results, expected = matrix.search(embeddings[14][2], 0.2), whole.search(embeddings[14][2], 0.2)
+    assert [(p, [i for i, _ in hits]) for p, hits in results] == [(p, [i for i, _ in hits]) for p, hits in expected]
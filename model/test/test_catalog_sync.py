@@ -0,0 +1,207 @@
+import struct
+import time
+import numpy as np
+import pytest
+from bson import ObjectId
+from app.core import catalog as catalog_module
+from app.core.catalog import ProductCatalog, add_to_resident_catalog, delete_product
+from app.core.catalog_matrix import normalize_rows
+from app.core.catalog_sync import SEQ_FIELD, SyncCheckpoint, current_sequence, reserve_sequence, stamp
+from app.core.config import settings
+
+DIM = 16
+GAP = settings.CATALOG_SYNC_GAP_SECONDS
+
+pytestmark = pytest.mark.usefixtures("local_services")
+
+@pytest.fixture(autouse=True)
+def small_dimension(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+
+rng = np.random.default_rng(0)
+
+def make_product(name, phash="0f0f0f0f0f0f0f0f", _id=None):
+    doc = {
+        "name": name,
+        "embeddings": normalize_rows(rng.standard_normal((2, DIM))).tolist(),
+        "image_phashes": [phash],
+    }
+    if _id is not None:
+        doc["_id"] = _id
+    return doc
+
+def insert(products_col, doc):
+    if SEQ_FIELD not in doc:
+        stamp([doc])
+    products_col.insert_one(doc)
+    return str(doc["_id"])
+
+def old_object_id(age_seconds):
+    """An ObjectId generated ``age_seconds`` ago."""
+    return ObjectId(struct.pack(">I", int(time.time() - age_seconds)) + ObjectId().binary[4:])
+
+def found(catalog, doc):
+    return [product_id for product_id, _ in catalog.search(doc["embeddings"][0], 0.99)]
+
+def test_checkpoint_advances_over_contiguous_sequences():
+    state = SyncCheckpoint()
+    for seq in (1, 2, 3):
+        state.applied(seq)
+    assert state.advance(now=0.0) == 3
+    assert not state.pending and not state.missing
+    assert state.delta_query() == {SEQ_FIELD: {"$gt": 3}}
+
+def test_checkpoint_waits_at_a_hole_until_it_expires():
+    state = SyncCheckpoint()
+    for seq in (1, 3, 4):
+        state.applied(seq)
+    assert state.advance(now=100.0) == 1
+    assert state.missing == {2: 100.0}
+    # The hole is queried again, the sequences applied after it are not
+    assert state.delta_query() == {SEQ_FIELD: {"$gt": 1, "$nin": [3, 4]}}
+    assert state.advance(now=100.0 + GAP - 1) == 1
+    assert state.advance(now=100.0 + GAP) == 4
+    assert not state.pending and not state.missing
+
+def test_checkpoint_fills_a_late_sequence():
+    state = SyncCheckpoint()
+    state.applied(2)
+    assert state.advance(now=0.0) == 0
+    state.applied(1)
+    assert state.advance(now=1.0) == 2
+    assert not state.missing
+
+def test_expected_sequences_are_queried_again():
+    state = SyncCheckpoint(10)
+    state.expect([7, 9, 12], now=0.0)
+    assert state.checkpoint == 6
+    assert state.delta_query() == {SEQ_FIELD: {"$gt": 6, "$nin": [8, 10]}}
+    state.applied(9)
+    assert state.advance(now=1.0) == 6
+    assert state.advance(now=GAP) == 10
+    assert not state.missing
+
+def test_expected_sequence_above_every_applied_one_expires():
+    state = SyncCheckpoint(5)
+    state.expect([5], now=0.0)
+    assert state.advance(now=1.0) == 4
+    assert state.advance(now=GAP) == 5
+
+def test_sync_inserts_products_of_other_writers(products_col):
+    first = make_product("red cotton shirt")
+    insert(products_col, first)
+    catalog = ProductCatalog.load()
+    second = make_product("blue denim jacket", phash="f0f0f0f0f0f0f0f0")
+    second_id = insert(products_col, second)
+    assert catalog.sync() == 1
+    assert len(catalog) == 2
+    assert found(catalog, second) == [second_id]
+    assert [hit[0] for hit in catalog.text_search("jacket")] == [second_id]
+    assert catalog.near_duplicates("f0f0f0f0f0f0f0f0", 0) == [(second_id, 0)]
+    assert catalog.sync_state.checkpoint == current_sequence()
+    assert catalog.sync() == 0
+
+def test_sync_tombstones_deleted_products(products_col):
+    doc = make_product("green wool scarf")
+    product_id = insert(products_col, doc)
+    catalog = ProductCatalog.load()
+    assert found(catalog, doc) == [product_id]
+    assert delete_product(product_id)
+    assert not delete_product(product_id)
+    assert catalog.sync() == 1
+    assert len(catalog) == 0
+    assert catalog.tombstones == 1
+    assert found(catalog, doc) == []
+    assert catalog.text_search("scarf") == []
+    assert catalog.near_duplicates("0f0f0f0f0f0f0f0f", 0) == []
+    # A reload no longer reads the tombstone as a product
+    assert len(ProductCatalog.load()) == 0
+
+def test_replaced_product_is_reindexed():
+    catalog = ProductCatalog([], [], catalog_module.create_vector_store())
+    old = make_product("plain mug", _id="a")
+    old[SEQ_FIELD] = 1
+    new = make_product("striped mug", _id="a")
+    new[SEQ_FIELD] = 2
+    assert catalog.apply_changes([old]) == 1
+    assert catalog.apply_changes([new]) == 1
+    # An older version arriving late is ignored
+    assert catalog.apply_changes([old]) == 0
+    assert len(catalog) == 1
+    assert catalog.product("a")["name"] == "striped mug"
+    assert found(catalog, new) == ["a"]
+    assert found(catalog, old) == []
+
+def test_sync_applies_a_late_sequence(products_col):
+    catalog = ProductCatalog.load()
+    late, early = make_product("late lamp"), make_product("early desk")
+    stamp([late, early])
+    early_id = insert(products_col, early)
+    catalog.sync()
+    assert found(catalog, early) == [early_id]
+    # The late write is still expected: the checkpoint stays below it
+    assert catalog.sync_state.checkpoint == late[SEQ_FIELD] - 1
+    late_id = insert(products_col, late)
+    assert catalog.sync() == 1
+    assert found(catalog, late) == [late_id]
+    assert catalog.sync_state.checkpoint == early[SEQ_FIELD]
+
+def test_sync_skips_a_gap_that_expires(products_col, monkeypatch):
+    catalog = ProductCatalog.load()
+    reserve_sequence()
+    doc = make_product("yellow raincoat")
+    product_id = insert(products_col, doc)
+    catalog.sync()
+    assert found(catalog, doc) == [product_id]
+    assert catalog.sync_state.checkpoint == 0
+    monkeypatch.setattr(settings, "CATALOG_SYNC_GAP_SECONDS", 0)
+    catalog.sync()
+    assert catalog.sync_state.checkpoint == doc[SEQ_FIELD]
+    assert not catalog.sync_state.missing
+
+def test_load_expects_writes_reserved_before_it(products_col):
+    insert(products_col, make_product("settled", _id=old_object_id(10 * GAP)))
+    reserve_sequence()
+    insert(products_col, make_product("settled too", _id=old_object_id(10 * GAP)))
+    inflight = stamp([make_product("in flight")])[0]
+    catalog = ProductCatalog.load()
+    # Only the reservation newer than the settled products is queried again
+    assert set(catalog.sync_state.missing) == {inflight[SEQ_FIELD]}
+    product_id = insert(products_col, inflight)
+    assert catalog.sync() == 1
+    assert found(catalog, inflight) == [product_id]
+
+@pytest.fixture
+def atlas_catalog(monkeypatch):
+    """The resident catalog of this process, over the Atlas backend."""
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "atlas")
+    monkeypatch.setattr(settings, "SEARCH_TOP_K", 100)
+    catalog = ProductCatalog.load()
+    monkeypatch.setattr(catalog_module, "_catalog", catalog)
+    return catalog
+
+def test_atlas_writer_indexes_products_its_watcher_already_synced(products_col, vectors_col, atlas_catalog):
+    doc = make_product("grey linen trousers")
+    product_id = insert(products_col, doc)
+    # The watcher gets there first: it reads the product without embeddings
+    assert atlas_catalog.sync() == 1
+    add_to_resident_catalog([doc])
+    assert {vector["product_id"] for vector in vectors_col.docs} == {product_id}
+    assert found(atlas_catalog, doc) == [product_id]
+
+def test_atlas_delete_removes_vectors_its_watcher_already_synced(products_col, vectors_col, atlas_catalog, monkeypatch):
+    doc = make_product("black leather belt")
+    product_id = insert(products_col, doc)
+    add_to_resident_catalog([doc])
+    update_one = products_col.update_one
+
+    def update_then_sync(*args, **kwargs):
+        # The watcher applies the tombstone between the write and the deleting call's own update
+        result = update_one(*args, **kwargs)
+        assert atlas_catalog.sync() == 1
+        return result
+
+    monkeypatch.setattr(products_col, "update_one", update_then_sync, raising=False)
+    assert delete_product(product_id)
+    assert vectors_col.docs == []
+    assert found(atlas_catalog, doc) == []
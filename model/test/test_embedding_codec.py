@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from bson import Binary, encode
+from app.core.config import settings
+from app.core.embedding_codec import EMBEDDING_SUBTYPES, decode_embeddings, encode_embeddings, is_packed, migrate_embeddings
+
+DIM = 32
+
+def vectors(n, seed=0):
+    return (np.random.default_rng(seed).standard_normal((n, DIM)) * 3).astype(np.float32)
+
+def normalized(rows):
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_float32_round_trip_is_normalized():
+    rows = vectors(3)
+    packed = encode_embeddings(rows, "float32")
+    assert isinstance(packed, Binary) and packed.subtype == EMBEDDING_SUBTYPES["float32"] and is_packed(packed)
+    assert len(packed) == 3 * DIM * 4
+    decoded = decode_embeddings(packed, DIM)
+    assert decoded.dtype == np.float32 and decoded.shape == (3, DIM)
+    assert np.allclose(decoded, normalized(rows), atol=1e-6)
+
+def test_float16_round_trip():
+    rows = vectors(4, seed=1)
+    packed = encode_embeddings(rows, "float16")
+    assert len(packed) == 4 * DIM * 2
+    decoded = decode_embeddings(packed, DIM)
+    assert np.allclose(np.linalg.norm(decoded, axis=1), 1.0, atol=1e-6)
+    assert (decoded * normalized(rows)).sum(axis=1).min() > 0.9999
+
+def test_legacy_lists_and_empty_values():
+    rows = vectors(2, seed=2)
+    assert np.allclose(decode_embeddings(rows.tolist(), DIM), normalized(rows), atol=1e-6)
+    for empty in (None, [], encode_embeddings([], "float32")):
+        assert decode_embeddings(empty, DIM).shape == (0, DIM)
+    assert not is_packed(rows.tolist()) and not is_packed(Binary(b"\x00" * 8, 0))
+
+def test_invalid_values():
+    with pytest.raises(ValueError):
+        encode_embeddings(vectors(1), "int8")
+    with pytest.raises(ValueError):
+        decode_embeddings(encode_embeddings(vectors(1), "float32"), DIM + 1)
+
+def test_packed_is_smaller_than_bson_doubles():
+    # CLIP ViT-B/32 dimension; per-component key overhead makes small dimensions compress less
+    rows = np.random.default_rng(0).standard_normal((4, 512)).astype(np.float32)
+    as_doubles = len(encode({"embeddings": rows.tolist()}))
+    assert as_doubles / len(encode({"embeddings": encode_embeddings(rows, "float32")})) > 3
+    assert as_doubles / len(encode({"embeddings": encode_embeddings(rows, "float16")})) > 6
+
+def test_migration_rewrites_lists_in_batches(products_col, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+    originals = {}
+    for i in range(25):
+        rows = vectors(1 + i % 3, seed=i)
+        originals[products_col.insert_one({"name": f"p{i}", "embeddings": rows.tolist()}).inserted_id] = rows
+    products_col.insert_one({"name": "packed", "embeddings": encode_embeddings(vectors(1), "float32")})
+    calls = []
+    stats = migrate_embeddings(products_col, batch_size=10, dtype="float32", progress=lambda done, total, _: calls.append((done, total)))
+    assert stats["migrated"] == 25 and stats["bytes_after"] * 2.5 < stats["bytes_before"]
+    assert calls == [(10, 25), (20, 25), (25, 25)]
+    for doc in products_col.find({"_id": {"$in": list(originals)}}):
+        assert is_packed(doc["embeddings"])
+        assert np.allclose(decode_embeddings(doc["embeddings"]), normalized(originals[doc["_id"]]), atol=1e-6)
+    # Nothing left to do, unless re-encoding
+    assert migrate_embeddings(products_col, dtype="float32")["migrated"] == 0
+    assert migrate_embeddings(products_col, dtype="float16", reencode=True)["migrated"] == 26
+    assert all(doc["embeddings"].subtype == EMBEDDING_SUBTYPES["float16"] for doc in products_col.find())
+
+def test_migration_skips_documents_changed_meanwhile(products_col, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+    ids = [products_col.insert_one({"name": str(i), "embeddings": vectors(1, seed=i).tolist()}).inserted_id for i in range(3)]
+    fresh = encode_embeddings(vectors(1, seed=9), "float32")
+    bulk_write = products_col.bulk_write
+
+    def change_then_write(operations, ordered=True):
+        # Between the read and the write: one product is deleted, another re-embedded
+        products_col.update_one({"_id": ids[0]}, {"$set": {"deleted": True}, "$unset": {"embeddings": ""}})
+        products_col.update_one({"_id": ids[1]}, {"$set": {"embeddings": fresh}})
+        return bulk_write(operations, ordered)
+
+    monkeypatch.setattr(products_col, "bulk_write", change_then_write, raising=False)
+    assert migrate_embeddings(products_col, dtype="float32")["migrated"] == 1
+    assert "embeddings" not in products_col.find_one({"_id": ids[0]})
+    assert products_col.find_one({"_id": ids[1]})["embeddings"] == fresh
+    assert is_packed(products_col.find_one({"_id": ids[2]})["embeddings"])
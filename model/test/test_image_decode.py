@@ -0,0 +1,39 @@
+import io
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+from app.core.embedding_server import EmbeddingClient
+from app.core.image_decode import decode_image, downscale
+
+def photo(width, height):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+def test_downscale_keeps_aspect_ratio_and_small_images():
+    min_side = 2 * settings.IMAGE_DECODE_SIZE
+    assert downscale(photo(4000, 3000)).size == (round(4000 * min_side / 3000), min_side)
+    assert downscale(photo(600, 2400)).size == (min_side, 4 * min_side)
+    small = photo(300, 200)
+    assert downscale(small) is small
+
+def test_jpeg_is_draft_decoded():
+    buffer = io.BytesIO()
+    photo(2000, 1600).save(buffer, format="JPEG")
+    image = decode_image(buffer.getvalue())
+    assert image.mode == "RGB" and settings.IMAGE_DECODE_SIZE <= min(image.size) < 2 * settings.IMAGE_DECODE_SIZE
+
+def test_client_sends_downscaled_pixels(monkeypatch):
+    client = EmbeddingClient("/nonexistent.sock")
+    sent = {}
+
+    def request(header, payload=b""):
+        sent["header"], sent["payload"] = header, payload
+        n = len(header["sizes"])
+        return {"ok": True, "n": n, "dim": 4}, np.zeros((n, 4), dtype=np.float32).tobytes()
+
+    monkeypatch.setattr(client, "request", request)
+    rows = client.encode_images([photo(4000, 3000), photo(100, 80).convert("L")])
+    assert rows.shape == (2, 4)
+    sizes = [tuple(size) for size in sent["header"]["sizes"]]
+    assert sizes == [downscale(photo(4000, 3000)).size, (100, 80)]
+    assert len(sent["payload"]) == sum(3 * w * h for w, h in sizes)
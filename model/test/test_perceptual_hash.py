@@ -0,0 +1,79 @@
+import io
+import random
+from PIL import Image, ImageDraw
+from app.core.image_decode import decode_image
+from app.core.perceptual_hash import BKTree, backfill_phashes, hamming, phash
+
+def random_hashes(n, seed=0):
+    rng = random.Random(seed)
+    return [f"{rng.getrandbits(64):016x}" for _ in range(n)]
+
+def test_bktree_matches_linear_scan():
+    hashes = random_hashes(500)
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+    assert len(tree) == 500
+    for query in random_hashes(20, seed=1) + hashes[:5]:
+        for radius in (0, 8, 24):
+            expected = sorted((i, hamming(query, h)) for i, h in enumerate(hashes) if hamming(query, h) <= radius)
+            found = tree.search(query, radius)
+            assert sorted(found) == expected
+            assert [d for _, d in found] == sorted(d for _, d in found)
+
+def test_bktree_duplicates_and_remove():
+    tree = BKTree()
+    tree.add("00000000000000ff", "a")
+    tree.add("00000000000000ff", "b")
+    tree.add("00000000000000fe", "c")
+    assert sorted(tree.search("00000000000000ff", 0)) == [("a", 0), ("b", 0)]
+    tree.remove("00000000000000ff", "a")
+    tree.remove("00000000000000ff", "missing")
+    tree.remove("1111111111111111", "a")
+    assert sorted(tree.search("00000000000000ff", 1)) == [("b", 0), ("c", 1)]
+    assert len(tree) == 2
+    assert BKTree().search("00", 64) == []
+
+def scene(seed):
+    """Photo-like test image: a few overlapping coloured shapes on a background."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (256, 256), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x, y = rng.randrange(200), rng.randrange(200)
+        box = (x, y, x + rng.randrange(30, 120), y + rng.randrange(30, 120))
+        fill = tuple(rng.randrange(256) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=fill)
+    return image
+
+def test_phash_survives_recompression_and_resize():
+    image = scene(0)
+    buffer = io.BytesIO()
+    image.resize((128, 128)).save(buffer, "JPEG", quality=40)
+    copy = Image.open(io.BytesIO(buffer.getvalue()))
+    assert len(phash(image)) == 16
+    assert hamming(phash(image), phash(copy)) <= 6
+    assert all(hamming(phash(image), phash(scene(seed))) > 6 for seed in range(1, 6))
+
+def jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+def test_backfill_hashes_existing_products(products_col):
+    images = {f"http://storage/{seed}.jpg": jpeg(scene(seed)) for seed in range(6)}
+    urls = list(images)
+    old = [products_col.insert_one({"name": f"old {i}", "image_urls": urls[2 * i:2 * i + 2]}).inserted_id for i in range(2)]
+    broken = products_col.insert_one({"name": "broken", "image_urls": [urls[4], "http://storage/missing.jpg"]}).inserted_id
+    products_col.insert_one({"name": "new", "image_urls": [urls[5]], "image_phashes": ["0" * 16]})
+    products_col.insert_one({"name": "gone", "image_urls": [urls[5]], "deleted": True})
+    stats = backfill_phashes(products_col, fetch=images.__getitem__, batch_size=2)
+    assert (stats["hashed"], stats["images"], stats["failed"]) == (2, 4, 1)
+    for i, product_id in enumerate(old):
+        stored = products_col.find_one({"_id": product_id})["image_phashes"]
+        assert stored == [phash(decode_image(images[url], draft_size=64)) for url in urls[2 * i:2 * i + 2]]
+    assert "image_phashes" not in products_col.find_one({"_id": broken})
+    assert products_col.find_one({"name": "new"})["image_phashes"] == ["0" * 16]
+    # Only the failed product is tried again
+    images["http://storage/missing.jpg"] = jpeg(scene(9))
+    assert backfill_phashes(products_col, fetch=images.__getitem__)["hashed"] == 1
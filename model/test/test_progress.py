@@ -0,0 +1,68 @@
+import json
+import time
+import fakeredis
+import pytest
+from app.core import progress
+from app.core.progress import ProgressReporter, progress_key, update_progress
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+def subscribe(redis_client, job_id):
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(progress_key(job_id))
+    pubsub.get_message(timeout=1.0)
+    return pubsub
+
+def published(pubsub):
+    updates = []
+    while (message := pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)) is not None:
+        updates.append(json.loads(message["data"])["progress"])
+    return updates
+
+def stored(redis_client, job_id):
+    return json.loads(redis_client.get(progress_key(job_id)))
+
+def test_burst_is_coalesced_and_terminal_update_is_written_at_once(redis_client):
+    pubsub = subscribe(redis_client, "job")
+    reporter = ProgressReporter("job", redis_client, min_interval_ms=200)
+    for value in range(0, 100, 2):
+        reporter.update(value, f"step {value}")
+    # Only the first update went out; the rest wait for the interval
+    assert reporter.writes == 1 and published(pubsub) == [0]
+    reporter.update(100, "done")
+    assert reporter.writes == 2
+    assert stored(redis_client, "job")["message"] == "done"
+    # The superseded updates are never sent, not even once the interval has passed
+    time.sleep(0.3)
+    assert reporter.writes == 2 and published(pubsub) == [100]
+
+def test_latest_coalesced_update_is_sent_after_the_interval(redis_client):
+    pubsub = subscribe(redis_client, "job")
+    reporter = ProgressReporter("job", redis_client, min_interval_ms=100)
+    for value in (0, 10, 20, 30):
+        reporter.update(value)
+    time.sleep(0.25)
+    assert published(pubsub) == [0, 30]
+    assert stored(redis_client, "job")["progress"] == 30
+    reporter.update(-1, "Error: boom")
+    assert published(pubsub) == [-1]
+    assert reporter.writes == 3
+
+def test_update_progress_drops_the_reporter_when_the_job_ends(redis_client, monkeypatch):
+    monkeypatch.setattr(progress, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(progress, "_reporters", {})
+    update_progress("job", 0, "start")
+    update_progress("job", 50, "half")
+    assert "job" in progress._reporters
+    update_progress("job", 100, "done")
+    assert progress._reporters == {}
+    assert stored(redis_client, "job")["message"] == "done"
+
+def test_reporter_without_redis_is_silent(monkeypatch):
+    monkeypatch.setattr(progress, "get_redis", lambda: None)
+    reporter = ProgressReporter("job", min_interval_ms=0)
+    reporter.update(0)
+    reporter.update(100)
+    assert reporter.writes == 0
@@ -0,0 +1,31 @@
+import pytest
+from app.core.ranking import fuse_rankings
+
+VECTOR = [("a", 0.9), ("b", 0.8), ("c", 0.5)]
+KEYWORD = [("c", 12.0), ("d", 6.0), ("a", 3.0)]
+
+def test_filter_keeps_vector_order_and_scores():
+    assert fuse_rankings(VECTOR, KEYWORD, "filter") == [("a", 0.9), ("c", 0.5)]
+
+def test_rrf():
+    fused = dict(fuse_rankings(VECTOR, KEYWORD, "rrf", rrf_k=60))
+    assert fused["a"] == pytest.approx(1 / 61 + 1 / 63)
+    assert fused["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62)
+    assert fused["d"] == pytest.approx(1 / 62)
+    ranked = [pid for pid, _ in fuse_rankings(VECTOR, KEYWORD, "rrf", rrf_k=60)]
+    assert set(ranked[:2]) == {"a", "c"} and set(ranked) == {"a", "b", "c", "d"}
+
+def test_weighted_normalizes_bm25():
+    fused = fuse_rankings(VECTOR, KEYWORD, "weighted", vector_weight=0.5)
+    scores = dict(fused)
+    assert scores["c"] == pytest.approx(0.5 * 0.5 + 0.5 * 1.0)
+    assert scores["d"] == pytest.approx(0.5 * 0.5)
+    assert scores["a"] == pytest.approx(0.5 * 0.9 + 0.5 * 0.25)
+    assert [pid for pid, _ in fused] == sorted(scores, key=scores.get, reverse=True)
+
+def test_one_sided_and_unknown_mode():
+    assert fuse_rankings([], KEYWORD, "weighted", vector_weight=1.0) == [("c", 0.0), ("d", 0.0), ("a", 0.0)]
+    assert fuse_rankings(VECTOR, [], "filter") == []
+    with pytest.raises(ValueError):
+        fuse_rankings(VECTOR, KEYWORD, "nope")
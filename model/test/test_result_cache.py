@@ -0,0 +1,106 @@
+import fakeredis
+import numpy as np
+import pytest
+from app.core import result_cache
+from app.core.catalog import ProductCatalog
+from app.core.catalog_matrix import normalize_rows
+from app.core.catalog_sync import SEQ_FIELD, stamp
+from app.core.config import settings
+
+DIM = 16
+DIGEST = result_cache.get_cache_key("a" * 64)
+
+pytestmark = pytest.mark.usefixtures("local_services")
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+@pytest.fixture(autouse=True)
+def small_dimension(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+
+RANKED = [
+    ("0123456789abcdef01234567", [(0, 0.912345), (2, 0.8)], {"match_type": "semantic", "similarity": 0.912345, "matched_words": 2}),
+    ("89abcdef0123456789abcdef", [], {"match_type": "keyword", "relevance_score": 7.25, "matched_words": 3}),
+    ("fedcba9876543210fedcba98", [(1, 0.7)], {"relevance_score": 0.5, "similarity": 0.7, "matched_words": 0}),
+]
+
+def test_ranking_round_trip():
+    decoded = result_cache.decode_ranking(result_cache.encode_ranking(RANKED))
+    assert [(pid, extras) for pid, _, extras in decoded] == [
+        (pid, {k: pytest.approx(v) if isinstance(v, float) else v for k, v in extras.items()}) for pid, _, extras in RANKED
+    ]
+    for (_, hits, _), (_, expected, _) in zip(decoded, RANKED):
+        assert [i for i, _ in hits] == [i for i, _ in expected]
+        assert np.allclose([s for _, s in hits], [s for _, s in expected], atol=1e-6)
+
+def test_store_and_lookup_follow_the_generation(redis_client):
+    assert result_cache.lookup(DIGEST) == (0, None)
+    result_cache.store(DIGEST, 0, RANKED)
+    generation, ranked = result_cache.lookup(DIGEST)
+    assert generation == 0 and [pid for pid, _, _ in ranked] == [pid for pid, _, _ in RANKED]
+    result_cache.bump_generation(5)
+    assert result_cache.lookup(DIGEST) == (5, None)
+    # The generation follows the highest committed write, a late lower one does not lower it
+    result_cache.bump_generation(3)
+    assert result_cache.current_generation() == 5
+
+def test_single_flight_claim_and_release():
+    assert result_cache.claim_search(DIGEST, "job-1") == "job-1"
+    assert result_cache.claim_search(DIGEST, "job-2") == "job-1"
+    result_cache.release_search(DIGEST, "job-2")
+    assert result_cache.claim_search(DIGEST, "job-3") == "job-1"
+    result_cache.release_search(DIGEST, "job-1")
+    assert result_cache.claim_search(DIGEST, "job-3") == "job-3"
+
+rng = np.random.default_rng(0)
+
+def write_product(products_col, name, doc=None):
+    """Insert a product the way add_product_task does; returns its id and embeddings."""
+    doc = doc or {"name": name}
+    doc["embeddings"] = normalize_rows(rng.standard_normal((1, DIM))).tolist()
+    if SEQ_FIELD not in doc:
+        stamp([doc])
+    products_col.insert_one(doc)
+    result_cache.bump_generation(doc[SEQ_FIELD])
+    return str(doc["_id"]), doc["embeddings"][0]
+
+def search(catalog, query_embedding):
+    """The cache steps of the search tasks around an image search; returns the ranking."""
+    generation = result_cache.current_generation()
+    cacheable = catalog.caught_up(generation)
+    ranked = [(pid, hits, {"similarity": max(s for _, s in hits)}) for pid, hits in catalog.search(query_embedding, 0.99)]
+    if cacheable:
+        result_cache.store(DIGEST, generation, ranked)
+    return [pid for pid, _, _ in ranked]
+
+def cached(digest=DIGEST):
+    _, ranked = result_cache.lookup(digest)
+    return None if ranked is None else [pid for pid, _, _ in ranked]
+
+def test_catalog_behind_the_generation_does_not_cache(products_col):
+    write_product(products_col, "existing")
+    synced, lagging = ProductCatalog.load(), ProductCatalog.load()
+    product_id, embedding = write_product(products_col, "new")
+    synced.sync()
+    # The lagging worker answers without the new product, and must not cache that
+    assert search(lagging, embedding) == []
+    assert cached() is None
+    assert search(synced, embedding) == [product_id]
+    assert cached() == [product_id]
+    lagging.sync()
+    assert lagging.caught_up(result_cache.current_generation())
+
+def test_catalog_waits_for_a_write_committed_late(products_col):
+    catalog = ProductCatalog.load()
+    late = stamp([{"name": "late"}])[0]
+    write_product(products_col, "early")
+    catalog.sync()
+    assert not catalog.caught_up(result_cache.current_generation())
+    late_id, embedding = write_product(products_col, "late", late)
+    assert result_cache.current_generation() == late[SEQ_FIELD] + 1
+    catalog.sync()
+    assert catalog.caught_up(result_cache.current_generation())
+    assert search(catalog, embedding) == [late_id]
+    assert cached() == [late_id]
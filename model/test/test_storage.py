@@ -0,0 +1,77 @@
+import importlib.util
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+from app.core import storage
+from app.core.storage import HTTPStorage, upload_with_retry
+
+_spec = importlib.util.spec_from_file_location(
+    "local_storage_server", os.path.join(os.path.dirname(__file__), os.pardir, "scripts", "local_storage_server.py")
+)
+local_storage_server = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(local_storage_server)
+
+@pytest.fixture
+def start_server(tmp_path):
+    """Start the stand-in storage server on a free port; returns ``(base_url, handler_stats)``."""
+    servers = []
+
+    def start(**failures):
+        handler = local_storage_server.make_handler(str(tmp_path), **failures)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/images", handler.stats
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_upload_and_read_back(start_server):
+    base_url, stats = start_server()
+    url = HTTPStorage(base_url).upload(b"image-bytes", "abc123")
+    assert url == f"{base_url}/abc123"
+    with urllib.request.urlopen(url) as response:
+        assert response.read() == b"image-bytes"
+    assert stats == {"puts": 1, "stored": 1}
+
+def test_retries_transient_5xx(start_server):
+    base_url, stats = start_server(fail_first=2)
+    url = upload_with_retry(HTTPStorage(base_url), b"data", "k1", retries=3, backoff=0)
+    assert url.endswith("/k1") and stats == {"puts": 3, "stored": 1}
+
+def test_retries_dropped_connection(start_server):
+    base_url, stats = start_server(drop_first=1, fail_first=1)
+    upload_with_retry(HTTPStorage(base_url), b"data", "k2", retries=2, backoff=0)
+    assert stats == {"puts": 3, "stored": 1}
+
+def test_gives_up_after_retry_limit(start_server):
+    base_url, stats = start_server(fail_first=10)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        upload_with_retry(HTTPStorage(base_url), b"data", "k3", retries=2, backoff=0)
+    assert error.value.code == 503
+    assert stats == {"puts": 3, "stored": 0}
+
+def test_gives_up_on_unreachable_server():
+    attempts = []
+
+    class CountingStorage(HTTPStorage):
+        def upload(self, image_bytes, key):
+            attempts.append(key)
+            return super().upload(image_bytes, key)
+
+    # Port 9 (discard) on localhost refuses connections
+    with pytest.raises(urllib.error.URLError):
+        upload_with_retry(CountingStorage("http://127.0.0.1:9/images", timeout=2), b"data", "k4", retries=1, backoff=0)
+    assert len(attempts) == 2
+
+def test_submit_upload_runs_in_background(start_server, monkeypatch):
+    base_url, stats = start_server(fail_first=1)
+    monkeypatch.setattr(storage.settings, "UPLOAD_BACKOFF_SECONDS", 0)
+    futures = [storage.submit_upload(f"img{i}".encode(), f"key{i}", HTTPStorage(base_url)) for i in range(5)]
+    assert sorted(future.result(timeout=10) for future in futures) == [f"{base_url}/key{i}" for i in range(5)]
+    assert stats["stored"] == 5
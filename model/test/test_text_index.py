@@ -0,0 +1,43 @@
+from app.core.text_index import InvertedIndex, stem, tokenize
+
+PRODUCTS = {
+    "sneakers": {"name": "Running Sneakers", "description": "Light shoes for running", "category": "Footwear"},
+    "sneaker": {"name": "Canvas Sneaker", "description": "A classic low-top", "category": "Footwear", "color": "Red"},
+    "dress": {"name": "Summer Dress", "description": "Floral dresses collection", "category": "Clothing"},
+    "watch": {"name": "Steel Watch", "description": "Analog watches with leather straps", "category": "Accessories", "key_features": ["Water resistant"]},
+}
+
+def make_index():
+    index = InvertedIndex()
+    for doc_id, product in PRODUCTS.items():
+        index.add(doc_id, product)
+    return index
+
+def test_stem_plurals():
+    assert [stem(word) for word in ("sneakers", "dresses", "watches", "boxes", "accessories", "glass", "bus", "shoes")] == [
+        "sneaker", "dress", "watch", "box", "accessory", "glass", "bus", "shoe"]
+    assert tokenize("T-Shirts & Caps") == ["t", "shirt", "cap"]
+
+def test_singular_and_plural_queries_match_both_forms():
+    index = make_index()
+    for query in ("sneaker", "sneakers", "SNEAKERS!"):
+        assert {doc_id for doc_id, _, _ in index.search(query)} == {"sneakers", "sneaker"}
+    assert [doc_id for doc_id, _, _ in index.search("watch")] == ["watch"]
+    assert [doc_id for doc_id, _, _ in index.search("dress")] == ["dress"]
+
+def test_bm25_ranking_and_matched_terms():
+    index = make_index()
+    results = index.search("red canvas sneakers")
+    assert results[0][0] == "sneaker" and results[0][2] == 3
+    assert results[1][0] == "sneakers" and results[1][2] == 1
+    assert index.search("red", doc_ids={"sneakers"}) == []
+    assert len(index.search("footwear", limit=1)) == 1
+    assert index.search("") == [] and index.search("unknownword") == []
+
+def test_remove_and_reindex():
+    index = make_index()
+    index.remove("sneaker")
+    assert [doc_id for doc_id, _, _ in index.search("sneaker")] == ["sneakers"]
+    assert "canvas" not in index.postings
+    index.add("sneakers", {"name": "Trail Boots"})
+    assert index.search("sneakers") == [] and len(index) == 3
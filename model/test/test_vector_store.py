@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.core.catalog_matrix import normalize_rows
+from app.core.vector_store import ExactVectorStore, HNSWVectorStore
+
+DIM = 32
+
+@pytest.fixture(autouse=True)
+def small_dimension(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+    monkeypatch.setattr(settings, "SEARCH_TOP_K", 100)
+
+def make_catalog(seed, n_products=300, max_images=3):
+    rng = np.random.default_rng(seed)
+    ids = [f"p{i}" for i in range(n_products)]
+    embeddings = [normalize_rows(rng.standard_normal((rng.integers(1, max_images + 1), DIM))) for _ in ids]
+    return rng, ids, embeddings
+
+def brute_force(ids, embeddings, query, threshold):
+    query = normalize_rows(query)
+    results = {}
+    for product_id, embs in zip(ids, embeddings):
+        hits = [(i, float(s)) for i, s in enumerate(np.clip(embs @ query, 0.0, 1.0)) if s >= threshold]
+        if hits:
+            results[product_id] = hits
+    return results
+
+def test_exact_store_matches_brute_force():
+    rng, ids, embeddings = make_catalog(0)
+    store = ExactVectorStore(ids, embeddings)
+    query = embeddings[42][0] + 0.2 * rng.standard_normal(DIM)
+    results = store.search(query, 0.3)
+    expected = brute_force(ids, embeddings, query, 0.3)
+    assert results[0][0] == "p42"
+    assert {product_id for product_id, _ in results} == set(expected)
+    for product_id, hits in results:
+        assert [i for i, _ in hits] == [i for i, _ in expected[product_id]]
+        assert np.allclose([s for _, s in hits], [s for _, s in expected[product_id]], atol=1e-5)
+    best = [max(s for _, s in hits) for _, hits in results]
+    assert best == sorted(best, reverse=True)
+
+def test_exact_store_product_ids_and_add():
+    rng, ids, embeddings = make_catalog(1, n_products=20)
+    store = ExactVectorStore(ids, embeddings)
+    assert [pid for pid, _ in store.search(embeddings[3][0], 0.0, {"p5", "p7"})] in (["p5", "p7"], ["p7", "p5"])
+    new = normalize_rows(rng.standard_normal((2, DIM)))
+    rows = store.add("new", new)
+    assert len(rows) == 2 and store.search(new[1], 0.99)[0] == ("new", [(1, pytest.approx(1.0, abs=1e-5))])
+    assert len(store.add("new", new)) == 0
+
+def test_hnsw_recall_against_brute_force():
+    rng, ids, embeddings = make_catalog(2, n_products=500)
+    store = HNSWVectorStore(ids, embeddings)
+    found = total = 0
+    for target in rng.choice(len(ids), 20, replace=False):
+        query = embeddings[target][0] + 0.1 * rng.standard_normal(DIM)
+        results = store.search(query, 0.5)
+        expected = brute_force(ids, embeddings, query, 0.5)
+        assert results[0][0] == ids[target]
+        returned = {(pid, i) for pid, hits in results for i, _ in hits}
+        relevant = {(pid, i) for pid, hits in expected.items() for i, _ in hits}
+        found += len(returned & relevant)
+        total += len(relevant)
+    assert found / total >= 0.95
+
+def test_hnsw_product_ids_and_add():
+    rng, ids, embeddings = make_catalog(3, n_products=200)
+    store = HNSWVectorStore(ids, embeddings)
+    allowed = {"p10", "p11"}
+    assert {pid for pid, _ in store.search(embeddings[50][0], 0.0, allowed)} <= allowed
+    new = normalize_rows(rng.standard_normal((1, DIM)))
+    store.add("new", new)
+    assert store.search(new[0], 0.99)[0][0] == "new"
+
+@pytest.mark.parametrize("store_class", [ExactVectorStore, HNSWVectorStore])
+def test_batched_adds_and_removals_match_a_fresh_store(store_class):
+    rng, ids, embeddings = make_catalog(4, n_products=200)
+    store = store_class(ids[:10], embeddings[:10])
+    for start in range(10, len(ids), 13):
+        store.add_many(list(zip(ids[start:start + 13], embeddings[start:start + 13])))
+    removed = {f"p{i}" for i in range(0, len(ids), 3)}
+    for product_id in removed:
+        store.remove(product_id)
+    kept = [i for i, product_id in enumerate(ids) if product_id not in removed]
+    fresh = store_class([ids[i] for i in kept], [embeddings[i] for i in kept])
+    for target in (1, 50, 101, 199):
+        results, expected = store.search(embeddings[target][0], 0.5), fresh.search(embeddings[target][0], 0.5)
+        assert [(pid, [i for i, _ in hits]) for pid, hits in results] == [(pid, [i for i, _ in hits]) for pid, hits in expected]
+        assert np.allclose([s for _, hits in results for _, s in hits], [s for _, hits in expected for _, s in hits], atol=1e-5)
+    assert store.search(embeddings[99][0], 0.99) == []
+    assert store.deleted.sum() == len(removed) and len(store.deleted) == len(ids)